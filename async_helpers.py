@@ -0,0 +1,501 @@
+"""
+K-Ruoka API helpers — asyncio transport built on curl_cffi ``AsyncSession``.
+
+Mirrors the endpoint wrappers in ``helpers.py`` (``fetch_offer_category``,
+``fetch_offers``, ``search_offers``, ``search_stores``, ...) as coroutines on
+``AsyncKRuokaClient``.  One event loop can keep many store and category
+requests in flight without a thread per request; wall time is then bound by
+the global rate limit instead of by round-trip time.
+
+Semantics are shared with the blocking transport:
+  - Cloudflare is resolved once by ``helpers`` (run in a worker thread) and
+    the same cookies / user agent are copied onto the async session.
+  - Every request reserves a slot from the *same* global rate limiter as
+    ``helpers._http_request``, so sync and async callers in one process never
+    exceed the combined budget.
+  - HTTP 429 backs off 15s → 30s → 60s and pauses every caller.
+  - HTTP 403 triggers a single re-authentication shared by all coroutines.
+
+Usage:
+    async with AsyncKRuokaClient() as client:
+        result = await client.search_all_offers_for_store("N110")
+"""
+import asyncio
+import logging
+import time
+
+import helpers
+import json_codec
+from helpers import (
+    MAX_OFFER_CATEGORY_LIMIT,
+    MAX_RETRIES,
+    RETRY_BACKOFF,
+    MAX_429_RETRIES,
+    INITIAL_429_BACKOFF,
+    MAX_403_RETRIES,
+    _FetchResponse,
+    _build_query_string,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CLIENTS = 16  # concurrent curl handles per AsyncSession
+
+
+async def _rate_limit_wait_async(endpoint_class: str = "other") -> None:
+    """Reserve a slot from the shared limiters and sleep without blocking the loop."""
+    wait_time = helpers._reserve_request_slot(endpoint_class)
+    if wait_time > 0:
+        await asyncio.sleep(wait_time)
+
+
+class AsyncKRuokaClient:
+    """Asyncio K-Ruoka API client sharing CF credentials and rate budget with helpers."""
+
+    def __init__(self, max_clients: int = DEFAULT_MAX_CLIENTS):
+        self._max_clients = max_clients
+        self._session = None
+        self._generation = 0  # helpers._cf_generation the session carries
+        self._session_lock = asyncio.Lock()
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncKRuokaClient":
+        cassette = helpers._cassette
+        if cassette is None or cassette.mode != "replay":
+            await self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the underlying AsyncSession (CF cookies stay cached in helpers)."""
+        s, self._session = self._session, None
+        if s is not None:
+            try:
+                await s.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # Session management
+    # ------------------------------------------------------------------
+
+    async def _ensure_session(self):
+        """Return the shared AsyncSession, resolving Cloudflare on first use.
+
+        When helpers has installed newer CF credentials (a re-auth or a
+        proactive refresh, possibly from another thread) the session picks
+        them up here, lazily, before its next request.
+        """
+        if self._session is not None:
+            if self._generation != helpers._cf_generation:
+                self._generation = helpers._cf_generation
+                helpers._apply_cf_credentials(self._session)
+            return self._session
+        async with self._session_lock:
+            if self._session is None:
+                # CF resolution is blocking (FlareSolverr / browser) — keep
+                # it off the event loop.
+                await asyncio.to_thread(helpers._ensure_session)
+                self._generation = helpers._cf_generation
+                self._session = self._new_session()
+        return self._session
+
+    def _new_session(self):
+        from curl_cffi.requests import AsyncSession
+
+        s = AsyncSession(impersonate="chrome", max_clients=self._max_clients)
+        helpers._apply_cf_credentials(s)
+        return s
+
+    async def _re_authenticate(self, stale_generation: int) -> None:
+        """Re-resolve CF once, even when many coroutines hit 403 together."""
+        async with self._auth_lock:
+            if helpers._cf_generation != stale_generation:
+                return  # already refreshed (here or by another thread)
+            await asyncio.to_thread(helpers._re_authenticate, stale_generation)
+
+    # ------------------------------------------------------------------
+    # HTTP transport
+    # ------------------------------------------------------------------
+
+    async def _http_request(
+        self, method: str, url: str, body: dict | None = None,
+    ) -> _FetchResponse:
+        """Async twin of ``helpers._http_request`` (rate limit, 429 retry, 403 re-auth).
+
+        Honours the same record/replay cassette as the blocking transport.
+        """
+        cassette = helpers._cassette
+        if cassette is not None and cassette.mode == "replay":
+            if helpers.REPLAY_RATE_LIMIT:
+                await _rate_limit_wait_async(helpers._endpoint_class(url))
+            entry = cassette.lookup(method, helpers._relative_url(url), body)
+            delay = cassette.delay_for(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return _FetchResponse(
+                entry["status"], entry["text"], entry.get("elapsed", 0.0),
+            )
+
+        resp = await self._http_request_live(method, url, body)
+        if cassette is not None:
+            cassette.record(
+                method, helpers._relative_url(url), body,
+                resp.status_code, resp.text, resp.elapsed,
+            )
+        return resp
+
+    async def _http_request_live(
+        self, method: str, url: str, body: dict | None = None,
+    ) -> _FetchResponse:
+        """Send the request over the CF-authenticated AsyncSession."""
+        retries_403 = 0
+        endpoint_class = helpers._endpoint_class(url)
+
+        for attempt in range(MAX_429_RETRIES + 1):
+            await _rate_limit_wait_async(endpoint_class)
+
+            session = await self._ensure_session()
+            generation = self._generation
+            resp, latency = await self._send(session, method, url, body, endpoint_class)
+
+            # 403 Forbidden — likely expired CF cookies, re-authenticate once
+            if resp.status_code == 403 and retries_403 < MAX_403_RETRIES:
+                retries_403 += 1
+                logger.warning(
+                    "HTTP 403 — CF cookies may have expired, re-authenticating "
+                    "(attempt %d/%d)", retries_403, MAX_403_RETRIES,
+                )
+                try:
+                    await self._re_authenticate(generation)
+                except Exception as e:
+                    logger.error("Re-authentication failed: %s", e)
+                    return _FetchResponse(resp.status_code, resp.content, latency)
+                continue
+
+            if resp.status_code != 429:
+                return _FetchResponse(resp.status_code, resp.content, latency)
+
+            # 429 Too Many Requests — back off and pause every caller
+            if attempt < MAX_429_RETRIES:
+                backoff = INITIAL_429_BACKOFF * (2 ** attempt)
+                logger.warning(
+                    "HTTP 429 — backing off %.1fs (attempt %d/%d)",
+                    backoff, attempt + 1, MAX_429_RETRIES,
+                )
+                helpers._pause_rate_limiter(backoff)
+                await asyncio.sleep(backoff)
+            else:
+                logger.error("HTTP 429 after %d retries, giving up", MAX_429_RETRIES)
+
+        return _FetchResponse(resp.status_code, resp.content, latency)
+
+    async def _send(self, session, method: str, url: str, body, endpoint_class: str):
+        """One request (hedged when enabled); return ``(response, latency)``."""
+        timeout = helpers.ENDPOINT_TIMEOUTS.get(
+            endpoint_class, helpers.DEFAULT_ENDPOINT_TIMEOUT,
+        )
+        hedger = helpers._hedger
+        hedger.count_request()
+        delay = hedger.hedge_delay(endpoint_class) if helpers.HEDGE_REQUESTS else None
+        if delay is None or delay >= timeout:
+            return await self._send_once(session, method, url, body, endpoint_class, timeout)
+
+        t0 = time.monotonic()
+        primary = asyncio.ensure_future(
+            self._send_once(session, method, url, body, endpoint_class, timeout)
+        )
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not hedger.try_acquire():
+            return await primary
+
+        await _rate_limit_wait_async(endpoint_class)  # the duplicate spends a slot
+        if primary.done() and primary.exception() is None:
+            hedger.record_win(False)
+            return primary.result()
+        hedge = asyncio.ensure_future(
+            self._send_once(session, method, url, body, endpoint_class, timeout)
+        )
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in done if t.exception() is None), None)
+            if winner is None:
+                continue
+            hedger.record_win(winner is hedge)
+            if winner is hedge:
+                answered = time.monotonic() - t0
+                # Let the primary finish in the background to measure the saving
+                primary.add_done_callback(
+                    lambda _t: hedger.record_saved(time.monotonic() - t0 - answered)
+                )
+            return winner.result()
+
+        hedger.record_win(False)
+        return primary.result()  # both failed — surface the primary's error
+
+    async def _send_once(
+        self, session, method: str, url: str, body, endpoint_class: str, timeout: float,
+    ):
+        """One attempt on *session*, bounded by *timeout*."""
+        from curl_cffi.requests.exceptions import Timeout
+
+        t0 = time.monotonic()
+        try:
+            if method.upper() == "GET":
+                resp = await session.get(url, timeout=timeout)
+            else:
+                resp = await session.post(
+                    url, data=json_codec.dumps(body) if body is not None else None,
+                    timeout=timeout,
+                )
+        except Timeout as e:
+            helpers._hedger.record_timeout()
+            helpers._record_response(504, time.monotonic() - t0, endpoint_class)
+            raise TimeoutError(
+                f"{method.upper()} {helpers._relative_url(url)} exceeded {timeout:.0f}s"
+            ) from e
+        latency = time.monotonic() - t0
+        helpers._record_response(resp.status_code, latency, endpoint_class)
+        if resp.status_code < 400:
+            helpers._hedger.observe(endpoint_class, latency)
+        return resp, latency
+
+    async def _post_raw(self, endpoint: str, payload: dict) -> _FetchResponse:
+        return await self._http_request("POST", f"{helpers.BASE_URL}/{endpoint}", payload)
+
+    async def _post(self, endpoint: str, payload: dict) -> dict:
+        resp = await self._post_raw(endpoint, payload)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _post_with_retry(self, endpoint: str, payload: dict) -> dict:
+        """POST with retry and backoff for bulk operations."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await self._post(endpoint, payload)
+            except Exception:
+                if attempt == MAX_RETRIES:
+                    raise
+                wait = RETRY_BACKOFF * (attempt + 1)
+                logger.debug(
+                    "Retry %d for %s, waiting %.1fs",
+                    attempt + 1, endpoint, wait,
+                )
+                await asyncio.sleep(wait)
+
+    async def _post_with_params(self, endpoint: str, params: dict) -> dict:
+        qs = _build_query_string(params)
+        url = f"{helpers.BASE_URL}/{endpoint}?{qs}" if qs else f"{helpers.BASE_URL}/{endpoint}"
+        resp = await self._http_request("POST", url)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _get(self, endpoint: str, params: dict) -> dict:
+        qs = _build_query_string(params)
+        url = f"{helpers.BASE_URL}/{endpoint}?{qs}" if qs else f"{helpers.BASE_URL}/{endpoint}"
+        resp = await self._http_request("GET", url)
+        resp.raise_for_status()
+        return resp.json()
+
+    # ------------------------------------------------------------------
+    # K-Ruoka API endpoint wrappers (same signatures as helpers.py)
+    # ------------------------------------------------------------------
+
+    async def fetch_offer_categories(self, store_id: str) -> dict:
+        return await self._post("offer-categories", {"storeId": store_id})
+
+    async def fetch_offer_category(
+        self,
+        store_id: str,
+        category: dict,
+        offset: int = 0,
+        limit: int = MAX_OFFER_CATEGORY_LIMIT,
+        pricing: dict | None = None,
+    ) -> dict:
+        return await self._post("offer-category", {
+            "storeId": store_id,
+            "category": category,
+            "offset": offset,
+            "limit": limit,
+            "pricing": pricing or {},
+        })
+
+    async def fetch_offers(
+        self,
+        store_id: str,
+        offer_ids: list,
+        pricing: dict | None = None,
+    ) -> dict:
+        return await self._post("fetch-offers", {
+            "storeId": store_id,
+            "offerIds": offer_ids,
+            "pricing": pricing or {},
+        })
+
+    async def fetch_related_products(
+        self,
+        product_id: str,
+        store_id: str,
+        segment_id: int = 1565,
+    ) -> dict:
+        return await self._get(f"v2/products/{product_id}/related", {
+            "storeId": store_id,
+            "segmentId": segment_id,
+        })
+
+    async def search_stores(
+        self,
+        query: str = "",
+        offset: int = 0,
+        limit: int = 2000,
+    ) -> dict:
+        return await self._post("stores/search", {
+            "query": query,
+            "offset": offset,
+            "limit": limit,
+        })
+
+    async def search_product(
+        self,
+        query: str,
+        store_id: str,
+        language: str = "fi",
+        offset: int = 0,
+        limit: int = 100,
+        discount_filter: bool = False,
+        is_tos_tr_offer: bool = False,
+    ) -> dict:
+        params = {
+            "offset": offset,
+            "language": language,
+            "storeId": store_id,
+            "limit": limit,
+            "discountFilter": discount_filter,
+            "isTosTrOffer": is_tos_tr_offer,
+        }
+        return await self._post_with_params(f"v2/product-search/{query}", params)
+
+    async def search_offers(
+        self,
+        store_id: str,
+        category_path: str,
+        offset: int = 0,
+        language: str = "fi",
+    ) -> dict:
+        """Search offers by category path (see ``helpers.search_offers``)."""
+        return await self._get("search-offers/", {
+            "storeId": store_id,
+            "offset": offset,
+            "categoryPath": category_path,
+            "language": language,
+        })
+
+    # ------------------------------------------------------------------
+    # Bulk / aggregation helpers
+    # ------------------------------------------------------------------
+
+    async def fetch_all_categories(self, store_id: str) -> list[dict]:
+        """Return offer categories for a store."""
+        resp = await self.fetch_offer_categories(store_id)
+        return resp.get("offerCategories", [])
+
+    async def fetch_all_offers_for_category(self, store_id: str, slug: str) -> dict:
+        """Paginate through all offers in a single category.
+
+        Same return shape and re-paging rules as
+        ``helpers.fetch_all_offers_for_category``: after the first page every
+        remaining offset is requested at once and the limiter paces them.
+        """
+        t0 = time.perf_counter()
+
+        first = await self._post_with_retry(
+            "offer-category", helpers._offer_category_payload(store_id, slug, 0),
+        )
+        api_calls = 1
+        total_hits = first.get("totalHits", 0)
+        pages = {0: first}
+
+        for round_no in range(helpers.MAX_REPAGE_ROUNDS + 1):
+            if not first.get("offers"):
+                break
+            offsets = helpers._pages_to_fetch(pages, total_hits)
+            if not offsets:
+                break
+            if round_no == helpers.MAX_REPAGE_ROUNDS:
+                logger.warning(
+                    "Category '%s': totalHits still changing after %d re-page "
+                    "rounds, keeping %d stale page(s)",
+                    slug, helpers.MAX_REPAGE_ROUNDS, len(offsets),
+                )
+                break
+
+            arrived: list[dict] = []
+
+            async def fetch(offset: int) -> dict:
+                page = await self._post_with_retry(
+                    "offer-category",
+                    helpers._offer_category_payload(store_id, slug, offset),
+                )
+                arrived.append(page)
+                return page
+
+            results = await asyncio.gather(*(fetch(offset) for offset in offsets))
+            api_calls += len(offsets)
+            pages.update(zip(offsets, results))
+            total_hits = helpers._newest_total(arrived, total_hits)
+
+        elapsed = time.perf_counter() - t0
+        return {
+            "category": slug,
+            "totalHits": total_hits or 0,
+            "offers": helpers._merge_pages(pages, total_hits),
+            "apiCalls": api_calls,
+            "elapsedSeconds": round(elapsed, 3),
+        }
+
+    async def search_all_offers_for_store(self, store_id: str) -> dict:
+        """Fetch ALL offers for a store, paginating every category concurrently.
+
+        Same return shape as ``helpers.search_all_offers_for_store``; the
+        categories are in flight together and the global limiter alone
+        decides the request rate.
+        """
+        t0 = time.perf_counter()
+        api_calls = 0
+
+        categories = await self.fetch_all_categories(store_id)
+        api_calls += 1
+        slugs = [c.get("slug", "") for c in categories if c.get("slug")]
+
+        results = await asyncio.gather(
+            *(self.fetch_all_offers_for_category(store_id, slug) for slug in slugs),
+            return_exceptions=True,
+        )
+
+        # Deduplicate by offer ID in category order (same as the sync helper)
+        all_offers_by_id: dict[str, dict] = {}
+        for slug, result in zip(slugs, results):
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "Store %s: category '%s' failed, skipping (%s)",
+                    store_id, slug, result,
+                )
+                continue
+            api_calls += result["apiCalls"]
+            for offer in result["offers"]:
+                oid = offer.get("id", "")
+                if oid and oid not in all_offers_by_id:
+                    all_offers_by_id[oid] = offer
+
+        offers = list(all_offers_by_id.values())
+        elapsed = time.perf_counter() - t0
+        return {
+            "storeId": store_id,
+            "totalHits": len(offers),
+            "offers": offers,
+            "apiCalls": api_calls,
+            "elapsedSeconds": round(elapsed, 3),
+        }
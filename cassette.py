@@ -0,0 +1,139 @@
+"""
+Record/replay cassettes for the K-Ruoka transport.
+
+Record mode captures every request that ``helpers._http_request`` answers
+(method, URL relative to ``BASE_URL``, JSON body, status, response text and
+latency) into a JSON-lines cassette — gzip-compressed when the path ends in
+``.gz``.  Replay mode serves those responses without curl_cffi, FlareSolverr
+or the network, sleeping ``latency × speed`` per request so runs keep their
+original (``speed=1``), compressed (``0 < speed < 1``) or no (``speed=0``)
+timing.  Repeated identical requests are replayed in recorded order; once a
+key's recordings are used up the last one is served again.
+
+Enable from the environment (read by ``helpers`` at import):
+    KRUOKA_CASSETTE=cassettes/n110.jsonl.gz
+    KRUOKA_CASSETTE_MODE=record | replay
+    KRUOKA_REPLAY_SPEED=0.1
+"""
+import gzip
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import json_codec
+from response_cache import canonical_key
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode got a request that was never recorded."""
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """One cassette file in either ``record`` or ``replay`` mode."""
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._interactions: dict[str, deque] = {}
+        self._last: dict[str, dict] = {}
+        self.counters = {"recorded": 0, "replayed": 0, "misses": 0}
+
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Start a fresh cassette for this run
+            with _open(path, "w"):
+                pass
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body: dict | None,
+        status_code: int,
+        text: str,
+        elapsed: float,
+    ) -> None:
+        """Append one interaction to the cassette file."""
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "body": body,
+            "status": status_code,
+            "text": text,
+            "elapsed": round(elapsed, 4),
+            "at": round(time.monotonic() - self._t0, 4),
+        }
+        line = json_codec.dumps_str(entry)
+        with self._lock:
+            with _open(self.path, "a") as f:
+                f.write(line + "\n")
+            self.counters["recorded"] += 1
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        count = 0
+        with _open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json_codec.loads(line)
+                key = canonical_key(entry["method"], entry["url"], entry.get("body"))
+                self._interactions.setdefault(key, deque()).append(entry)
+                count += 1
+        logger.info(
+            "Cassette: loaded %d interactions (%d unique) from %s",
+            count, len(self._interactions), self.path,
+        )
+
+    def lookup(self, method: str, url: str, body: dict | None) -> dict:
+        """Return the next recorded interaction for this request.
+
+        Raises ``CassetteMiss`` when the request was never recorded.
+        """
+        key = canonical_key(method, url, body)
+        with self._lock:
+            queue = self._interactions.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                self.counters["misses"] += 1
+                raise CassetteMiss(
+                    f"No recorded response for {method.upper()} {url} {body!r}"
+                )
+            self.counters["replayed"] += 1
+        return entry
+
+    def delay_for(self, entry: dict) -> float:
+        """Seconds to sleep before serving *entry* at the configured speed."""
+        return max(0.0, entry.get("elapsed", 0.0) * self.speed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **self.counters}
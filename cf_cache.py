@@ -0,0 +1,98 @@
+"""
+Encrypted on-disk cache of the Cloudflare clearance.
+
+Resolving Cloudflare (FlareSolverr, 2Captcha + Patchright, or the browser
+fallback) takes from tens of seconds to minutes, yet ``cf_clearance`` usually
+stays valid far longer than one sync run.  ``ClearanceCache`` stores the
+k-ruoka cookies, the user agent they were issued to and their expiry in a
+small file encrypted with Fernet (AES-128-CBC + HMAC-SHA256, from the
+``cryptography`` package), so the next process can start with one cheap
+verification request instead of a fresh challenge.
+
+The key comes from ``KRUOKA_CF_CACHE_KEY`` — either a Fernet key
+(``Fernet.generate_key()``) or any passphrase, which is stretched with
+SHA-256.  Without a key, or without ``cryptography`` installed, the cache is
+simply disabled.  A file that fails to decrypt (wrong key, tampering) or has
+expired is ignored.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _fernet(key: str):
+    from cryptography.fernet import Fernet
+
+    try:
+        return Fernet(key.encode("ascii"))
+    except (ValueError, UnicodeEncodeError):
+        # Not a Fernet key — derive one from the passphrase
+        return Fernet(base64.urlsafe_b64encode(hashlib.sha256(key.encode("utf-8")).digest()))
+
+
+class ClearanceCache:
+    """Fernet-encrypted ``{cookies, userAgent, expiresAt}`` file for one site."""
+
+    def __init__(self, path: str, key: str, site_url: str, min_remaining: float = 120.0):
+        self.path = path
+        self.site_url = site_url
+        self.min_remaining = min_remaining  # don't reuse a clearance about to lapse
+        self._fernet = _fernet(key)
+
+    def load(self) -> tuple[dict, str, float] | None:
+        """Return ``(cookies, user_agent, expires_at)``, or None if unusable."""
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.path, "rb") as f:
+                token = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            entry = json.loads(self._fernet.decrypt(token))
+        except (InvalidToken, ValueError):
+            logger.warning("CF cache: cannot decrypt %s — ignoring it", self.path)
+            return None
+
+        if entry.get("siteUrl") != self.site_url:
+            return None
+        remaining = entry["expiresAt"] - time.time()
+        if remaining <= 0:
+            logger.info("CF cache: clearance expired %.0fs ago", -remaining)
+            return None
+        if remaining < self.min_remaining:
+            logger.info("CF cache: clearance expires in %.0fs, too close to reuse", remaining)
+            return None
+        logger.info("CF cache: clearance valid for another %.0f min", remaining / 60)
+        return entry["cookies"], entry["userAgent"], entry["expiresAt"]
+
+    def save(self, cookies: dict, user_agent: str, expires_at: float) -> None:
+        """Encrypt and atomically write the clearance."""
+        token = self._fernet.encrypt(json.dumps({
+            "siteUrl": self.site_url,
+            "cookies": cookies,
+            "userAgent": user_agent,
+            "expiresAt": expires_at,
+            "savedAt": time.time(),
+        }).encode("utf-8"))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(token)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.path)
+        logger.info(
+            "CF cache: saved %d cookies (valid for %.0f min)",
+            len(cookies), (expires_at - time.time()) / 60,
+        )
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
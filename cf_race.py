@@ -0,0 +1,189 @@
+"""
+Racing and bookkeeping for the Cloudflare bypass strategies.
+
+``race()`` starts every configured strategy in its own thread — staggered so
+the preferred (cheaper / historically faster) ones get a head start — takes
+the first one that returns a valid clearance and cancels the rest.
+Strategies cooperate through ``sleep()`` / ``check()``: inside a race these
+raise ``CfCancelled`` once another strategy has won, so 2Captcha stops
+polling and Patchright browsers are torn down by their ``finally`` blocks.
+Outside a race they are plain ``time.sleep`` / no-ops.
+
+``StrategyStats`` records per-strategy attempts, successes and an EWMA of the
+time to a clearance in a small JSON file, and orders the strategies by
+expected time-to-clearance (latency ÷ smoothed success rate) once each has
+enough history.  Both the sequential fallback and the race use that order.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class CfCancelled(RuntimeError):
+    """Another strategy already produced a clearance."""
+
+
+def sleep(seconds: float) -> None:
+    """``time.sleep`` that aborts with ``CfCancelled`` when the race is over."""
+    cancel = getattr(_local, "cancel", None)
+    if cancel is None:
+        time.sleep(seconds)
+    elif cancel.wait(seconds):
+        raise CfCancelled()
+
+
+def check() -> None:
+    """Raise ``CfCancelled`` if this strategy's race has already been won."""
+    cancel = getattr(_local, "cancel", None)
+    if cancel is not None and cancel.is_set():
+        raise CfCancelled()
+
+
+def racing() -> bool:
+    """True when called from a strategy running inside ``race()``."""
+    return getattr(_local, "cancel", None) is not None
+
+
+class StrategyStats:
+    """Persisted success rate and latency per CF bypass strategy."""
+
+    def __init__(self, path: str | None, min_attempts: int = 3, alpha: float = 0.3):
+        self.path = path
+        self.min_attempts = min_attempts
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.strategies: dict[str, dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.strategies = json.load(f).get("strategies", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("CF strategy stats: ignoring unreadable %s: %s", self.path, e)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"strategies": self.strategies}, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("CF strategy stats: could not write %s: %s", self.path, e)
+
+    def record(self, name: str, ok: bool, seconds: float) -> None:
+        """Record one finished attempt (cancelled attempts are not recorded)."""
+        with self._lock:
+            s = self.strategies.setdefault(
+                name, {"attempts": 0, "successes": 0, "latencyEwma": None},
+            )
+            s["attempts"] += 1
+            if ok:
+                s["successes"] += 1
+                prev = s["latencyEwma"]
+                s["latencyEwma"] = round(
+                    seconds if prev is None else prev + self.alpha * (seconds - prev), 2,
+                )
+            self._save()
+
+    def expected_seconds(self, name: str) -> float | None:
+        """Expected time to a clearance, or None without enough history."""
+        s = self.strategies.get(name)
+        if not s or s["attempts"] < self.min_attempts or s["latencyEwma"] is None:
+            return None
+        success_rate = (s["successes"] + 1) / (s["attempts"] + 2)  # Laplace-smoothed
+        return s["latencyEwma"] / success_rate
+
+    def order(self, names: list[str]) -> list[str]:
+        """*names* sorted by expected time; the given order until all have history."""
+        with self._lock:
+            costs = [self.expected_seconds(n) for n in names]
+        if any(c is None for c in costs):
+            return list(names)
+        return [n for _, n in sorted(zip(costs, names), key=lambda p: p[0])]
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {name: dict(s) for name, s in self.strategies.items()}
+
+
+def race(strategies, stats: StrategyStats | None = None, stagger: float = 0.0):
+    """Run ``[(name, fn), ...]`` concurrently; return ``(name, (cookies, ua))``.
+
+    Strategy *i* starts ``i × stagger`` seconds after the first.  Losers are
+    cancelled and clean up in their own (daemon) threads — the winner's
+    clearance is returned without waiting for them.  Raises ``RuntimeError``
+    when every strategy fails.
+    """
+    cancel = threading.Event()
+    results: queue.Queue = queue.Queue()
+
+    def run(name, fn, delay):
+        _local.cancel = cancel
+        try:
+            if cancel.wait(delay):
+                return
+            t0 = time.monotonic()
+            logger.info("CF race: starting %s", name)
+            try:
+                value = fn()
+            except CfCancelled:
+                logger.info("CF race: %s cancelled", name)
+                return
+            except Exception as e:
+                if not cancel.is_set():
+                    if stats is not None:
+                        stats.record(name, False, time.monotonic() - t0)
+                    results.put((name, None, e))
+                return
+            elapsed = time.monotonic() - t0
+            if stats is not None:
+                stats.record(name, True, elapsed)
+            results.put((name, value, elapsed))
+        finally:
+            _local.cancel = None
+            if not cancel.is_set():
+                results.put(None)  # "finished" marker for the failure count
+
+    threads = [
+        threading.Thread(
+            target=run, args=(name, fn, i * stagger),
+            name=f"cf-race-{name}", daemon=True,
+        )
+        for i, (name, fn) in enumerate(strategies)
+    ]
+    for t in threads:
+        t.start()
+
+    finished = 0
+    last_error = None
+    try:
+        while finished < len(threads):
+            item = results.get()
+            if item is None:
+                finished += 1
+                continue
+            name, value, detail = item
+            if value is None:
+                logger.warning("CF race: %s failed: %s", name, detail)
+                last_error = detail
+                continue
+            logger.info("CF race: %s won after %.1fs", name, detail)
+            return name, value
+    finally:
+        cancel.set()
+
+    raise RuntimeError(f"All CF bypass strategies failed. Last error: {last_error}")
@@ -0,0 +1,196 @@
+"""
+Cross-run cache of compound-offer compositions, stored once per campaign.
+
+A compound (multi-product) offer lists no products; ``fetch-offers`` has to
+be asked which products it bundles.  The same chain campaign — same offer
+``id``, ``campaignId`` and ``offerNameId`` — runs in dozens of stores, and
+its composition does not change while the campaign lasts.
+``CompositionCache`` keeps each composition's product skeletons (EANs,
+names, category tree, images, campaign pricing) once per campaign, shared
+by every store that lists it, so a store calls ``fetch-offers`` for an
+offer once and reuses the composition on later runs.
+
+Only ``offerType == "chain"`` offers share an entry between stores;
+store-local offers are keyed by their store.  Price and availability are
+store-specific, so each store that fetched the offer keeps its own record
+in the entry: the EANs its fetch reported unavailable, and the listing
+pricing (``pricing`` / ``normalPricing``) the offer had at that fetch.
+A store is served the composition only from its own record:
+
+  - a store without one fetches: another store's fetch does not tell its
+    availability, so stores share the stored composition (one copy, with
+    the campaign pricing of the latest fetch), not the fetch itself;
+  - a store whose listing pricing differs from its record fetches again,
+    which refreshes its availability and the shared campaign pricing;
+  - every ``recheck_every`` runs each store re-fetches each cached
+    composition it lists (staggered per store and offer), which refreshes
+    its availability while the pricing stays the same.
+
+Entries expire when the campaign ends (the products' ``mobilescan``
+discount / batch ``endDate``) or after ``max_age`` seconds without one.
+The cache is one gzipped JSON file, kept next to the offer state.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 3  # 3: each store's record keeps the listing pricing of its fetch
+STORE_SPECIFIC_KEYS = ("store", "availability", "isAvailable")  # dropped from skeletons
+
+
+def _valid_to(products: list[dict]) -> float | None:
+    """Latest campaign end date (epoch seconds) among *products*, or None."""
+    ends = []
+    for wrapper in products:
+        pricing = ((wrapper.get("product") or {}).get("mobilescan") or {}).get("pricing") or {}
+        for kind in ("discount", "batch"):
+            end = (pricing.get(kind) or {}).get("endDate")
+            if not end:
+                continue
+            try:
+                ends.append(datetime.fromisoformat(end.replace("Z", "+00:00")).timestamp())
+            except ValueError:
+                pass
+    return max(ends) if ends else None
+
+
+def _listing_pricing(offer: dict) -> list:
+    """The store-specific prices a listing shows for *offer* (JSON-comparable)."""
+    return [offer.get("pricing"), offer.get("normalPricing")]
+
+
+def _skeleton(wrapper: dict) -> dict:
+    product = {k: v for k, v in (wrapper.get("product") or {}).items() if k not in STORE_SPECIFIC_KEYS}
+    return {"id": wrapper.get("id"), "product": product}
+
+
+class CompositionCache:
+    """Compound-offer compositions, one per campaign, reused across runs."""
+
+    def __init__(self, path: str, recheck_every: int = 12, max_age: float = 14 * 86400):
+        self.path = path
+        self.recheck_every = max(1, recheck_every)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        self.runs = 0
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "repriced": 0, "rechecks": 0}
+        self._load()
+
+    def _load(self) -> None:
+        data = {}
+        try:
+            with gzip.open(self.path, "rb") as f:
+                data = json_codec.loads(f.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, EOFError) as e:
+            logger.warning("Composition cache: ignoring unreadable %s: %s", self.path, e)
+        if data.get("version") == CACHE_VERSION:
+            self.entries = data.get("entries", {})
+            self.runs = data.get("runs", 0)
+        self.runs += 1
+
+    @staticmethod
+    def key(store_id: str, offer: dict) -> str:
+        """Cache key: the campaign, plus the store for store-local offers."""
+        campaign = f"{offer.get('id')}|{offer.get('campaignId')}|{offer.get('offerNameId')}"
+        return campaign if offer.get("offerType") == "chain" else f"{store_id}|{campaign}"
+
+    def _due(self, store_id: str, key: str) -> bool:
+        phase = int(hashlib.sha1(f"{store_id}|{key}".encode()).hexdigest(), 16)
+        return (self.runs + phase) % self.recheck_every == 0
+
+    def lookup(self, store_id: str, offer: dict) -> dict | None:
+        """A fetch-offers style entry for *offer* in *store_id*, or None to fetch it."""
+        key = self.key(store_id, offer)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if (entry["validTo"] or entry["fetchedAt"] + self.max_age) < now:
+                del self.entries[key]
+                self.counters["expired"] += 1
+                return None
+            mine = entry["stores"].get(store_id)
+            if mine is None:
+                self.counters["misses"] += 1  # no availability of its own yet
+                return None
+            if mine["pricing"] != _listing_pricing(offer):
+                self.counters["repriced"] += 1
+                return None
+            if self._due(store_id, key):
+                self.counters["rechecks"] += 1
+                return None
+            self.counters["hits"] += 1
+            unavailable = set(mine["unavailable"])
+        products = []
+        for wrapper in entry["products"]:
+            product = dict(wrapper["product"])
+            product["availability"] = {"store": product.get("ean") not in unavailable}
+            products.append({"id": wrapper["id"], "product": product})
+        return {**offer, "products": products}
+
+    def record(self, store_id: str, detail_offer: dict) -> None:
+        """Remember the composition, and this store's availability and pricing, of a fetched offer."""
+        products = detail_offer.get("products") or []
+        if not products:
+            return
+        key = self.key(store_id, detail_offer)
+        unavailable = [
+            (w.get("product") or {}).get("ean") for w in products
+            if ((w.get("product") or {}).get("availability") or {}).get("store") is False
+        ]
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {"stores": {}}
+            entry.update({
+                "products": [_skeleton(w) for w in products],
+                "validTo": _valid_to(products),
+                "fetchedAt": time.time(),
+            })
+            entry["stores"][store_id] = {
+                "unavailable": unavailable,
+                "pricing": _listing_pricing(detail_offer),
+            }
+
+    def summary(self) -> dict:
+        with self._lock:
+            looked_up = sum(self.counters.values())
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "hitRate": round(self.counters["hits"] / looked_up, 3) if looked_up else 0.0,
+            }
+
+    def save(self) -> None:
+        """Atomically rewrite the cache file, dropping ended campaigns."""
+        now = time.time()
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            entries = {
+                k: e for k, e in self.entries.items()
+                if (e["validTo"] or e["fetchedAt"] + self.max_age) >= now
+            }
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with gzip.open(tmp, "wb", compresslevel=5) as f:
+                    f.write(json_codec.dumps({
+                        "version": CACHE_VERSION,
+                        "runs": self.runs,
+                        "entries": entries,
+                    }))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning("Composition cache: could not write %s: %s", self.path, e)
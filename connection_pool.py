@@ -0,0 +1,182 @@
+"""
+Shared keep-alive connection pool for the blocking K-Ruoka transport.
+
+curl_cffi's blocking ``Session`` gives every thread its own curl handle, so
+each worker thread opened (and TLS-handshook) its own connections to
+www.k-ruoka.fi and never shared them.  ``SharedConnectionPool`` instead runs
+one curl_cffi ``AsyncSession`` — a single libcurl multi handle — on a private
+event-loop thread and lets any thread submit requests to it:
+
+  - all requests share one connection cache, bounded by ``max_connections``
+  - with the Chrome impersonation profile the TLS handshake negotiates HTTP/2
+    (ALPN), and concurrent requests are multiplexed as streams over the same
+    connection (``CURLPIPE_MULTIPLEX``); plain-HTTP hosts fall back to
+    HTTP/1.1 keep-alive
+  - ``max_streams`` bounds how many requests are in flight at once
+  - ``prewarm()`` opens connections before the first real request
+
+The pool quacks like a blocking ``Session`` (``get``, ``post``, ``headers``,
+``cookies``, ``close``), so helpers.py can hand it to every thread.  It counts
+new connections, TLS handshakes, connection reuse and HTTP/2 responses from
+libcurl's per-transfer info (``stats()``).
+"""
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CURLPIPE_MULTIPLEX = 2
+HTTP_VERSION_2 = 3  # CURLINFO_HTTP_VERSION value for HTTP/2
+
+
+def _multi_setopt(acurl, option, value: int) -> None:
+    """Set a long option on *acurl*'s multi handle.
+
+    ``AsyncCurl.setopt`` hands libcurl a ``long *`` for these options, which
+    ``curl_multi_setopt`` reads as the value itself — every limit ended up
+    as a pointer address, i.e. unlimited.  Pass the value in the pointer.
+    """
+    from curl_cffi._wrapper import ffi, lib
+
+    code = lib.curl_multi_setopt(acurl._curlm, option, ffi.cast("void *", value))
+    if code != 0:
+        raise RuntimeError(f"curl_multi_setopt({option!r}, {value}) failed: {code}")
+
+
+class SharedConnectionPool:
+    """One multiplexed libcurl connection pool shared by every thread."""
+
+    def __init__(
+        self,
+        impersonate: str = "chrome",
+        max_connections: int = 4,
+        max_streams: int = 32,
+        http2: bool = True,
+    ):
+        self.max_connections = max_connections
+        self.max_streams = max_streams
+        self.http2 = http2
+        self._lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "newConnections": 0,
+            "reusedConnections": 0,
+            "tlsHandshakes": 0,
+            "http2Responses": 0,
+        }
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="kruoka-pool", daemon=True,
+        )
+        self._thread.start()
+        self._session = self._run(self._create_session(impersonate))
+
+    # ------------------------------------------------------------------
+    # Event-loop plumbing
+    # ------------------------------------------------------------------
+
+    def _run(self, coro):
+        """Run *coro* on the pool's loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _create_session(self, impersonate: str):
+        from curl_cffi.const import CurlInfo, CurlMOpt
+        from curl_cffi.requests import AsyncSession
+
+        session = AsyncSession(
+            impersonate=impersonate,
+            max_clients=self.max_streams,
+            curl_infos=[CurlInfo.NUM_CONNECTS, CurlInfo.APPCONNECT_TIME_T],
+        )
+        acurl = session.acurl
+        _multi_setopt(acurl, CurlMOpt.MAX_HOST_CONNECTIONS, self.max_connections)
+        _multi_setopt(acurl, CurlMOpt.MAX_TOTAL_CONNECTIONS, self.max_connections)
+        _multi_setopt(acurl, CurlMOpt.MAXCONNECTS, self.max_connections)  # idle keep-alive cache
+        if self.http2:
+            _multi_setopt(acurl, CurlMOpt.PIPELINING, CURLPIPE_MULTIPLEX)
+        return session
+
+    # ------------------------------------------------------------------
+    # Session-compatible API
+    # ------------------------------------------------------------------
+
+    @property
+    def headers(self):
+        return self._session.headers
+
+    @property
+    def cookies(self):
+        return self._session.cookies
+
+    def request(self, method: str, url: str, **kwargs):
+        """Send a request through the shared pool (blocks the calling thread)."""
+        return self._run(self._request(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def _request(self, method: str, url: str, **kwargs):
+        from curl_cffi.const import CurlInfo
+
+        resp = await self._session.request(method, url, **kwargs)
+        infos = getattr(resp, "infos", {}) or {}
+        new_connections = int(infos.get(CurlInfo.NUM_CONNECTS) or 0)
+        with self._lock:
+            self.counters["requests"] += 1
+            if new_connections:
+                self.counters["newConnections"] += new_connections
+            else:
+                self.counters["reusedConnections"] += 1
+            if infos.get(CurlInfo.APPCONNECT_TIME_T):
+                self.counters["tlsHandshakes"] += 1
+            if resp.http_version == HTTP_VERSION_2:
+                self.counters["http2Responses"] += 1
+        return resp
+
+    def prewarm(self, url: str, connections: int | None = None) -> int:
+        """Open up to *connections* keep-alive connections with concurrent HEADs.
+
+        Over HTTP/2 one connection carries every stream, so a single HEAD is
+        enough.  Returns the number of new connections the warm-up opened.
+        """
+        before = self.counters["newConnections"]
+
+        async def warm(n: int):
+            await asyncio.gather(
+                *(self._request("HEAD", url, timeout=15) for _ in range(n)),
+                return_exceptions=True,
+            )
+
+        self._run(warm(1))
+        if self.counters["http2Responses"] == 0:
+            wanted = min(connections or self.max_connections, self.max_connections)
+            if wanted > 1:
+                self._run(warm(wanted))  # concurrent, so each needs a connection
+        opened = self.counters["newConnections"] - before
+        logger.info(
+            "Connection pool warmed: %d new connection(s) to %s (%s)",
+            opened, url, "HTTP/2" if self.counters["http2Responses"] else "HTTP/1.1",
+        )
+        return opened
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self.counters)
+        s["reuseRatio"] = round(s["reusedConnections"] / s["requests"], 3) if s["requests"] else 0.0
+        return s
+
+    def close(self) -> None:
+        """Close every connection and stop the pool's event loop."""
+        if not self._loop.is_running():
+            return
+        try:
+            self._run(self._session.close())
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
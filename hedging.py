@@ -0,0 +1,128 @@
+"""
+Tail-latency hedging for the K-Ruoka transport.
+
+``HedgeController`` learns the latency distribution of each endpoint class
+from successful responses and, once it has enough samples, tells the
+transport when a request has run past the class's p95.  The transport then
+sends one duplicate (after reserving a normal rate-limit slot, so hedges
+spend the same request budget as everything else) and uses whichever
+response arrives first.
+
+Hedges are capped at ``max_fraction`` of all requests, so a slow upstream
+cannot double the load on it.  When the hedge wins, the primary keeps running
+in the background and its eventual latency (or the timeout it hit) is used to
+work out how much tail time the hedge saved; the run summary reports it.
+"""
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeController:
+    """Per-endpoint-class p95 tracking plus a capped hedge budget."""
+
+    def __init__(
+        self,
+        max_fraction: float = 0.05,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.5,
+    ):
+        self.max_fraction = max_fraction
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = {}
+        self.counters = {
+            "requests": 0,
+            "hedged": 0,
+            "hedgeWins": 0,
+            "primaryWins": 0,
+            "budgetDenied": 0,
+            "timeouts": 0,
+        }
+        self.saved_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Latency model
+    # ------------------------------------------------------------------
+
+    def observe(self, endpoint_class: str, latency: float) -> None:
+        """Record the latency of a successful response."""
+        with self._lock:
+            samples = self._samples.get(endpoint_class)
+            if samples is None:
+                samples = self._samples[endpoint_class] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def hedge_delay(self, endpoint_class: str) -> float | None:
+        """Seconds after which to hedge, or None while the p95 is still unknown."""
+        with self._lock:
+            samples = self._samples.get(endpoint_class)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    # ------------------------------------------------------------------
+    # Budget and outcomes
+    # ------------------------------------------------------------------
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.counters["requests"] += 1
+
+    def try_acquire(self) -> bool:
+        """Claim a hedge if that keeps hedges within ``max_fraction`` of requests."""
+        with self._lock:
+            if self.counters["hedged"] + 1 > self.max_fraction * self.counters["requests"]:
+                self.counters["budgetDenied"] += 1
+                return False
+            self.counters["hedged"] += 1
+            return True
+
+    def record_win(self, hedge_won: bool) -> None:
+        with self._lock:
+            self.counters["hedgeWins" if hedge_won else "primaryWins"] += 1
+
+    def record_saved(self, seconds: float) -> None:
+        """Tail time saved by a winning hedge (primary latency − hedge answer)."""
+        if seconds > 0:
+            with self._lock:
+                self.saved_seconds += seconds
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.counters["timeouts"] += 1
+
+    def summary(self) -> dict:
+        """Return counters, the current p95 per class and the tail time saved."""
+        p95 = {
+            name: round(delay, 3)
+            for name in list(self._samples)
+            if (delay := self.hedge_delay(name)) is not None
+        }
+        with self._lock:
+            return {
+                **self.counters,
+                "savedSeconds": round(self.saved_seconds, 3),
+                "p95": p95,
+            }
+
+    def log_summary(self) -> None:
+        """Log hedge counters and saved tail time (end-of-run summary)."""
+        s = self.summary()
+        logger.info(
+            "Hedging: %d/%d requests hedged (%d won, %d lost, %d denied by "
+            "budget), %.1fs tail time saved, %d timeouts",
+            s["hedged"], s["requests"], s["hedgeWins"], s["primaryWins"],
+            s["budgetDenied"], s["savedSeconds"], s["timeouts"],
+        )
+        for name, delay in sorted(s["p95"].items()):
+            logger.info("  %-16s p95 %.2fs", name, delay)
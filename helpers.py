@@ -8,38 +8,208 @@ CF bypass strategies (tried in order):
 
 After the CF challenge is solved, all API calls use curl_cffi with Chrome TLS
 impersonation + the obtained cf_clearance cookies.  This is much faster than
-browser-based fetch().
+browser-based fetch().  Every thread shares one keep-alive, HTTP/2-capable
+connection pool (connection_pool.py).
 """
 import time
 import json
 import logging
 import math
 import os
+import queue
 import threading
-from urllib.parse import urlencode
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlencode, urlparse
+
+from rate_control import AimdRateController, EndpointRateLimiter
+from response_cache import ResponseCache, canonical_key
+from cassette import Cassette
+from cf_cache import ClearanceCache
+import cf_race
+from connection_pool import SharedConnectionPool
+from hedging import HedgeController
+import json_codec
+from offer_state import OfferStateStore
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://www.k-ruoka.fi/kr-api"
-SITE_URL = "https://www.k-ruoka.fi"
+# Overridable so the transport can run against scripts/kruoka_simulator.py
+BASE_URL = os.environ.get("KRUOKA_BASE_URL", "https://www.k-ruoka.fi/kr-api")
+SITE_URL = os.environ.get("KRUOKA_SITE_URL", "https://www.k-ruoka.fi")
 API_HEADERS = {
     "x-k-build-number": "29159",
     "x-k-experiments": "ab4d.10001.0!d2ae.10003.0!a.00145.0!a.00150.0!a.00154.1",
 }
 
+# API limits measured by scripts/probe_limits.py, if it has been run.  The
+# hand-found values below are the fallback for every limit the file lacks.
+API_LIMITS_PATH = os.environ.get(
+    "KRUOKA_API_LIMITS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "api-limits.json"),
+)
+
+
+API_LIMIT_KEYS = ("offerCategoryLimit", "searchOffersPageSize", "searchOffersMaxOffset", "fetchOffersBatch")
+
+
+def _load_api_limits(path: str) -> dict:
+    """Positive integer limits (and the limit-parameter flag) from *path*."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("API limits: ignoring unreadable %s: %s", path, e)
+        return {}
+    limits = {
+        key: data[key] for key in API_LIMIT_KEYS
+        if isinstance(data.get(key), int) and not isinstance(data[key], bool) and data[key] > 0
+    }
+    limits["searchOffersLimitParam"] = data.get("searchOffersLimitParam") is True
+    logger.info("API limits from %s (probed %s): %s", path, data.get("probedAt", "?"), limits)
+    return limits
+
+
+_api_limits = _load_api_limits(API_LIMITS_PATH)
+
 # API constraints discovered via benchmarking
-MAX_OFFER_CATEGORY_LIMIT = 25  # API returns 400 for anything above 25
-SEARCH_OFFERS_PAGE_SIZE = 48   # search-offers returns up to 48 per page
+MAX_OFFER_CATEGORY_LIMIT = _api_limits.get("offerCategoryLimit", 25)  # 400 above 25
+SEARCH_OFFERS_PAGE_SIZE = _api_limits.get("searchOffersPageSize", 48)  # results per page
+SEARCH_OFFERS_MAX_OFFSET = _api_limits.get("searchOffersMaxOffset", 1000)  # nothing from here on
+FETCH_OFFERS_MAX_IDS = _api_limits.get("fetchOffersBatch", 25)  # offerIds per fetch-offers call
+# search-offers takes a ``limit`` parameter that raises its page size
+SEARCH_OFFERS_LIMIT_PARAM = _api_limits.get("searchOffersLimitParam", False)
 MAX_RETRIES = 2
 RETRY_BACKOFF = 1.5             # seconds, multiplied by attempt number
 
-# Global rate limiting — enforces max request rate across ALL threads
-# 0.5s = 2 req/s, proven safe from benchmarking (see AGENTS.md).
-GLOBAL_MIN_INTERVAL = 0.5       # seconds between requests (~2 req/s)
+# Global rate limiting — enforces max request rate across ALL threads.
+# The rate is adaptive (AIMD, see rate_control.py); 0.5s = 2 req/s is the
+# proven-safe starting point used when no saved rate exists (see AGENTS.md).
+GLOBAL_MIN_INTERVAL = 0.5       # starting seconds between requests (~2 req/s)
+GLOBAL_BURST = 3                # requests the global ceiling lets through at once
+MIN_RATE = 0.5                  # never go below 1 request per 2s
+MAX_RATE = float(os.environ.get("KRUOKA_MAX_RATE", "5.0"))
+RATE_STATE_PATH = os.environ.get(
+    "KRUOKA_RATE_STATE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rate-state.json"),
+)
 MAX_429_RETRIES = 4              # retry attempts on HTTP 429
 INITIAL_429_BACKOFF = 15.0       # first 429 backoff; doubles each retry
 MAX_403_RETRIES = 1              # re-auth attempts on HTTP 403
 
+# Per-endpoint-class rate controllers: (max req/s, burst).  Each class backs
+# off on its own 429s and latency spikes and recovers up to this rate; the
+# global rate controller above is the ceiling over all of them.  Override
+# with KRUOKA_ENDPOINT_LIMITS='{"category-page": [3.0, 8]}'.
+ENDPOINT_RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "categories": (2.0, 8),        # offer-categories — cheap, once per store
+    "category-page": (2.0, 6),     # offer-category pages — heavy payloads
+    "fetch-offers": (1.0, 2),      # compound batches of up to 25 offer IDs
+    "search-offers": (2.0, 4),
+    "stores": (0.5, 1),            # stores/search — one huge response
+}
+DEFAULT_ENDPOINT_RATE_LIMIT = (1.0, 2)
+ENDPOINT_RATE_LIMITS.update({
+    name: (float(rate), int(burst))
+    for name, (rate, burst) in json.loads(
+        os.environ.get("KRUOKA_ENDPOINT_LIMITS", "{}")
+    ).items()
+})
+
+# Encrypted Cloudflare clearance cache (see cf_cache.py) — enabled by setting
+# KRUOKA_CF_CACHE_KEY.  A cached clearance is verified with one request and
+# reused until it expires, skipping FlareSolverr / 2Captcha / the browser.
+CF_CACHE_PATH = os.environ.get(
+    "KRUOKA_CF_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cf-clearance.bin"),
+)
+CF_CACHE_KEY = os.environ.get("KRUOKA_CF_CACHE_KEY", "")
+CF_CACHE_DEFAULT_TTL = 30 * 60   # assumed lifetime when the cookie has no expiry
+
+# Re-solve CF in the background this long before the clearance expires, so a
+# long run never stalls on an expired cookie (KRUOKA_CF_REFRESH=0 disables).
+CF_PROACTIVE_REFRESH = os.environ.get("KRUOKA_CF_REFRESH", "1") != "0"
+CF_REFRESH_MARGIN = 5 * 60
+CF_REFRESH_RETRY = 60.0          # seconds between failed background attempts
+
+# CF bypass strategies normally run one after another.  KRUOKA_CF_RACE=1
+# starts them concurrently instead (each CF_RACE_STAGGER seconds after the
+# previous one) and keeps the first clearance — see cf_race.py.  Per-strategy
+# success rate and latency are persisted and decide the order in both modes.
+CF_RACE = os.environ.get("KRUOKA_CF_RACE") == "1"
+CF_RACE_STAGGER = float(os.environ.get("KRUOKA_CF_RACE_STAGGER", "10"))
+CF_STRATEGY_STATS_PATH = os.environ.get(
+    "KRUOKA_CF_STRATEGY_STATS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cf-strategy-stats.json"),
+)
+
+# Shared connection pool (see connection_pool.py): every thread's requests go
+# through one libcurl multi handle — at most POOL_MAX_CONNECTIONS keep-alive
+# connections, HTTP/2-multiplexed when the server negotiates it.
+POOL_MAX_CONNECTIONS = int(os.environ.get("KRUOKA_POOL_CONNECTIONS", "4"))
+POOL_MAX_STREAMS = 32            # requests in flight across all threads
+POOL_HTTP2 = os.environ.get("KRUOKA_HTTP2", "1") != "0"
+POOL_PREWARM = int(os.environ.get("KRUOKA_POOL_PREWARM", "2"))  # connections at startup
+
+# Per-endpoint-class request deadlines (seconds) — a hung page now fails
+# (and is retried) instead of blocking its pagination loop forever.
+# Override with KRUOKA_TIMEOUTS='{"category-page": 45}'.
+ENDPOINT_TIMEOUTS: dict[str, float] = {
+    "categories": 20.0,
+    "category-page": 30.0,
+    "fetch-offers": 30.0,
+    "search-offers": 30.0,
+    "stores": 60.0,                # one ~1 MB response
+}
+DEFAULT_ENDPOINT_TIMEOUT = 30.0
+ENDPOINT_TIMEOUTS.update({
+    name: float(seconds)
+    for name, seconds in json.loads(os.environ.get("KRUOKA_TIMEOUTS", "{}")).items()
+})
+
+# Hedged requests (see hedging.py) — off unless KRUOKA_HEDGE=1.  A request
+# still running after its endpoint's learned p95 gets one duplicate; hedges
+# are capped at HEDGE_MAX_FRACTION of all requests.
+HEDGE_REQUESTS = os.environ.get("KRUOKA_HEDGE") == "1"
+HEDGE_MAX_FRACTION = float(os.environ.get("KRUOKA_HEDGE_MAX_FRACTION", "0.05"))
+HEDGE_POOL_SIZE = 16             # worker threads shared by primaries and hedges
+
+# How fetch_store_offers_planned fetches a store: "auto" probes search-offers
+# for totalHits and picks the plan with the fewest API calls; "search" and
+# "categories" force one (stores past the search-offers cap always walk
+# categories).
+FETCH_PLAN = os.environ.get("KRUOKA_FETCH_PLAN", "auto")
+
+# Intra-category pagination: once the first offer-category page reports
+# totalHits, the remaining pages are fetched concurrently (the rate limiter
+# still decides when each one goes out).  1 restores serial paging.
+PAGE_CONCURRENCY = int(os.environ.get("KRUOKA_PAGE_CONCURRENCY", "6"))
+MAX_REPAGE_ROUNDS = 2            # re-fetches when totalHits moves mid-category
+STREAM_PREFETCH_PAGES = 8        # pages iter_store_offers buffers ahead of its consumer
+
+# Incremental paging (see offer_state.py) — off unless KRUOKA_OFFER_STATE_DIR
+# is set or a script calls enable_offer_state().  A listing whose first page
+# is unchanged reuses the previous run's offers; every
+# OFFER_STATE_FULL_REFRESH_EVERY runs each store is paged in full anyway.
+OFFER_STATE_FULL_REFRESH_EVERY = int(os.environ.get("KRUOKA_FULL_REFRESH_EVERY", "12"))
+
+# Optional on-disk response cache (see response_cache.py) — off unless
+# KRUOKA_CACHE_DIR is set or a script calls enable_response_cache().
+RESPONSE_CACHE_TTLS = {             # seconds, per endpoint class
+    "stores": 24 * 3600,
+    "categories": 3600,
+    "category-page": 3600,
+    "fetch-offers": 3600,
+    "search-offers": 3600,
+}
+RESPONSE_CACHE_MAX_MB = int(os.environ.get("KRUOKA_CACHE_MAX_MB", "256"))
+
+# Cassette replay normally skips the rate limiter (the recorded latencies
+# already pace it); set KRUOKA_REPLAY_RATE_LIMIT=1 to keep it in the loop
+# when comparing limiter changes offline.
+REPLAY_RATE_LIMIT = os.environ.get("KRUOKA_REPLAY_RATE_LIMIT") == "1"
+
 # Helsinki geo-filtering
 HELSINKI_LAT = 60.1699
 HELSINKI_LON = 24.9384
@@ -52,67 +222,216 @@ MAX_DISTANCE_KM = 50
 
 _cf_cookies: dict[str, str] = {}  # shared CF cookies (read-only after init)
 _cf_user_agent: str = ""
-_init_lock = threading.Lock()  # one-time initialisation guard
+_cf_expires_at: float | None = None   # when the current cf_clearance lapses
+_cf_expiry_hint: float | None = None  # cf_clearance expiry seen by the last strategy
+_clearance_cache: ClearanceCache | None = None
+_cf_strategy_stats = cf_race.StrategyStats(CF_STRATEGY_STATS_PATH)
+_init_lock = threading.RLock()  # guards initialisation and re-authentication
+_cf_generation = 0  # bumped every time new CF credentials are installed
+_refresh_timer: threading.Timer | None = None
 _initialised = False
-_thread_local = threading.local()  # per-thread curl_cffi sessions
-
-# Global rate-limiter state
-_rate_lock = threading.Lock()
-_last_request_time = 0.0
+_pool: SharedConnectionPool | None = None  # shared by every thread
+
+# Global rate-limiter state (shared by the sync and async transports)
+_rate_controller = AimdRateController(
+    initial_rate=1.0 / GLOBAL_MIN_INTERVAL,
+    burst=GLOBAL_BURST,
+    min_rate=MIN_RATE,
+    max_rate=MAX_RATE,
+    state_path=RATE_STATE_PATH,
+)
+_endpoint_limiter = EndpointRateLimiter(
+    _rate_controller, ENDPOINT_RATE_LIMITS, default=DEFAULT_ENDPOINT_RATE_LIMIT,
+)
+
+_hedger = HedgeController(max_fraction=HEDGE_MAX_FRACTION)
+_hedge_pool: ThreadPoolExecutor | None = None
+_hedge_pool_lock = threading.Lock()
+_page_pool: ThreadPoolExecutor | None = None
+_page_pool_lock = threading.Lock()
+_offer_state: OfferStateStore | None = None
+
+# URL path prefix → endpoint class (first match wins)
+_ENDPOINT_CLASSES = (
+    ("offer-categories", "categories"),
+    ("offer-category", "category-page"),
+    ("fetch-offers", "fetch-offers"),
+    ("search-offers", "search-offers"),
+    ("stores/search", "stores"),
+)
 
 
 def _ensure_session():
-    """Get or create an authenticated curl_cffi session for the current thread.
+    """Return the shared, CF-authenticated connection pool.
 
-    The first call resolves Cloudflare (inside a lock).  Subsequent calls
-    (including from worker threads) create a lightweight per-thread session
-    that shares the same cookies, enabling true parallel HTTP requests.
+    The first call resolves Cloudflare (inside a lock), creates the
+    ``SharedConnectionPool`` and pre-warms it.  Every thread then sends its
+    requests through that one pool, so keep-alive connections (and HTTP/2
+    streams) are shared instead of each thread handshaking its own.
     """
-    global _cf_cookies, _cf_user_agent, _initialised
+    global _initialised, _pool
 
-    # One-time CF resolution
     if not _initialised:
         with _init_lock:
             if not _initialised:
-                from curl_cffi.requests import Session as _Sess
-
-                cookies, user_agent = _resolve_cloudflare()
-                _cf_cookies = cookies
-                _cf_user_agent = user_agent
-
-                # Create the first session and verify it works
-                s = _Sess(impersonate="chrome")
-                s.headers.update({
-                    "User-Agent": _cf_user_agent,
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                    **API_HEADERS,
-                })
-                for name, value in _cf_cookies.items():
-                    s.cookies.set(name, value, domain=".k-ruoka.fi")
-
-                _thread_local.session = s
-                _verify_session(s)
+                if _pool is None:
+                    _pool = SharedConnectionPool(
+                        impersonate="chrome",
+                        max_connections=POOL_MAX_CONNECTIONS,
+                        max_streams=POOL_MAX_STREAMS,
+                        http2=POOL_HTTP2,
+                    )
+
+                if not _use_cached_clearance(_pool):
+                    _install_credentials(*_resolve_cloudflare())
+                    _verify_session(_pool)
+                    _save_clearance()
+                if POOL_PREWARM > 1:
+                    _pool.prewarm(f"{SITE_URL}/", POOL_PREWARM)
                 _initialised = True
 
-    # Per-thread session (lazily created)
-    s = getattr(_thread_local, "session", None)
-    if s is not None:
-        return s
+    return _pool
 
-    from curl_cffi.requests import Session as _Sess
 
-    s = _Sess(impersonate="chrome")
-    s.headers.update({
+def _apply_cf_credentials(session) -> None:
+    """Copy the shared CF cookies, user agent and API headers onto *session*.
+
+    Works for both ``curl_cffi.requests.Session`` and ``AsyncSession``.
+    """
+    session.headers.update({
         "User-Agent": _cf_user_agent,
         "Accept": "application/json",
         "Content-Type": "application/json",
         **API_HEADERS,
     })
+    domain = _cookie_domain()
+    session.cookies.clear()  # drop cookies from an earlier (stale) clearance
     for name, value in _cf_cookies.items():
-        s.cookies.set(name, value, domain=".k-ruoka.fi")
-    _thread_local.session = s
-    return s
+        session.cookies.set(name, value, domain=domain)
+
+
+def _install_credentials(
+    cookies: dict, user_agent: str, expires_at: float | None = None,
+) -> int:
+    """Make *cookies* the current CF credentials; return the new generation.
+
+    The expiry defaults to the ``cf_clearance`` expiry the strategy saw (or
+    CF_CACHE_DEFAULT_TTL from now).  Sessions built for an older generation
+    — the async client's, for instance — rebuild themselves lazily; the
+    shared pool is updated here.  A proactive refresh is scheduled ahead of
+    the expiry.
+    """
+    global _cf_cookies, _cf_user_agent, _cf_expires_at, _cf_generation
+    with _init_lock:
+        _cf_cookies = cookies
+        _cf_user_agent = user_agent
+        _cf_expires_at = expires_at or _cf_expiry_hint or time.time() + CF_CACHE_DEFAULT_TTL
+        if _pool is not None:
+            _apply_cf_credentials(_pool)
+        # Bump only after the pool carries the new cookies, so a request
+        # tagged with the new generation never goes out with the old ones
+        _cf_generation += 1
+        _schedule_refresh()
+        return _cf_generation
+
+
+def _schedule_refresh() -> None:
+    """(Re)arm the background refresh CF_REFRESH_MARGIN before expiry."""
+    global _refresh_timer
+    if _refresh_timer is not None:
+        _refresh_timer.cancel()
+        _refresh_timer = None
+    if not CF_PROACTIVE_REFRESH or _cf_expires_at is None:
+        return
+    delay = max(CF_REFRESH_RETRY, _cf_expires_at - CF_REFRESH_MARGIN - time.time())
+    _refresh_timer = threading.Timer(delay, _refresh_in_background, args=(_cf_generation,))
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+
+
+def _refresh_in_background(generation: int) -> None:
+    """Solve CF again before the clearance lapses, without blocking requests.
+
+    Requests keep using the current cookies while the (slow) solve runs; the
+    new ones are swapped in only if nobody re-authenticated meanwhile.
+    """
+    global _refresh_timer
+    if generation != _cf_generation or not _initialised:
+        return
+    logger.info("Proactively refreshing CF clearance before it expires...")
+    try:
+        cookies, user_agent = _resolve_cloudflare()
+    except Exception as e:
+        logger.warning("Proactive CF refresh failed: %s — retrying in %.0fs", e, CF_REFRESH_RETRY)
+        with _init_lock:
+            # close_browser() clears _initialised — never re-arm after it
+            if generation == _cf_generation and _initialised:
+                _refresh_timer = threading.Timer(
+                    CF_REFRESH_RETRY, _refresh_in_background, args=(generation,),
+                )
+                _refresh_timer.daemon = True
+                _refresh_timer.start()
+        return
+    with _init_lock:
+        if generation != _cf_generation or not _initialised:
+            return  # a 403-triggered re-auth got there first, or we shut down
+        _install_credentials(cookies, user_agent)
+        _save_clearance()
+    logger.info("Proactive CF refresh complete (generation %d)", _cf_generation)
+
+
+def _get_clearance_cache() -> ClearanceCache | None:
+    """The encrypted clearance cache, or None when no key / cryptography."""
+    global _clearance_cache
+    if _clearance_cache is None and CF_CACHE_KEY:
+        try:
+            _clearance_cache = ClearanceCache(CF_CACHE_PATH, CF_CACHE_KEY, SITE_URL)
+        except ImportError:
+            logger.warning("CF cache disabled — `pip install cryptography` to enable it")
+    return _clearance_cache
+
+
+def _use_cached_clearance(pool) -> bool:
+    """Install a cached clearance on *pool* if it still verifies; else False."""
+    cache = _get_clearance_cache()
+    cached = cache.load() if cache is not None else None
+    if cached is None:
+        return False
+    cookies, user_agent, expires_at = cached
+    _install_credentials(cookies, user_agent, expires_at)
+    try:
+        _verify_session(pool)
+    except Exception as e:
+        logger.info("CF cache: cached clearance rejected (%s) — resolving afresh", e)
+        cache.clear()
+        return False
+    logger.info("CF cache: reusing cached clearance — skipped CF bypass")
+    return True
+
+
+def _save_clearance() -> None:
+    """Persist the clearance just installed."""
+    cache = _get_clearance_cache()
+    if cache is None:
+        return
+    try:
+        cache.save(_cf_cookies, _cf_user_agent, _cf_expires_at)
+    except OSError as e:
+        logger.warning("CF cache: could not write %s: %s", cache.path, e)
+
+
+def _note_cookie_expiry(cookies: list[dict]) -> None:
+    """Remember when ``cf_clearance`` expires (FlareSolverr / Playwright cookie dicts)."""
+    global _cf_expiry_hint
+    for c in cookies:
+        if c.get("name") == "cf_clearance" and (c.get("expires") or -1) > 0:
+            _cf_expiry_hint = float(c["expires"])
+
+
+def _cookie_domain() -> str:
+    """Cookie domain for SITE_URL (``.k-ruoka.fi`` in production)."""
+    host = urlparse(SITE_URL).hostname or ""
+    return ".k-ruoka.fi" if host.endswith("k-ruoka.fi") else host
 
 
 def _verify_session(session):
@@ -132,30 +451,49 @@ def _resolve_cloudflare() -> tuple[dict, str]:
 
     Returns (cookies_dict, user_agent).
     """
-    strategies = []
+    global _cf_expiry_hint
+    _cf_expiry_hint = None
+    strategies = {}
 
     # Strategy 1: FlareSolverr (free, Docker service)
     if os.environ.get("FLARESOLVERR_URL"):
-        strategies.append(("FlareSolverr", _resolve_cf_flaresolverr))
+        strategies["FlareSolverr"] = _resolve_cf_flaresolverr
 
     # Strategy 2: 2Captcha (cheap, reliable)
     if os.environ.get("CAPTCHA_API_KEY"):
-        strategies.append(("2Captcha", _resolve_cf_2captcha))
+        strategies["2Captcha"] = _resolve_cf_2captcha
 
     # Strategy 3: Direct browser (auto-click, unreliable)
-    strategies.append(("Browser", _resolve_cf_browser))
+    strategies["Browser"] = _resolve_cf_browser
+
+    # Reorder by past success rate and latency once there is history
+    order = _cf_strategy_stats.order(list(strategies))
+
+    if CF_RACE and len(order) > 1:
+        logger.info("Racing CF bypass strategies: %s", ", ".join(order))
+        name, (cookies, ua) = cf_race.race(
+            [(name, strategies[name]) for name in order],
+            stats=_cf_strategy_stats, stagger=CF_RACE_STAGGER,
+        )
+        logger.info(
+            "CF bypass succeeded with %s (cookies: %s)", name, list(cookies.keys()),
+        )
+        return cookies, ua
 
     last_error = None
-    for name, fn in strategies:
+    for name in order:
+        t0 = time.monotonic()
         try:
             logger.info("Trying CF bypass: %s...", name)
-            cookies, ua = fn()
+            cookies, ua = strategies[name]()
+            _cf_strategy_stats.record(name, True, time.monotonic() - t0)
             logger.info(
                 "CF bypass succeeded with %s (cookies: %s)",
                 name, list(cookies.keys()),
             )
             return cookies, ua
         except Exception as e:
+            _cf_strategy_stats.record(name, False, time.monotonic() - t0)
             logger.warning("CF bypass via %s failed: %s", name, e)
             last_error = e
 
@@ -164,6 +502,26 @@ def _resolve_cloudflare() -> tuple[dict, str]:
     )
 
 
+def cf_strategy_summary() -> dict:
+    """Per-strategy attempts, successes and latency EWMA (persisted across runs)."""
+    return _cf_strategy_stats.summary()
+
+
+def _browser_profile_dir(strategy: str) -> str:
+    """Patchright profile directory for *strategy*.
+
+    Chromium cannot share a profile between two running browsers, so while
+    racing the 2Captcha token injection gets its own profile next to the
+    cached ``.chrome-profile`` the direct browser uses.
+    """
+    name = ".chrome-profile"
+    if strategy != "Browser" and cf_race.racing():
+        name = f".chrome-profile-{strategy.lower()}"
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 # ---------------------------------------------------------------------------
 # Strategy 1: FlareSolverr
 # ---------------------------------------------------------------------------
@@ -188,6 +546,7 @@ def _resolve_cf_flaresolverr() -> tuple[dict, str]:
         )
 
     solution = data["solution"]
+    _note_cookie_expiry(solution.get("cookies", []))
     cookies = {}
     for c in solution.get("cookies", []):
         cookies[c["name"]] = c["value"]
@@ -236,7 +595,7 @@ def _resolve_cf_2captcha() -> tuple[dict, str]:
     # Poll for the solved token (up to 120s)
     token = None
     for _ in range(40):
-        time.sleep(5)
+        cf_race.sleep(5)
         resp = stdlib_requests.get("https://2captcha.com/res.php", params={
             "key": api_key,
             "action": "get",
@@ -292,11 +651,9 @@ def _inject_turnstile_token(token: str) -> tuple[dict, str]:
     and return the resulting cookies + user agent."""
     from patchright.sync_api import sync_playwright
 
+    cf_race.check()
     pw = sync_playwright().start()
-    profile_dir = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), ".chrome-profile",
-    )
-    os.makedirs(profile_dir, exist_ok=True)
+    profile_dir = _browser_profile_dir("2Captcha")
 
     try:
         ctx = pw.chromium.launch_persistent_context(
@@ -310,7 +667,7 @@ def _inject_turnstile_token(token: str) -> tuple[dict, str]:
             f"{SITE_URL}/kauppa",
             wait_until="domcontentloaded", timeout=60000,
         )
-        time.sleep(3)
+        cf_race.sleep(3)
 
         # Inject the token via Turnstile callback
         safe_token = token.replace("\\", "\\\\").replace('"', '\\"')
@@ -333,21 +690,22 @@ def _inject_turnstile_token(token: str) -> tuple[dict, str]:
             """
             % (safe_token, safe_token)
         )
-        time.sleep(5)
+        cf_race.sleep(5)
 
         # Wait for CF to resolve
         for _ in range(30):
             try:
                 title = page.title() or ""
             except Exception:
-                time.sleep(2)
+                cf_race.sleep(2)
                 continue
             if "moment" not in title.lower() and "verif" not in title.lower():
                 break
-            time.sleep(1)
+            cf_race.sleep(1)
 
         # Extract cookies
         cookies_list = ctx.cookies()
+        _note_cookie_expiry(cookies_list)
         cookies = {
             c["name"]: c["value"]
             for c in cookies_list
@@ -381,10 +739,7 @@ def _resolve_cf_browser() -> tuple[dict, str]:
     from patchright.sync_api import sync_playwright
 
     pw = sync_playwright().start()
-    profile_dir = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), ".chrome-profile",
-    )
-    os.makedirs(profile_dir, exist_ok=True)
+    profile_dir = _browser_profile_dir("Browser")
 
     try:
         logger.info("Launching Patchright browser for direct CF bypass...")
@@ -408,6 +763,7 @@ def _resolve_cf_browser() -> tuple[dict, str]:
 
         # Extract cookies
         cookies_list = ctx.cookies()
+        _note_cookie_expiry(cookies_list)
         cookies = {
             c["name"]: c["value"]
             for c in cookies_list
@@ -440,7 +796,7 @@ def _wait_for_cloudflare_browser(page, timeout: int = 90):
             title = page.title() or ""
         except Exception:
             logger.info("Page navigating... waiting for reload")
-            time.sleep(3)
+            cf_race.sleep(3)
             try:
                 page.wait_for_load_state("domcontentloaded", timeout=15000)
             except Exception:
@@ -459,7 +815,7 @@ def _wait_for_cloudflare_browser(page, timeout: int = 90):
             _try_click_turnstile_browser(page)
             clicked = i == 30
 
-        time.sleep(1)
+        cf_race.sleep(1)
 
     raise RuntimeError(f"CF challenge did not resolve within {timeout}s")
 
@@ -488,60 +844,93 @@ def _try_click_turnstile_browser(page):
 
 def close_browser():
     """Clean up session resources."""
-    global _initialised
-    s = getattr(_thread_local, "session", None)
-    if s is not None:
+    global _initialised, _pool, _refresh_timer
+    with _init_lock:
+        timer, _refresh_timer = _refresh_timer, None
+        if timer is not None:
+            timer.cancel()
+        pool, _pool = _pool, None
+        _initialised = False
+    # A refresh already past cancel() may still be solving CF; wait for it
+    # (outside the lock it needs) so it cannot outlive the session.
+    if timer is not None and timer is not threading.current_thread():
+        timer.join()
+    if pool is not None:
+        logger.info("Connection pool: %s", pool.stats())
         try:
-            s.close()
+            pool.close()
         except Exception:
             pass
-        _thread_local.session = None
-    _initialised = False
 
 
-def _re_authenticate():
-    """Invalidate current CF session and re-resolve Cloudflare.
+def _re_authenticate(stale_generation: int | None = None) -> int:
+    """Re-resolve Cloudflare after a 403; return the current generation.
 
-    Called when a 403 response suggests the CF cookies have expired.
-    Resets the global init flag so the next ``_ensure_session()`` call
-    triggers a fresh CF bypass.
+    Single-flight: the first caller solves CF while holding the lock; callers
+    whose request used *stale_generation* credentials wait for it and then
+    return at once, because the generation has already moved on.  So N
+    threads hitting 403 together cost one CF solve, not N.  The connection
+    pool (and its warm connections) is kept; only its cookies and user agent
+    are replaced.
     """
-    global _initialised, _cf_cookies, _cf_user_agent
-    logger.warning("Re-authenticating — resetting CF session...")
-
-    # Close current thread session
-    s = getattr(_thread_local, "session", None)
-    if s is not None:
-        try:
-            s.close()
-        except Exception:
-            pass
-        _thread_local.session = None
-
-    # Reset global state so _ensure_session() re-resolves CF
+    _ensure_session()
     with _init_lock:
-        _cf_cookies = {}
-        _cf_user_agent = ""
-        _initialised = False
+        if stale_generation is not None and stale_generation != _cf_generation:
+            return _cf_generation  # another thread already re-authenticated
+
+        logger.warning("Re-authenticating — resetting CF session...")
+        # The cached clearance is what just got rejected
+        cache = _get_clearance_cache()
+        if cache is not None:
+            cache.clear()
+
+        generation = _install_credentials(*_resolve_cloudflare())
+        _verify_session(_pool)
+        _save_clearance()
+    logger.info(
+        "Re-authentication complete — new CF session established (generation %d)",
+        generation,
+    )
+    return generation
 
-    # Trigger fresh CF bypass + session creation
-    _ensure_session()
-    logger.info("Re-authentication complete — new CF session established")
+
+def connection_pool_stats() -> dict | None:
+    """Return the shared pool's connection counters, or None before first use."""
+    pool = _pool
+    return pool.stats() if pool is not None else None
 
 
 # ---------------------------------------------------------------------------
 # HTTP transport (uses curl_cffi session with CF cookies)
 # ---------------------------------------------------------------------------
 
+_UNPARSED = object()
+
+
 class _FetchResponse:
-    """Minimal response wrapper for compatibility."""
+    """Minimal response wrapper for compatibility.
 
-    def __init__(self, status_code: int, body: str):
+    Keeps the raw body bytes; ``text`` is decoded and ``json()`` parsed (with
+    json_codec's fastest backend) at most once, on first use.
+    """
+
+    def __init__(self, status_code: int, body: bytes | str, elapsed: float = 0.0):
         self.status_code = status_code
-        self.text = body
+        self.content = body.encode("utf-8") if isinstance(body, str) else body
+        self.elapsed = elapsed  # seconds for the attempt that produced it
+        self._text = body if isinstance(body, str) else None
+        self._json = _UNPARSED
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.content.decode("utf-8", errors="replace")
+        return self._text
 
     def json(self):
-        return json.loads(self.text)
+        if self._json is _UNPARSED:
+            self._json = json_codec.loads(self.content)
+        return self._json
 
     def raise_for_status(self):
         if self.status_code >= 400:
@@ -553,38 +942,97 @@ def _build_query_string(params: dict) -> str:
     return urlencode({k: v for k, v in params.items() if v is not None})
 
 
-def _rate_limit_wait():
-    """Reserve the next request slot and sleep until it arrives.
+def _endpoint_class(url: str) -> str:
+    """Map a K-Ruoka API URL to its rate-limit class (see ENDPOINT_RATE_LIMITS)."""
+    path = url.split("?", 1)[0]
+    if path.startswith(BASE_URL):
+        path = path[len(BASE_URL):]
+    path = path.lstrip("/")
+    for prefix, name in _ENDPOINT_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return "other"
+
 
-    Uses a lock-free reservation pattern: each caller reserves a future
-    timestamp (at least GLOBAL_MIN_INTERVAL after the previous one),
-    then sleeps outside the lock so other threads can also reserve.
+def _reserve_request_slot(endpoint_class: str = "other") -> float:
+    """Reserve the next request slot for *endpoint_class*; return seconds to wait.
+
+    The slot satisfies both the class's adaptive rate and the global
+    adaptive ceiling.  Callers wait *outside* the limiter lock, so other
+    threads — and the asyncio client in ``async_helpers`` — can reserve
+    concurrently while drawing from the same request budget.
     """
-    global _last_request_time
-    with _rate_lock:
-        now = time.monotonic()
-        wait_time = max(0.0, GLOBAL_MIN_INTERVAL - (now - _last_request_time))
-        _last_request_time = now + wait_time
+    return _endpoint_limiter.reserve(endpoint_class)
+
+
+def _rate_limit_wait(endpoint_class: str = "other"):
+    """Reserve the next request slot and sleep until it arrives."""
+    wait_time = _reserve_request_slot(endpoint_class)
     if wait_time > 0:
         time.sleep(wait_time)
 
 
+def _pause_rate_limiter(seconds: float) -> None:
+    """Push the global rate limiter forward so every caller pauses."""
+    _rate_controller.pause(seconds)
+
+
+def _record_response(status_code: int, latency: float, endpoint_class: str = "other") -> None:
+    """Feed a response status and latency back into the rate controllers."""
+    _endpoint_limiter.record(endpoint_class, status_code, latency)
+
+
+def rate_controller_summary() -> dict:
+    """Return the adaptive rate controller's state, counters and history."""
+    return {
+        **_rate_controller.summary(),
+        "requestsByEndpoint": dict(_endpoint_limiter.counters),
+        "endpointRates": _endpoint_limiter.rates(),
+    }
+
+
+def log_rate_controller_summary() -> None:
+    """Log the adaptive rate controller's state, rate history and per-endpoint counts."""
+    _rate_controller.log_summary()
+    rates = _endpoint_limiter.rates()
+    for name, count in sorted(_endpoint_limiter.counters.items()):
+        rate = rates.get(name, rates["default"])
+        logger.info("  %-16s %d request slot(s), now %.2f req/s", name, count, rate)
+
+
 def _http_request(
     method: str, url: str, body: dict | None = None,
 ) -> _FetchResponse:
-    """Make an HTTP request with global rate limiting, 429 retry, and 403 re-auth."""
-    global _last_request_time
+    """Make an HTTP request with global rate limiting, 429 retry, and 403 re-auth.
+
+    With a cassette in replay mode the response comes from the cassette
+    instead (no session, CF bypass or network); in record mode every live
+    response is appended to it.
+    """
+    cassette = _cassette
+    if cassette is not None and cassette.mode == "replay":
+        return _replay_request(cassette, method, url, body)
+
+    resp = _http_request_live(method, url, body)
+    if cassette is not None:
+        cassette.record(
+            method, _relative_url(url), body,
+            resp.status_code, resp.text, resp.elapsed,
+        )
+    return resp
 
+
+def _http_request_live(
+    method: str, url: str, body: dict | None = None,
+) -> _FetchResponse:
+    """Send the request over the CF-authenticated curl_cffi session."""
     retries_403 = 0
+    endpoint_class = _endpoint_class(url)
 
     for attempt in range(MAX_429_RETRIES + 1):
-        _rate_limit_wait()
-
-        session = _ensure_session()
-        if method.upper() == "GET":
-            resp = session.get(url)
-        else:
-            resp = session.post(url, json=body)
+        _rate_limit_wait(endpoint_class)
+        generation = _cf_generation
+        resp, latency = _send(method, url, body, endpoint_class)
 
         # 403 Forbidden — likely expired CF cookies, re-authenticate once
         if resp.status_code == 403 and retries_403 < MAX_403_RETRIES:
@@ -594,14 +1042,14 @@ def _http_request(
                 "(attempt %d/%d)", retries_403, MAX_403_RETRIES,
             )
             try:
-                _re_authenticate()
+                _re_authenticate(generation)
             except Exception as e:
                 logger.error("Re-authentication failed: %s", e)
-                return _FetchResponse(resp.status_code, resp.text)
+                return _FetchResponse(resp.status_code, resp.content, latency)
             continue
 
         if resp.status_code != 429:
-            return _FetchResponse(resp.status_code, resp.text)
+            return _FetchResponse(resp.status_code, resp.content, latency)
 
         # 429 Too Many Requests — back off and pause all threads
         if attempt < MAX_429_RETRIES:
@@ -611,15 +1059,218 @@ def _http_request(
                 backoff, attempt + 1, MAX_429_RETRIES,
             )
             # Push the global rate limiter forward to pause all threads
-            with _rate_lock:
-                future = time.monotonic() + backoff
-                if future > _last_request_time:
-                    _last_request_time = future
+            _pause_rate_limiter(backoff)
             time.sleep(backoff)
         else:
             logger.error("HTTP 429 after %d retries, giving up", MAX_429_RETRIES)
 
-    return _FetchResponse(resp.status_code, resp.text)
+    return _FetchResponse(resp.status_code, resp.content, latency)
+
+
+def _send(method: str, url: str, body: dict | None, endpoint_class: str):
+    """Send one request (hedged when enabled); return ``(response, latency)``."""
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint_class, DEFAULT_ENDPOINT_TIMEOUT)
+    _hedger.count_request()
+    delay = _hedger.hedge_delay(endpoint_class) if HEDGE_REQUESTS else None
+    if delay is None or delay >= timeout:
+        return _send_once(method, url, body, endpoint_class, timeout)
+    return _send_hedged(method, url, body, endpoint_class, timeout, delay)
+
+
+def _send_once(
+    method: str, url: str, body: dict | None, endpoint_class: str, timeout: float,
+):
+    """One attempt through the shared connection pool, bounded by *timeout*."""
+    from curl_cffi.requests.exceptions import Timeout
+
+    session = _ensure_session()
+    t0 = time.monotonic()
+    try:
+        if method.upper() == "GET":
+            resp = session.get(url, timeout=timeout)
+        else:
+            resp = session.post(
+                url, data=json_codec.dumps(body) if body is not None else None,
+                timeout=timeout,
+            )
+    except Timeout as e:
+        _hedger.record_timeout()
+        _record_response(504, time.monotonic() - t0, endpoint_class)
+        raise TimeoutError(
+            f"{method.upper()} {_relative_url(url)} exceeded {timeout:.0f}s"
+        ) from e
+    latency = time.monotonic() - t0
+    _record_response(resp.status_code, latency, endpoint_class)
+    if resp.status_code < 400:
+        _hedger.observe(endpoint_class, latency)
+    return resp, latency
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=HEDGE_POOL_SIZE, thread_name_prefix="kruoka-hedge",
+                )
+    return _hedge_pool
+
+
+def _send_hedged(
+    method: str, url: str, body: dict | None, endpoint_class: str,
+    timeout: float, delay: float,
+):
+    """Send the request; if it outlives *delay*, race one duplicate against it."""
+    pool = _get_hedge_pool()
+    t0 = time.monotonic()
+    primary = pool.submit(_send_once, method, url, body, endpoint_class, timeout)
+    done, _ = wait([primary], timeout=delay)
+    if done or not _hedger.try_acquire():
+        return primary.result()
+
+    logger.debug(
+        "Hedging %s after %.2fs (p95)", _relative_url(url), time.monotonic() - t0,
+    )
+    _rate_limit_wait(endpoint_class)  # the duplicate spends a normal slot
+    if primary.done() and primary.exception() is None:
+        _hedger.record_win(False)
+        return primary.result()
+    hedge = pool.submit(_send_once, method, url, body, endpoint_class, timeout)
+
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((f for f in done if f.exception() is None), None)
+        if winner is None:
+            continue
+        hedge_won = winner is hedge
+        _hedger.record_win(hedge_won)
+        if hedge_won:
+            answered = time.monotonic() - t0
+            primary.add_done_callback(
+                lambda _f: _hedger.record_saved(time.monotonic() - t0 - answered)
+            )
+        return winner.result()
+
+    _hedger.record_win(False)
+    return primary.result()  # both failed — surface the primary's error
+
+
+def hedging_summary() -> dict:
+    """Return hedge counters, learned p95 per endpoint class and time saved."""
+    return _hedger.summary()
+
+
+def log_hedging_summary() -> None:
+    """Log hedge counts, per-class p95 and the tail time hedging saved."""
+    _hedger.log_summary()
+
+
+# ---------------------------------------------------------------------------
+# Record / replay cassettes
+# ---------------------------------------------------------------------------
+
+_cassette: Cassette | None = None
+
+
+def use_cassette(path: str, mode: str = "replay", speed: float = 1.0) -> Cassette:
+    """Record live responses to, or replay them from, the cassette at *path*.
+
+    ``speed`` scales replayed latencies (1 = original, 0 = no delay).
+    """
+    global _cassette
+    _cassette = Cassette(path, mode=mode, speed=speed)
+    logger.info("Cassette %s mode: %s (speed %.2f)", mode, path, speed)
+    return _cassette
+
+
+def stop_cassette() -> None:
+    """Return to the live transport."""
+    global _cassette
+    _cassette = None
+
+
+def _relative_url(url: str) -> str:
+    """Strip BASE_URL so cassettes replay against any base (e.g. a simulator)."""
+    return url[len(BASE_URL):].lstrip("/") if url.startswith(BASE_URL) else url
+
+
+def _replay_request(
+    cassette: Cassette, method: str, url: str, body: dict | None,
+) -> _FetchResponse:
+    """Serve a request from *cassette*, sleeping for its (scaled) latency."""
+    if REPLAY_RATE_LIMIT:
+        _rate_limit_wait(_endpoint_class(url))
+    entry = cassette.lookup(method, _relative_url(url), body)
+    delay = cassette.delay_for(entry)
+    if delay > 0:
+        time.sleep(delay)
+    return _FetchResponse(entry["status"], entry["text"], entry.get("elapsed", 0.0))
+
+
+if os.environ.get("KRUOKA_CASSETTE"):
+    use_cassette(
+        os.environ["KRUOKA_CASSETTE"],
+        mode=os.environ.get("KRUOKA_CASSETTE_MODE", "replay"),
+        speed=float(os.environ.get("KRUOKA_REPLAY_SPEED", "1.0")),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Optional response cache
+# ---------------------------------------------------------------------------
+
+_response_cache: ResponseCache | None = None
+
+
+def enable_response_cache(
+    directory: str | None = None, max_mb: int | None = None,
+) -> ResponseCache:
+    """Serve ``_post`` / ``_get`` / ``_post_with_params`` through an on-disk cache.
+
+    Defaults to ``$KRUOKA_CACHE_DIR`` (or ``.cache/k-ruoka``) and
+    ``RESPONSE_CACHE_MAX_MB``.  Health checks via ``_post_raw`` are never cached.
+    """
+    global _response_cache
+    directory = directory or os.environ.get("KRUOKA_CACHE_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".cache", "k-ruoka",
+    )
+    _response_cache = ResponseCache(
+        directory,
+        max_bytes=(max_mb or RESPONSE_CACHE_MAX_MB) * 1024 * 1024,
+        ttls=RESPONSE_CACHE_TTLS,
+    )
+    logger.info("Response cache enabled at %s", directory)
+    return _response_cache
+
+
+def disable_response_cache() -> None:
+    """Turn the response cache off (entries stay on disk)."""
+    global _response_cache
+    _response_cache = None
+
+
+def response_cache_stats() -> dict | None:
+    """Hit/miss/eviction counters, or None when the cache is off."""
+    return _response_cache.stats() if _response_cache is not None else None
+
+
+def _cached_json(method: str, endpoint: str, payload: dict | None, fetch) -> dict:
+    """Return ``fetch()``, served from / stored into the response cache if enabled."""
+    cache = _response_cache
+    if cache is None:
+        return fetch()
+    key = canonical_key(method, endpoint, payload)
+    data = cache.get(key, _endpoint_class(endpoint))
+    if data is None:
+        data = fetch()
+        cache.put(key, data, endpoint)
+    return data
+
+
+if os.environ.get("KRUOKA_CACHE_DIR"):
+    enable_response_cache()
 
 
 def _post_raw(endpoint: str, payload: dict) -> _FetchResponse:
@@ -629,16 +1280,19 @@ def _post_raw(endpoint: str, payload: dict) -> _FetchResponse:
 
 
 def _post(endpoint: str, payload: dict) -> dict:
-    resp = _post_raw(endpoint, payload)
-    resp.raise_for_status()
-    return resp.json()
+    def fetch() -> dict:
+        resp = _post_raw(endpoint, payload)
+        resp.raise_for_status()
+        return resp.json()
 
+    return _cached_json("POST", endpoint, payload, fetch)
 
-def _post_with_retry(endpoint: str, payload: dict) -> dict:
-    """POST with retry and backoff for bulk operations."""
+
+def _with_retry(endpoint: str, request: callable) -> dict:
+    """Call *request* with retry and backoff (bulk operations)."""
     for attempt in range(MAX_RETRIES + 1):
         try:
-            return _post(endpoint, payload)
+            return request()
         except Exception:
             if attempt == MAX_RETRIES:
                 raise
@@ -650,20 +1304,38 @@ def _post_with_retry(endpoint: str, payload: dict) -> dict:
             time.sleep(wait)
 
 
+def _post_with_retry(endpoint: str, payload: dict) -> dict:
+    """POST with retry and backoff for bulk operations."""
+    return _with_retry(endpoint, lambda: _post(endpoint, payload))
+
+
+def _get_with_retry(endpoint: str, params: dict) -> dict:
+    """GET with retry and backoff for bulk operations."""
+    return _with_retry(endpoint, lambda: _get(endpoint, params))
+
+
 def _post_with_params(endpoint: str, params: dict) -> dict:
     qs = _build_query_string(params)
     url = f"{BASE_URL}/{endpoint}?{qs}" if qs else f"{BASE_URL}/{endpoint}"
-    resp = _http_request("POST", url)
-    resp.raise_for_status()
-    return resp.json()
+
+    def fetch() -> dict:
+        resp = _http_request("POST", url)
+        resp.raise_for_status()
+        return resp.json()
+
+    return _cached_json("POST", endpoint, params, fetch)
 
 
 def _get(endpoint: str, params: dict) -> dict:
     qs = _build_query_string(params)
     url = f"{BASE_URL}/{endpoint}?{qs}" if qs else f"{BASE_URL}/{endpoint}"
-    resp = _http_request("GET", url)
-    resp.raise_for_status()
-    return resp.json()
+
+    def fetch() -> dict:
+        resp = _http_request("GET", url)
+        resp.raise_for_status()
+        return resp.json()
+
+    return _cached_json("GET", endpoint, params, fetch)
 
 
 # ---------------------------------------------------------------------------
@@ -678,7 +1350,7 @@ def fetch_offer_category(
     store_id: str,
     category: dict,
     offset: int = 0,
-    limit: int = 25,
+    limit: int = MAX_OFFER_CATEGORY_LIMIT,
     pricing: dict | None = None,
 ) -> dict:
     return _post("offer-category", {
@@ -793,6 +1465,181 @@ def fetch_all_categories(store_id: str) -> list[dict]:
     return resp.get("offerCategories", [])
 
 
+def _offer_category_payload(store_id: str, slug: str, offset: int) -> dict:
+    return {
+        "storeId": store_id,
+        "category": {"kind": "productCategory", "slug": slug},
+        "offset": offset,
+        "limit": MAX_OFFER_CATEGORY_LIMIT,
+        "pricing": {},
+    }
+
+
+def _pages_to_fetch(
+    pages: dict[int, dict], total_hits: int, page_size: int = MAX_OFFER_CATEGORY_LIMIT,
+) -> list[int]:
+    """Offsets still needed for a consistent view of a *total_hits* listing.
+
+    A page is stale when it reported a different ``totalHits`` — it was
+    served before the listing changed, so offers may have shifted across
+    its boundaries.  Missing pages (the listing grew) are fetched too;
+    pages past the end (it shrank) are simply dropped by the merge.
+    """
+    return [
+        offset for offset in range(0, total_hits, page_size)
+        if offset not in pages or pages[offset].get("totalHits", total_hits) != total_hits
+    ]
+
+
+def _newest_total(arrived: list[dict], previous: int) -> int:
+    """The listing's current ``totalHits`` after a round of page fetches.
+
+    Every page in a round was requested after *previous* was observed, so a
+    page reporting something else saw a newer state; among those, the one
+    that arrived last wins.
+    """
+    changed = [p["totalHits"] for p in arrived if p.get("totalHits", previous) != previous]
+    return changed[-1] if changed else previous
+
+
+def _merge_pages(
+    pages: dict[int, dict], total_hits: int, items_key: str = "offers",
+) -> list[dict]:
+    """Concatenate pages in offset order, dropping repeated offer IDs."""
+    offers: list[dict] = []
+    seen: set[str] = set()
+    for offset in sorted(pages):
+        if offset >= max(total_hits, 1):
+            break
+        for offer in pages[offset].get(items_key, []):
+            oid = offer.get("id", "")
+            if oid:
+                if oid in seen:
+                    continue
+                seen.add(oid)
+            offers.append(offer)
+    return offers
+
+
+def _get_page_pool() -> ThreadPoolExecutor:
+    global _page_pool
+    if _page_pool is None:
+        with _page_pool_lock:
+            if _page_pool is None:
+                _page_pool = ThreadPoolExecutor(
+                    max_workers=PAGE_CONCURRENCY, thread_name_prefix="kruoka-page",
+                )
+    return _page_pool
+
+
+def _iter_fetched(fetch_page: callable, offsets: list[int]):
+    """Call ``fetch_page(offset)`` for every offset concurrently.
+
+    Yields ``(offset, page)`` in arrival order.  A page that fails after its
+    retries cancels the rest and raises, as serial paging did; so does
+    abandoning the iterator.
+    """
+    if PAGE_CONCURRENCY <= 1 or len(offsets) == 1:
+        for offset in offsets:
+            yield offset, fetch_page(offset)
+        return
+
+    pool = _get_page_pool()
+    futures = {pool.submit(fetch_page, offset): offset for offset in offsets}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class _Pager:
+    """The pages of one listing after its *first* page.
+
+    The first page's ``totalHits`` gives every remaining offset, so those
+    pages are requested concurrently (up to ``PAGE_CONCURRENCY`` in flight,
+    paced by the global rate limiter); iterating yields ``(offset, page)``
+    as they arrive.  If ``totalHits`` moves while paging, the pages served
+    under the old count are fetched again (at most ``MAX_REPAGE_ROUNDS``
+    times).  With ``keep_pages=False`` only each page's ``totalHits`` is
+    remembered, for callers that consume the offers as they stream past.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        fetch_page: callable,
+        first: dict,
+        page_size: int,
+        items_key: str = "offers",
+        keep_pages: bool = True,
+    ):
+        self.label = label
+        self.fetch_page = fetch_page
+        self.first = first
+        self.page_size = page_size
+        self.items_key = items_key
+        self.keep_pages = keep_pages
+        self.total_hits = first.get("totalHits", 0)
+        self.pages: dict[int, dict] = {0: first if keep_pages else self._stub(first)}
+        self.api_calls = 0  # pages fetched after *first*
+
+    @staticmethod
+    def _stub(page: dict) -> dict:
+        return {"totalHits": page["totalHits"]} if "totalHits" in page else {}
+
+    def __iter__(self):
+        for round_no in range(MAX_REPAGE_ROUNDS + 1):
+            if not self.first.get(self.items_key):
+                return
+            offsets = _pages_to_fetch(self.pages, self.total_hits, self.page_size)
+            if not offsets:
+                return
+            if round_no == MAX_REPAGE_ROUNDS:
+                logger.warning(
+                    "%s: totalHits still changing after %d re-page rounds, "
+                    "keeping %d stale page(s)", self.label, MAX_REPAGE_ROUNDS, len(offsets),
+                )
+                return
+            if round_no:
+                logger.info(
+                    "%s: totalHits is now %d, re-fetching %d page(s) from offset %d",
+                    self.label, self.total_hits, len(offsets), offsets[0],
+                )
+
+            arrived = []
+            for offset, page in _iter_fetched(self.fetch_page, offsets):
+                self.api_calls += 1
+                self.pages[offset] = page if self.keep_pages else self._stub(page)
+                arrived.append(self._stub(page))
+                yield offset, page
+            self.total_hits = _newest_total(arrived, self.total_hits)
+
+    def items(self) -> list[dict]:
+        """Every fetched item in offset order, unique by offer ID."""
+        return _merge_pages(self.pages, self.total_hits, self.items_key)
+
+
+def _paginate(
+    label: str,
+    fetch_page: callable,
+    first: dict,
+    page_size: int,
+    items_key: str = "offers",
+    on_page: callable = None,
+) -> tuple[list[dict], int, int]:
+    """Fetch every page after *first*; return ``(items, total_hits, api_calls)``.
+
+    ``api_calls`` counts the pages fetched here, not *first*.
+    """
+    pager = _Pager(label, fetch_page, first, page_size, items_key)
+    for offset, page in pager:
+        if on_page:
+            on_page(offset, len(page.get(items_key, [])), page.get("totalHits", pager.total_hits))
+    return pager.items(), pager.total_hits, pager.api_calls
+
+
 def fetch_all_offers_for_category(
     store_id: str,
     slug: str,
@@ -801,49 +1648,36 @@ def fetch_all_offers_for_category(
 ) -> dict:
     """Paginate through all offers in a single category.
 
+    Pages after the first are fetched concurrently (see ``_paginate``).
+
     Returns dict with keys:
         category: slug
         totalHits: int
-        offers: list[dict]   — all offer objects
+        offers: list[dict]   — all offer objects, unique by offer ID
         apiCalls: int
         elapsedSeconds: float
     """
     t0 = time.perf_counter()
-    api_calls = 0
-    all_offers: list[dict] = []
-    offset = 0
-    total_hits = None
-
-    while True:
-        result = _post_with_retry("offer-category", {
-            "storeId": store_id,
-            "category": {"kind": "productCategory", "slug": slug},
-            "offset": offset,
-            "limit": MAX_OFFER_CATEGORY_LIMIT,
-            "pricing": {},
-        })
-        api_calls += 1
-
-        if total_hits is None:
-            total_hits = result.get("totalHits", 0)
-
-        offers = result.get("offers", [])
-        all_offers.extend(offers)
-
-        if on_page:
-            on_page(slug, offset, len(offers), total_hits)
 
-        if not offers or len(all_offers) >= total_hits:
-            break
+    def fetch_page(offset: int) -> dict:
+        return _post_with_retry(
+            "offer-category", _offer_category_payload(store_id, slug, offset),
+        )
 
-        offset += MAX_OFFER_CATEGORY_LIMIT
+    first = fetch_page(0)
+    if on_page:
+        on_page(slug, 0, len(first.get("offers", [])), first.get("totalHits", 0))
+    offers, total_hits, api_calls = _paginate(
+        f"Category '{slug}'", fetch_page, first, MAX_OFFER_CATEGORY_LIMIT,
+        on_page=(lambda *page: on_page(slug, *page)) if on_page else None,
+    )
 
     elapsed = time.perf_counter() - t0
     return {
         "category": slug,
         "totalHits": total_hits or 0,
-        "offers": all_offers,
-        "apiCalls": api_calls,
+        "offers": offers,
+        "apiCalls": api_calls + 1,
         "elapsedSeconds": round(elapsed, 3),
     }
 
@@ -904,6 +1738,7 @@ def search_all_offers_for_store(
     Strategy:
       1. GET offer-categories → list of category slugs
       2. For each category, paginate offer-category (limit 25) to get all offers
+         — after the first page the remaining pages are fetched concurrently
       3. Fetch categories sequentially with global rate limiting (2 req/s)
       4. Deduplicate offers by offer ID (same offer can appear in multiple categories)
 
@@ -942,7 +1777,7 @@ def search_all_offers_for_store(
 
     # 2. Fetch all offers per category sequentially
     #    Sequential avoids thundering-herd after 429 backoff and keeps
-    #    the request rate predictable at GLOBAL_MIN_INTERVAL.
+    #    the request rate predictable under the global rate controller.
     all_offers_by_id: dict[str, dict] = {}  # deduplicate by offer ID
 
     for slug in slugs:
@@ -970,6 +1805,254 @@ def search_all_offers_for_store(
     }
 
 
+def _search_offers_page(store_id: str, offset: int) -> dict:
+    params = {
+        "storeId": store_id,
+        "offset": offset,
+        "categoryPath": "",
+        "language": "fi",
+    }
+    if SEARCH_OFFERS_LIMIT_PARAM:
+        params["limit"] = SEARCH_OFFERS_PAGE_SIZE
+    return _get_with_retry("search-offers/", params)
+
+
+def enable_offer_state(
+    directory: str | None = None, full_refresh_every: int | None = None,
+) -> OfferStateStore:
+    """Skip re-paging listings whose first page is unchanged (see offer_state.py).
+
+    Defaults to ``$KRUOKA_OFFER_STATE_DIR`` (or ``.offer-state``) and
+    ``OFFER_STATE_FULL_REFRESH_EVERY``.
+    """
+    global _offer_state
+    directory = directory or os.environ.get("KRUOKA_OFFER_STATE_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".offer-state",
+    )
+    _offer_state = OfferStateStore(
+        directory, full_refresh_every or OFFER_STATE_FULL_REFRESH_EVERY,
+    )
+    logger.info("Offer state enabled at %s", directory)
+    return _offer_state
+
+
+def disable_offer_state() -> None:
+    """Page every listing in full again (the state stays on disk)."""
+    global _offer_state
+    _offer_state = None
+
+
+def offer_state_summary() -> dict | None:
+    """Stores saved, full refreshes, reused and re-paged listings, or None when off."""
+    return _offer_state.summary() if _offer_state is not None else None
+
+
+if os.environ.get("KRUOKA_OFFER_STATE_DIR"):
+    enable_offer_state()
+
+
+def _pages(count: int, page_size: int) -> int:
+    return -(-count // page_size) if count > 0 else 0
+
+
+def _iter_planned_pages(store_id: str, plan: str, summary: dict):
+    """Yield a store's offers page by page, deduplicated by offer ID.
+
+    Plans ("auto", "search" or "categories"):
+      search-offers  1 probe + the remaining 48-offer pages — the probe
+                     (search-offers at offset 0) is page one.  Only possible
+                     while totalHits <= SEARCH_OFFERS_MAX_OFFSET.
+      categories     offer-categories + every category walked 25 at a time;
+                     offers listed in several categories are fetched once
+                     per category and dropped here after the first.
+
+    "auto" probes, then compares ceil(T/48) with the categories plan's lower
+    bound of 1 + ceil(T/25).  Once the categories are known the prediction
+    is refined to 1 + Σ ceil(count/25).  *summary* is filled in as paging
+    goes (see ``iter_store_offers``).
+
+    With the offer state store enabled (``enable_offer_state``), a listing
+    whose first page is unchanged since the previous run is served from the
+    stored offers instead of being paged.
+    """
+    t0 = time.perf_counter()
+    seen: set[str] = set()
+    summary.update(storeId=store_id, totalHits=0, apiCalls=0)
+
+    def fresh(items: list[dict]) -> list[dict]:
+        out = []
+        for offer in items:
+            oid = offer.get("id", "")
+            if oid:
+                if oid in seen:
+                    continue
+                seen.add(oid)
+            out.append(offer)
+        summary["totalHits"] += len(out)
+        return out
+
+    def walk(listing, label, fetch_page, first, page_size, items_key):
+        summary["apiCalls"] += 1
+        cached = state.reuse(listing, first, items_key) if state is not None else None
+        if cached is not None:
+            # First page unchanged — take the rest from the previous run
+            summary["reusedListings"] += 1
+            summary["skippedPages"] += max(0, _pages(first.get("totalHits", 0), page_size) - 1)
+            yield fresh(first.get(items_key, []) + cached)
+            return
+        yield fresh(first.get(items_key, []))
+        pager = _Pager(
+            label, fetch_page, first, page_size, items_key, keep_pages=state is not None,
+        )
+        for _, page in pager:
+            summary["apiCalls"] += 1
+            yield fresh(page.get(items_key, []))
+        if state is not None:
+            state.record(listing, first, pager.items(), items_key)
+
+    state = _offer_state.load(store_id) if _offer_state is not None else None
+    if state is not None:
+        summary.update(reusedListings=0, skippedPages=0)
+        if state.full_refresh:
+            logger.info("Store %s: full refresh (run %d)", store_id, state.runs)
+
+    try:
+        if plan != "categories":
+            first = _search_offers_page(store_id, 0)
+            total = first.get("totalHits", 0)
+            search_cost = _pages(total, SEARCH_OFFERS_PAGE_SIZE) or 1
+            category_cost = 1 + _pages(total, MAX_OFFER_CATEGORY_LIMIT)
+            if total <= SEARCH_OFFERS_MAX_OFFSET and (plan == "search" or search_cost <= category_cost):
+                summary.update(plan="search-offers", predictedCalls=search_cost)
+                yield from walk(
+                    "search-offers", f"Store {store_id} search-offers",
+                    lambda offset: _search_offers_page(store_id, offset),
+                    first, SEARCH_OFFERS_PAGE_SIZE, "results",
+                )
+                return
+            summary["apiCalls"] += 1  # the probe, discarded
+            if plan == "search":
+                logger.warning(
+                    "Store %s: %d offers exceed the search-offers cap of %d, "
+                    "walking categories instead", store_id, total, SEARCH_OFFERS_MAX_OFFSET,
+                )
+
+        categories = fetch_all_categories(store_id)
+        summary["apiCalls"] += 1
+        slugs = [c["slug"] for c in categories if c.get("slug")]
+        summary.update(plan="categories", predictedCalls=summary["apiCalls"] + sum(
+            _pages(c.get("count", 0), MAX_OFFER_CATEGORY_LIMIT)
+            for c in categories if c.get("slug")
+        ))
+        if not slugs:
+            logger.warning("Store %s: no offer categories found", store_id)
+
+        for slug in slugs:
+            def fetch_page(offset: int, slug: str = slug) -> dict:
+                return _post_with_retry(
+                    "offer-category", _offer_category_payload(store_id, slug, offset),
+                )
+
+            try:
+                yield from walk(
+                    f"category:{slug}", f"Category '{slug}'", fetch_page, fetch_page(0),
+                    MAX_OFFER_CATEGORY_LIMIT, "offers",
+                )
+            except Exception:
+                logger.warning(
+                    "Store %s: category '%s' failed, skipping",
+                    store_id, slug, exc_info=True,
+                )
+    finally:
+        summary["elapsedSeconds"] = round(time.perf_counter() - t0, 3)
+        if state is not None:
+            _offer_state.save(state)
+
+
+def iter_store_offers(
+    store_id: str,
+    *,
+    plan: str | None = None,
+    summary: dict | None = None,
+    prefetch: int = STREAM_PREFETCH_PAGES,
+):
+    """Yield ALL offers for a store as lists, one page at a time.
+
+    Offers are deduplicated by offer ID across pages, so a consumer can map
+    and write each list as it arrives and never hold the whole store.  The
+    fetch plan is chosen as in ``fetch_store_offers_planned``.  Paging runs
+    in a background thread up to *prefetch* pages ahead of the consumer
+    (0 pages inline), so fetching overlaps whatever the consumer does.
+    Closing the iterator early waits for the page in flight, then stops.
+
+    If given, *summary* is filled with ``storeId``, ``plan``,
+    ``predictedCalls``, ``apiCalls``, ``totalHits`` and ``elapsedSeconds``
+    (final once the iterator is exhausted).
+    """
+    pages = _iter_planned_pages(store_id, plan or FETCH_PLAN, summary if summary is not None else {})
+    if prefetch <= 0:
+        yield from pages
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put(("page", page)):
+                    return
+            put(("done", None))
+        except BaseException as e:
+            put(("error", e))
+        finally:
+            pages.close()
+
+    thread = threading.Thread(target=produce, name=f"kruoka-stream-{store_id}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "page":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        # Let the page in flight finish, so no request outlives the stream
+        stop.set()
+        thread.join()
+
+
+def fetch_store_offers_planned(store_id: str, *, plan: str | None = None) -> dict:
+    """Fetch ALL offers for a store using the plan with the fewest API calls.
+
+    ``plan`` (default ``FETCH_PLAN``) is "auto", "search" or "categories";
+    see ``_iter_planned_pages`` for the cost model.
+
+    Returns the ``search_all_offers_for_store`` shape plus:
+        plan: "search-offers" | "categories"
+        predictedCalls: int   — API calls the chosen plan was expected to need
+    """
+    summary: dict = {}
+    offers = [
+        offer
+        for page in iter_store_offers(store_id, plan=plan, summary=summary, prefetch=0)
+        for offer in page
+    ]
+    return {**summary, "offers": offers}
+
+
 # ---------------------------------------------------------------------------
 # Helsinki geo-filtering
 # ---------------------------------------------------------------------------
@@ -0,0 +1,106 @@
+"""
+Pluggable JSON codec for the K-Ruoka transport.
+
+Responses are kept as the raw bytes curl_cffi read off the socket and parsed
+once with the fastest parser available:
+
+    orjson   (pip install orjson)   — fastest, bytes in / bytes out
+    msgspec  (pip install msgspec)  — close second
+    json     (stdlib)               — always available fallback
+
+Neither fast parser is a hard dependency; the first one that imports wins.
+Force a backend with ``KRUOKA_JSON_CODEC=orjson|msgspec|json`` (e.g. to
+benchmark the stdlib path with orjson installed — see scripts/bench_json.py).
+
+``dumps`` always returns compact UTF-8 bytes, so request bodies, cache entries
+and cassettes are encoded the same way whichever backend is active.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _stdlib_codec():
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode("utf-8")  # faster than letting json sniff the encoding
+        return json.loads(data)
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return loads, dumps
+
+
+def _orjson_codec():
+    import orjson
+
+    return orjson.loads, orjson.dumps
+
+
+def _msgspec_codec():
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def loads(data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return decoder.decode(data)
+
+    return loads, encoder.encode
+
+
+_BACKENDS = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _stdlib_codec,
+}
+
+
+def _select(preferred: str | None) -> tuple[str, object, object]:
+    if preferred:
+        if preferred not in _BACKENDS:
+            raise ValueError(
+                f"Unknown JSON codec {preferred!r} (choose from {', '.join(_BACKENDS)})"
+            )
+        order = [preferred]
+    else:
+        order = list(_BACKENDS)
+    for name in order:
+        try:
+            loads_fn, dumps_fn = _BACKENDS[name]()
+        except ImportError:
+            if preferred:
+                logger.warning("JSON codec %s not installed — using stdlib json", name)
+            continue
+        return name, loads_fn, dumps_fn
+    return ("json", *_stdlib_codec())
+
+
+BACKEND, _loads, _dumps = _select(os.environ.get("KRUOKA_JSON_CODEC") or None)
+
+
+def loads(data: bytes | str):
+    """Parse JSON from raw response bytes (or an already decoded str)."""
+    return _loads(data)
+
+
+def dumps(obj) -> bytes:
+    """Serialize *obj* to compact UTF-8 JSON bytes."""
+    return _dumps(obj)
+
+
+def dumps_str(obj) -> str:
+    """Serialize *obj* to a compact JSON str (for text-based formats)."""
+    return _dumps(obj).decode("utf-8")
+
+
+def use_backend(name: str) -> str:
+    """Switch the active backend at runtime; returns the name actually in use."""
+    global BACKEND, _loads, _dumps
+    BACKEND, _loads, _dumps = _select(name)
+    return BACKEND
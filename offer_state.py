@@ -0,0 +1,130 @@
+"""
+Incremental change detection for store offer listings.
+
+Most offers run for one to two weeks, so between two sync runs most
+categories of most stores are unchanged.  ``OfferStateStore`` keeps, per
+store, a fingerprint of every listing it paged (a category, or the store's
+whole search-offers listing) — ``totalHits`` plus a hash of the first page's
+offer IDs and prices — together with the offers the paging returned.  When
+the next run's first page gives the same fingerprint, the cached offers are
+reused and the remaining pages are skipped.
+
+Changes below the first page go unnoticed, so every ``full_refresh_every``
+runs a store is paged completely anyway.  The refresh run is offset per
+store, which spreads full refreshes evenly over runs.  State is one gzipped
+JSON file per store in a directory the workflow round-trips through
+actions/cache.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def fingerprint(first_page: dict, items_key: str = "offers") -> str:
+    """``totalHits`` plus a hash of the first page's offer IDs and prices."""
+    digest = hashlib.sha1()
+    for offer in first_page.get(items_key, []):
+        pricing = offer.get("pricing") or {}
+        normal = offer.get("normalPricing") or {}
+        digest.update(
+            f"{offer.get('id')}|{pricing.get('price')}|{normal.get('price')};".encode()
+        )
+    return f"{first_page.get('totalHits', 0)}:{digest.hexdigest()[:20]}"
+
+
+class StoreState:
+    """One store's listings for the current run (see ``OfferStateStore.load``)."""
+
+    def __init__(self, store_id: str, listings: dict, runs: int, full_refresh: bool):
+        self.store_id = store_id
+        self.runs = runs
+        self.full_refresh = full_refresh
+        self._previous = listings
+        self.listings: dict[str, dict] = {}  # what this run saw; replaces _previous
+        self.reused = 0
+        self.refreshed = 0
+
+    def reuse(self, listing: str, first_page: dict, items_key: str = "offers") -> list[dict] | None:
+        """The cached offers of *listing* if its first page is unchanged."""
+        entry = self._previous.get(listing)
+        if self.full_refresh or entry is None or entry["fingerprint"] != fingerprint(first_page, items_key):
+            self.refreshed += 1
+            return None
+        self.listings[listing] = entry
+        self.reused += 1
+        return entry["offers"]
+
+    def record(self, listing: str, first_page: dict, offers: list[dict], items_key: str = "offers") -> None:
+        """Remember the offers a full paging of *listing* returned."""
+        self.listings[listing] = {
+            "fingerprint": fingerprint(first_page, items_key),
+            "offers": offers,
+        }
+
+
+class OfferStateStore:
+    """Directory of per-store listing fingerprints and offers."""
+
+    def __init__(self, directory: str, full_refresh_every: int = 12):
+        self.directory = directory
+        self.full_refresh_every = max(1, full_refresh_every)
+        self._lock = threading.Lock()
+        self.counters = {"stores": 0, "fullRefreshes": 0, "reused": 0, "refreshed": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, store_id: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in store_id)
+        return os.path.join(self.directory, f"{safe}.json.gz")
+
+    def _phase(self, store_id: str) -> int:
+        return int(hashlib.sha1(store_id.encode()).hexdigest(), 16) % self.full_refresh_every
+
+    def load(self, store_id: str) -> StoreState:
+        """The store's state for this run; unreadable files count as empty."""
+        data = {}
+        try:
+            with gzip.open(self._path(store_id), "rb") as f:
+                data = json_codec.loads(f.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, EOFError) as e:
+            logger.warning("Offer state: ignoring unreadable state for %s: %s", store_id, e)
+        if data.get("version") != STATE_VERSION:
+            data = {}
+        runs = data.get("runs", 0) + 1
+        full_refresh = (runs + self._phase(store_id)) % self.full_refresh_every == 0
+        return StoreState(store_id, data.get("listings", {}), runs, full_refresh)
+
+    def save(self, state: StoreState) -> None:
+        """Atomically replace the store's file with what this run saw."""
+        path = self._path(state.store_id)
+        tmp = f"{path}.tmp"
+        try:
+            with gzip.open(tmp, "wb", compresslevel=5) as f:
+                f.write(json_codec.dumps({
+                    "version": STATE_VERSION,
+                    "storeId": state.store_id,
+                    "runs": state.runs,
+                    "listings": state.listings,
+                }))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Offer state: could not write %s: %s", path, e)
+            return
+        with self._lock:
+            self.counters["stores"] += 1
+            self.counters["fullRefreshes"] += state.full_refresh
+            self.counters["reused"] += state.reused
+            self.counters["refreshed"] += state.refreshed
+
+    def summary(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,131 @@
+"""
+Per-stage timing for the multi-store sync pipeline.
+
+Store workers in sync_to_supabase.py move between four stages:
+
+  fetch    waiting for the next page of offers from K-Ruoka
+  map      turning raw offers into offer / product rows
+  expand   waiting for fetch-offers batches (compound offers) and mapping
+           their products
+  write    Supabase upserts, product-ID lookups and stale-offer deletes
+
+``StageTimer.stage()`` attributes *exclusive* time: entering a stage inside
+another (a flush triggered while mapping) pauses the outer one, so the
+stages add up to the time the workers were busy.  The run summary reports
+each stage's total, its share of worker time, and the upstream request
+rate actually achieved.
+
+``EtaEstimator`` turns the cost model's predicted API calls into a live ETA.
+Upstream calls are the unit of progress, since the shared rate limiter
+paces the whole run.  Two corrections are made as the run goes: the stores
+finished so far give the ratio of actual to predicted calls, and the
+upstream calls made so far (in-flight stores included) give the rate.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "map", "expand", "write")
+ETA_WARMUP_CALLS = 20  # below this, trust the model's seconds per call over the live rate
+
+
+class StageTimer:
+    """Thread-safe accumulated seconds per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the block as *name*, pausing the enclosing stage meanwhile."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            outer = stack[-1]
+            self.add(outer[0], now - outer[1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            frame = stack.pop()
+            self.add(frame[0], now - frame[1])
+            if stack:
+                stack[-1][1] = now
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: round(seconds, 1) for stage, seconds in self.seconds.items()}
+
+    def log_summary(
+        self, wall_seconds: float, workers: int, upstream_requests: int, upstream_rate: float,
+    ) -> None:
+        """Log stage totals, their share of worker time and upstream throughput."""
+        s = self.summary()
+        busy = sum(s.values()) or 1.0
+        logger.info(
+            "Pipeline: %d store worker(s), %.0fs busy of %.0fs worker time",
+            workers, busy, wall_seconds * workers,
+        )
+        for stage, seconds in s.items():
+            logger.info("  %-7s %8.1fs  %5.1f%%", stage, seconds, 100 * seconds / busy)
+        if wall_seconds > 0:
+            logger.info(
+                "  upstream %d requests = %.2f req/s (limiter now %.2f req/s)",
+                upstream_requests, upstream_requests / wall_seconds, upstream_rate,
+            )
+
+
+class EtaEstimator:
+    """Remaining-time estimate for a run of *predicted_calls* upstream calls."""
+
+    def __init__(self, predicted_calls: float, seconds_per_call: float):
+        self.predicted_calls = predicted_calls
+        self.prior_seconds_per_call = seconds_per_call
+        self._lock = threading.Lock()
+        self._done_predicted = 0.0
+        self._done_actual = 0
+
+    def store_done(self, predicted_calls: float, actual_calls: int) -> None:
+        """Record a finished store's predicted and actual calls."""
+        with self._lock:
+            self._done_predicted += predicted_calls
+            self._done_actual += actual_calls
+
+    def store_skipped(self, predicted_calls: float) -> None:
+        """Drop a store the run will not sync from the predicted total."""
+        with self._lock:
+            self.predicted_calls -= predicted_calls
+
+    def seconds_per_call(self, upstream_calls: int, elapsed: float) -> float:
+        """Live seconds per upstream call, or the model's until warmed up."""
+        if upstream_calls < ETA_WARMUP_CALLS or elapsed <= 0:
+            return self.prior_seconds_per_call
+        return elapsed / upstream_calls
+
+    @property
+    def call_ratio(self) -> float:
+        """Actual over predicted calls of the finished stores (1.0 before any)."""
+        with self._lock:
+            if not self._done_actual or not self._done_predicted:
+                return 1.0
+            return self._done_actual / self._done_predicted
+
+    def remaining_seconds(self, upstream_calls: int, elapsed: float) -> float:
+        """Seconds left, given the upstream calls made in *elapsed* seconds."""
+        remaining = max(self.predicted_calls * self.call_ratio - upstream_calls, 0.0)
+        return remaining * self.seconds_per_call(upstream_calls, elapsed)
+
+    def seconds_for(self, predicted_calls: float, upstream_calls: int, elapsed: float) -> float:
+        """Seconds the run needs for *predicted_calls* more calls at the live rate."""
+        return predicted_calls * self.call_ratio * self.seconds_per_call(upstream_calls, elapsed)
+
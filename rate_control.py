@@ -0,0 +1,434 @@
+"""
+Adaptive request-rate control for the K-Ruoka transport.
+
+``AimdRateController`` replaces the fixed ``GLOBAL_MIN_INTERVAL`` spacing with
+an additive-increase / multiplicative-decrease (AIMD) controller:
+
+  - every ``healthy_window`` consecutive healthy responses raise the rate by
+    ``increase_step`` req/s (slow probe towards the real ceiling) — but only
+    responses to requests the controller's own bucket held back count, so
+    the rate does not creep up while something else limits the traffic
+  - an HTTP 429 cuts the rate by ``decrease_factor`` (at most once per
+    ``decrease_cooldown`` seconds, since in-flight requests fail together)
+  - a latency spike (response slower than ``spike_factor`` × the EWMA
+    latency) cuts it by the gentler ``spike_decrease_factor``
+
+The last rate that survived a full healthy window is persisted to a small JSON
+state file so the next run starts there instead of re-probing from 2 req/s.
+Every rate change is logged and kept in a bounded history for the run summary.
+
+The controller is the *global ceiling*.  ``EndpointRateLimiter`` puts a
+per-endpoint-class controller of its own in front of it, so cheap calls
+(``offer-categories``) and heavy ones (``fetch-offers`` batches) get their own
+rate and burst size instead of all queueing behind one spacing, and a 429 or
+latency spike on one class slows that class down, not only the ceiling.  A
+class rate never rises above its configured limit, and the ceiling never
+rises above the summed rates of the classes in use, which could not send
+faster anyway.
+
+All limiters use the reservation pattern of the original ``_rate_limit_wait``:
+a caller reserves a future slot under a lock and sleeps *outside* it, which
+works for threads (``time.sleep``) and coroutines (``asyncio.sleep``) alike.
+Buckets are implemented as GCRA (theoretical arrival time), which is
+equivalent to a token bucket but needs no refill bookkeeping.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket (GCRA form) with a sustained *rate* and *burst* capacity.
+
+    Not thread-safe on its own — callers hold their limiter's lock.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._tat = 0.0  # theoretical arrival time of the next conforming request
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    def earliest(self, now: float) -> float:
+        """Earliest monotonic time at which a token is available."""
+        return max(now, self._tat - (self.burst - 1) * self.interval)
+
+    def commit(self, slot: float) -> None:
+        """Consume one token for a request sent at *slot*."""
+        self._tat = max(self._tat, slot) + self.interval
+
+    def drain_until(self, when: float) -> None:
+        """Empty the bucket so the next token is available at *when*."""
+        self._tat = max(self._tat, when + (self.burst - 1) * self.interval)
+
+
+class AimdRateController:
+    """Thread-safe AIMD controller handing out request slots via reservation."""
+
+    def __init__(
+        self,
+        initial_rate: float = 2.0,
+        burst: int = 1,
+        min_rate: float = 0.5,
+        max_rate: float = 5.0,
+        increase_step: float = 0.1,
+        healthy_window: int = 25,
+        decrease_factor: float = 0.5,
+        spike_decrease_factor: float = 0.85,
+        spike_factor: float = 3.0,
+        min_spike_seconds: float = 2.0,
+        decrease_cooldown: float = 5.0,
+        state_path: str | None = None,
+        history_size: int = 50,
+        name: str = "Rate controller",
+    ):
+        self.name = name
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.healthy_window = healthy_window
+        self.decrease_factor = decrease_factor
+        self.spike_decrease_factor = spike_decrease_factor
+        self.spike_factor = spike_factor
+        self.min_spike_seconds = min_spike_seconds
+        self.decrease_cooldown = decrease_cooldown
+        self.state_path = state_path
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # orders state-file writes
+        self._unsaved: tuple[int, dict] | None = None  # state to write after _lock
+        self._state_seq = 0
+        self._saved_seq = 0
+        self._bucket = TokenBucket(initial_rate, burst)
+        self._healthy_streak = 0
+        self._credits = 0  # reservations this bucket held back, not yet answered
+        self.ceiling: float | None = None  # increases stop here (below max_rate)
+        self._latency_ewma: float | None = None
+        self._latency_samples = 0
+        self._last_decrease = float("-inf")
+        self.history: deque = deque(maxlen=history_size)
+        self.counters = {"responses": 0, "increases": 0, "decreases_429": 0,
+                         "decreases_latency": 0}
+
+        self.safe_rate = self.rate = self._clamp(initial_rate)
+        saved = self._load_state()
+        if saved is not None:
+            self.safe_rate = self.rate = self._clamp(saved)
+            logger.info(
+                "Rate controller: resuming at saved safe rate %.2f req/s (%s)",
+                self.rate, self.state_path,
+            )
+        self._record_event("start", self.rate)
+
+    # ------------------------------------------------------------------
+    # Slot reservation
+    # ------------------------------------------------------------------
+
+    @property
+    def rate(self) -> float:
+        """Current global request rate in req/s."""
+        return self._bucket.rate
+
+    @rate.setter
+    def rate(self, value: float) -> None:
+        self._bucket.rate = value
+
+    @property
+    def burst(self) -> int:
+        return self._bucket.burst
+
+    @property
+    def interval(self) -> float:
+        """Current minimum spacing between sustained requests in seconds."""
+        return self._bucket.interval
+
+    def reserve(self, not_before: float | None = None) -> float:
+        """Reserve the next request slot and return the seconds to wait for it.
+
+        *not_before* (monotonic time) lets a per-endpoint bucket ask for a
+        global slot no earlier than its own next token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return self.reserve_locked(now, not_before) - now
+
+    def reserve_locked(self, now: float, not_before: float | None = None) -> float:
+        """Reserve and return the absolute slot time; caller holds ``_lock``."""
+        start = now if not_before is None else max(now, not_before)
+        slot = self._bucket.earliest(start)
+        self.commit_locked(slot, held_back=slot > start)
+        return slot
+
+    def earliest_locked(self, now: float) -> float:
+        """Earliest slot the bucket allows at *now*; caller holds ``_lock``."""
+        return self._bucket.earliest(now)
+
+    def commit_locked(self, slot: float, held_back: bool) -> None:
+        """Take the slot at *slot*; caller holds ``_lock``.
+
+        *held_back* says this bucket, not another limit, set the slot — only
+        the responses to such requests count towards a rate increase.
+        """
+        self._bucket.commit(slot)
+        if held_back:
+            self._credits += 1
+
+    def pause(self, seconds: float) -> None:
+        """Push the next free slot at least *seconds* into the future."""
+        with self._lock:
+            self._bucket.drain_until(time.monotonic() + seconds)
+
+    # ------------------------------------------------------------------
+    # Feedback
+    # ------------------------------------------------------------------
+
+    def record(self, status_code: int, latency: float) -> None:
+        """Feed one response back into the controller.
+
+        A changed safe rate is written to ``state_path`` after the lock is
+        released, so other threads keep reserving slots during the write.
+        """
+        with self._lock:
+            self._record_locked(status_code, latency)
+            unsaved, self._unsaved = self._unsaved, None
+        if unsaved is not None:
+            self._write_state(*unsaved)
+
+    def _record_locked(self, status_code: int, latency: float) -> None:
+        self.counters["responses"] += 1
+
+        if status_code == 429:
+            self._healthy_streak = 0
+            self._credits = 0
+            self._decrease(self.decrease_factor, "429")
+            self.counters["decreases_429"] += 1
+            return
+
+        spike = self._is_latency_spike(latency)
+        self._update_latency(latency)
+        if spike:
+            self._healthy_streak = 0
+            self._credits = 0
+            self._decrease(
+                self.spike_decrease_factor, f"latency {latency:.2f}s",
+            )
+            self.counters["decreases_latency"] += 1
+            return
+
+        if status_code >= 500:
+            self._healthy_streak = 0
+            return
+
+        if not self._credits:
+            return  # the rate held nothing back, so this says nothing about it
+        self._credits -= 1
+        self._healthy_streak += 1
+        if self._healthy_streak >= self.healthy_window:
+            self._healthy_streak = 0
+            # The current rate survived a full window — remember it
+            if self.rate != self.safe_rate:
+                self.safe_rate = self.rate
+                self._stage_state()
+            limit = self.max_rate if self.ceiling is None else min(self.max_rate, self.ceiling)
+            if self.rate < limit:
+                old = self.rate
+                self.rate = self._clamp(min(limit, self.rate + self.increase_step))
+                self.counters["increases"] += 1
+                self._record_event("increase", self.rate)
+                logger.info(
+                    "%s: %.2f → %.2f req/s (healthy window)", self.name, old, self.rate,
+                )
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        if self._latency_ewma is None or self._latency_samples < 10:
+            return False
+        threshold = max(
+            self.spike_factor * self._latency_ewma, self.min_spike_seconds,
+        )
+        return latency > threshold
+
+    def _update_latency(self, latency: float) -> None:
+        self._latency_samples += 1
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.9 * self._latency_ewma + 0.1 * latency
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        # Concurrent in-flight requests tend to fail together; cut only once
+        # per cooldown so one burst of 429s does not collapse the rate.
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        old = self.rate
+        self.rate = self._clamp(self.rate * factor)
+        self.safe_rate = min(self.safe_rate, self.rate)
+        self._record_event(f"decrease ({reason})", self.rate)
+        logger.warning(
+            "%s: %.2f → %.2f req/s (%s)", self.name, old, self.rate, reason,
+        )
+        self._stage_state()
+
+    def _clamp(self, rate: float) -> float:
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    def _record_event(self, event: str, rate: float) -> None:
+        self.history.append((datetime.now(timezone.utc).isoformat(), event, round(rate, 3)))
+
+    # ------------------------------------------------------------------
+    # Persistence & reporting
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> float | None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return float(json.load(f)["safe_rate"])
+        except Exception:
+            logger.warning(
+                "Rate controller: ignoring unreadable state file %s",
+                self.state_path, exc_info=True,
+            )
+            return None
+
+    def _stage_state(self) -> None:
+        """Snapshot the state to save once ``_lock`` is released; caller holds it."""
+        if not self.state_path:
+            return
+        self._state_seq += 1
+        self._unsaved = (self._state_seq, {
+            "safe_rate": round(self.safe_rate, 3),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "history": list(self.history)[-10:],
+        })
+
+    def _write_state(self, seq: int, state: dict) -> None:
+        with self._save_lock:
+            if seq <= self._saved_seq:
+                return  # a newer snapshot is already on disk
+            try:
+                tmp = f"{self.state_path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp, self.state_path)
+                self._saved_seq = seq
+            except Exception:
+                logger.warning(
+                    "Rate controller: could not save state to %s",
+                    self.state_path, exc_info=True,
+                )
+
+    def summary(self) -> dict:
+        """Return the current state, counters and history for logging."""
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "safeRate": round(self.safe_rate, 3),
+                "latencyEwma": round(self._latency_ewma or 0.0, 3),
+                **self.counters,
+                "history": list(self.history),
+            }
+
+    def log_summary(self) -> None:
+        """Log the controller state and rate history (end-of-run summary)."""
+        s = self.summary()
+        logger.info(
+            "%s: %.2f req/s now, safe %.2f req/s, EWMA latency "
+            "%.2fs, %d responses (+%d / -%d on 429 / -%d on latency)",
+            self.name, s["rate"], s["safeRate"], s["latencyEwma"], s["responses"],
+            s["increases"], s["decreases_429"], s["decreases_latency"],
+        )
+        for ts, event, rate in s["history"]:
+            logger.info("  %s  %-24s %.2f req/s", ts[11:19], event, rate)
+
+
+class EndpointRateLimiter:
+    """Per-endpoint-class rate controllers in front of a global rate controller.
+
+    *limits* maps an endpoint class to ``(rate, burst)``.  Each class gets an
+    ``AimdRateController`` that starts at, and never rises above, that rate,
+    and backs off on the class's own 429s and latency spikes.  A request gets
+    the later of its class's next slot and the global ceiling's next slot;
+    both are committed together so neither can be overdrawn.  Unknown classes
+    share the ``default`` controller.  The global controller's ``ceiling``
+    follows the summed rates of the classes that reserved a slot in the last
+    ``active_seconds``.
+    """
+
+    def __init__(
+        self,
+        controller: AimdRateController,
+        limits: dict[str, tuple[float, int]],
+        default: tuple[float, int] = (1.0, 1),
+        active_seconds: float = 30.0,
+    ):
+        self.controller = controller
+        self.active_seconds = active_seconds
+        self._classes = {
+            name: self._class_controller(name, rate, burst)
+            for name, (rate, burst) in limits.items()
+        }
+        self._default = self._class_controller("default", *default)
+        self._lock = threading.Lock()
+        self._last_reserved: dict[str, float] = {}  # endpoint class → monotonic time
+        self.counters: dict[str, int] = {}
+
+    def _class_controller(self, name: str, rate: float, burst: int) -> AimdRateController:
+        c = self.controller
+        return AimdRateController(
+            initial_rate=rate, burst=burst, min_rate=min(rate, c.min_rate), max_rate=rate,
+            increase_step=c.increase_step, healthy_window=c.healthy_window,
+            decrease_factor=c.decrease_factor, spike_decrease_factor=c.spike_decrease_factor,
+            spike_factor=c.spike_factor, min_spike_seconds=c.min_spike_seconds,
+            decrease_cooldown=c.decrease_cooldown, name=f"Rate controller [{name}]",
+        )
+
+    def class_controller(self, endpoint_class: str) -> AimdRateController:
+        return self._classes.get(endpoint_class, self._default)
+
+    def rates(self) -> dict[str, float]:
+        """Current rate of every configured class (and the default) in req/s."""
+        rates = {name: c.rate for name, c in self._classes.items()}
+        rates["default"] = self._default.rate
+        return rates
+
+    def reserve(self, endpoint_class: str) -> float:
+        """Reserve a slot for *endpoint_class* and return the seconds to wait."""
+        own_controller = self.class_controller(endpoint_class)
+        with self._lock, self.controller._lock, own_controller._lock:
+            now = time.monotonic()
+            own = own_controller.earliest_locked(now)
+            ceiling = self.controller.earliest_locked(now)
+            slot = max(own, ceiling)
+            self.controller.commit_locked(slot, held_back=ceiling > own)
+            own_controller.commit_locked(slot, held_back=own > now and own >= ceiling)
+            self.counters[endpoint_class] = self.counters.get(endpoint_class, 0) + 1
+            self._last_reserved[endpoint_class] = now
+            active = {  # unknown classes share one default controller
+                id(c): c.rate for c in (
+                    self.class_controller(name) for name, at in self._last_reserved.items()
+                    if now - at <= self.active_seconds
+                )
+            }
+            self.controller.ceiling = sum(active.values())
+            return slot - now
+
+    def record(self, endpoint_class: str, status_code: int, latency: float) -> None:
+        """Feed a response back into its class's controller and the global one."""
+        self.class_controller(endpoint_class).record(status_code, latency)
+        self.controller.record(status_code, latency)
+
+    def pause(self, seconds: float) -> None:
+        """Pause every endpoint class (e.g. after an HTTP 429)."""
+        self.controller.pause(seconds)
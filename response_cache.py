@@ -0,0 +1,198 @@
+"""
+Content-addressed on-disk cache for K-Ruoka API responses.
+
+Sits under ``helpers._post`` / ``_get`` / ``_post_with_params`` so diagnostic
+and profiling scripts that re-read the same stores do not pay the CF bootstrap
+and the rate-limited round-trips on every run.
+
+  - Key: SHA-256 of the canonical JSON of (method, endpoint, payload) —
+    dict key order and whitespace never produce a different entry.
+  - Per-endpoint-class TTLs (stores change rarely, offer pages hourly).
+  - Entries are zlib-compressed JSON, one file per key, written atomically.
+  - Size-bounded LRU: a hit bumps the file's mtime; when the total size goes
+    over ``max_bytes`` the least recently used files are deleted down to
+    ``EVICT_TARGET`` of the budget.
+
+Only successfully parsed (2xx) responses are ever stored.
+
+The cache is off by default.  Set KRUOKA_CACHE_DIR (e.g. .cache/k-ruoka)
+to turn it on for any script that imports helpers, or call
+``helpers.enable_response_cache()``; KRUOKA_CACHE_MAX_MB bounds its size
+and ``helpers.RESPONSE_CACHE_TTLS`` sets how long each endpoint class is
+served from disk.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+EVICT_TARGET = 0.9  # evict down to 90% of max_bytes
+
+
+def canonical_key(method: str, endpoint: str, payload: dict | None) -> str:
+    """Return the content address for a request."""
+    blob = json.dumps(
+        {"method": method.upper(), "endpoint": endpoint, "payload": payload or {}},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU cache of JSON responses on disk."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = 3600.0,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "stores": 0,
+                         "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._scan())
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, endpoint_class: str = "other"):
+        """Return the cached JSON for *key*, or None when missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json_codec.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except Exception:
+            logger.warning("Response cache: dropping corrupt entry %s", path)
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        ttl = self.ttls.get(endpoint_class, self.default_ttl)
+        if time.time() - entry["storedAt"] > ttl:
+            self._remove(path)
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        try:
+            os.utime(path)  # LRU: mark as recently used
+        except OSError:
+            pass
+        self._count("hits")
+        return entry["body"]
+
+    def put(self, key: str, body, endpoint: str = "") -> None:
+        """Store *body* (JSON-serialisable) under *key*."""
+        path = self._path(key)
+        blob = zlib.compress(json_codec.dumps(
+            {"storedAt": time.time(), "endpoint": endpoint, "body": body},
+        ), 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._total_bytes += len(blob) - old_size
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries until under the size budget."""
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda e: e[1])
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * EVICT_TARGET
+            removed = 0
+            for path, _, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._total_bytes = total
+            self.counters["evictions"] += removed
+        if removed:
+            logger.info(
+                "Response cache: evicted %d entries (%.1f MB left)",
+                removed, total / 1e6,
+            )
+        return removed
+
+    def clear(self) -> None:
+        """Delete every cached entry."""
+        with self._lock:
+            for path, _, _ in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hitRate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+                "totalBytes": self._total_bytes,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.z")
+
+    def _scan(self):
+        """Yield (path, mtime, size) for every entry on disk."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json.z"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
@@ -0,0 +1,147 @@
+"""
+Checkpoint journal for resumable sync runs.
+
+A sync run walks every Helsinki-area store; the workflow cancels a running
+sync when a new one starts and kills it after its timeout.  ``RunJournal``
+records the run's ``sync_time``, its store list, each finished store (with
+its offer count) and the stores in flight when the run stopped (with the
+offers they had already written).  ``sync_to_supabase.py --resume`` reloads an
+unfinished journal and carries on with the stores not yet done, keeping the
+original ``sync_time`` so stale-offer deletion still compares against the
+start of the run.
+
+The journal is a small JSON file, rewritten atomically after every store.
+Store workers update it concurrently, so every method takes its lock.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 2
+
+
+class RunJournal:
+    """Progress of one sync run (see module docstring)."""
+
+    def __init__(self, path: str, sync_time: str, stores: list[dict]):
+        self.path = path
+        self.sync_time = sync_time
+        self.stores = stores            # [{"id", "name"}, ...] in sync order
+        self.started_at = time.time()
+        self.resumes = 0
+        self.completed: dict[str, int] = {}   # store ID → offers synced
+        self.failed: list[str] = []
+        self.in_flight: dict[str, int] = {}   # store ID → offers written so far
+        self.finished = False
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: str, max_age: float) -> "RunJournal | None":
+        """The unfinished run journalled at *path*, or None.
+
+        Finished, unreadable and older-than-*max_age* (seconds) journals are
+        ignored — resuming those would keep a stale ``sync_time``.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Run journal: ignoring unreadable %s: %s", path, e)
+            return None
+        if data.get("version") != JOURNAL_VERSION or data.get("finished"):
+            return None
+        age = time.time() - data.get("startedAt", 0)
+        if age > max_age:
+            logger.info("Run journal: last run started %.1fh ago, not resuming", age / 3600)
+            return None
+
+        journal = cls(path, data["syncTime"], data["stores"])
+        journal.started_at = data["startedAt"]
+        journal.resumes = data.get("resumes", 0) + 1
+        journal.completed = data.get("completed", {})
+        journal.failed = data.get("failed", [])
+        journal.in_flight = data.get("inFlight", {})
+        return journal
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+
+    def pending(self) -> list[dict]:
+        """Stores still to sync, in order (the interrupted ones first)."""
+        with self._lock:
+            todo = [s for s in self.stores if s["id"] not in self.completed]
+            todo.sort(key=lambda s: s["id"] not in self.in_flight)
+            return todo
+
+    def start_store(self, store_id: str) -> None:
+        with self._lock:
+            self.in_flight[store_id] = 0
+            if store_id in self.failed:
+                self.failed.remove(store_id)
+            self.save()  # a hard kill still leaves it first in line on resume
+
+    def store_done(self, store_id: str, offers: int) -> None:
+        with self._lock:
+            self.completed[store_id] = offers
+            self.in_flight.pop(store_id, None)
+            self.save()
+
+    def store_failed(self, store_id: str) -> None:
+        with self._lock:
+            if store_id not in self.failed:
+                self.failed.append(store_id)
+            self.in_flight.pop(store_id, None)
+            self.save()
+
+    def store_interrupted(self, store_id: str, offers_written: int) -> None:
+        """Checkpoint a store that stopped part-way (it is synced again on resume)."""
+        with self._lock:
+            self.in_flight[store_id] = offers_written
+            self.save()
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished = True
+            self.in_flight.clear()
+            self.save()
+
+    @property
+    def total_offers(self) -> int:
+        with self._lock:
+            return sum(self.completed.values())
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self) -> None:
+        """Atomically rewrite the journal file."""
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "version": JOURNAL_VERSION,
+                        "syncTime": self.sync_time,
+                        "startedAt": self.started_at,
+                        "resumes": self.resumes,
+                        "stores": self.stores,
+                        "completed": self.completed,
+                        "failed": self.failed,
+                        "inFlight": self.in_flight,
+                        "finished": self.finished,
+                    }, f, indent=1)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning("Run journal: could not write %s: %s", self.path, e)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark the JSON path from response bytes to mapped rows.
+
+Compares the old transport path (decode the body to str, then stdlib
+json.loads) with json_codec on every backend that is installed, using the
+captured offer-category page in examples/offer-category.json:
+
+    decode   response bytes → dict          (MB/s and µs per page)
+    encode   mapped offer rows → JSON bytes (MB/s and µs per page)
+
+Usage:
+    python scripts/bench_json.py [iterations]
+
+Install orjson or msgspec to see the fast backends (neither is required).
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import json_codec
+from sync_to_supabase import map_offer
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "examples"
+STORE_ID = "k-ruoka:N110"
+
+
+def _timeit(fn, iterations: int) -> float:
+    """Best-of-3 seconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / iterations)
+    return best
+
+
+def _report(label: str, seconds: float, size: int) -> None:
+    print(f"  {label:<28} {size / seconds / 1e6:8.1f} MB/s {seconds * 1e6:10.1f} µs/page")
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    raw = (EXAMPLES / "offer-category.json").read_bytes()
+    page = json.loads(raw)
+    rows = [r for r, _ in (map_offer(STORE_ID, o) for o in page["offers"]) if r]
+    rows_size = len(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+    print(f"Page: {len(raw) / 1024:.1f} KiB, {len(page['offers'])} offers; "
+          f"{len(rows)} mapped rows ({rows_size / 1024:.1f} KiB)")
+
+    print("decode (bytes → dict)")
+    _report("before: text + json.loads",
+            _timeit(lambda: json.loads(raw.decode("utf-8")), iterations), len(raw))
+    print("encode (rows → bytes)")
+    _report("before: json.dumps + encode",
+            _timeit(lambda: json.dumps(rows).encode("utf-8"), iterations), rows_size)
+
+    for backend in ("json", "msgspec", "orjson"):
+        if json_codec.use_backend(backend) != backend:
+            print(f"{backend}: not installed")
+            continue
+        print(f"json_codec[{backend}]")
+        _report("decode", _timeit(lambda: json_codec.loads(raw), iterations), len(raw))
+        _report("encode", _timeit(lambda: json_codec.dumps(rows), iterations), rows_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark offer mapping (offer_mapper.OfferMapper) in µs per offer.
+
+Maps the captured listing page in examples/offer-category.json and the
+compound offers in examples/fetch-offers.json, the way sync_store_offers
+does: one mapper per store (created once here, as for a store of a
+thousand offers), and the skip reason with every row.
+
+With ``--baseline REV`` the sync_to_supabase.py mappers of that git revision
+(e.g. one from before offer_mapper.py) are timed as well, after checking
+that both produce identical rows (``updated_at`` aside).
+
+Usage:
+    python scripts/bench_mapper.py [--iterations N] [--baseline REV]
+"""
+import argparse
+import importlib.util
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from offer_mapper import OfferMapper
+
+EXAMPLES = ROOT / "examples"
+STORE_ID = "N110"
+
+
+def _timeit(cases: dict, iterations: int, rounds: int = 20) -> dict:
+    """Best seconds per call of each case, over interleaved *rounds*."""
+    best = dict.fromkeys(cases, float("inf"))
+    per_round = max(1, iterations // rounds)
+    for _ in range(rounds):
+        for label, fn in cases.items():
+            t0 = time.perf_counter()
+            for _ in range(per_round):
+                fn()
+            best[label] = min(best[label], (time.perf_counter() - t0) / per_round)
+    return best
+
+
+def _load_revision(rev: str):
+    """sync_to_supabase as of git revision *rev*, imported under another name."""
+    source = subprocess.run(
+        ["git", "show", f"{rev}:sync_to_supabase.py"],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    path = Path(tempfile.mkdtemp()) / "sync_baseline.py"
+    path.write_text(source, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("sync_baseline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _strip_time(row: dict | None) -> dict | None:
+    return row and {k: v for k, v in row.items() if k != "updated_at"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--baseline", metavar="REV", help="also time this revision's mappers")
+    args = parser.parse_args()
+
+    listing = json.loads((EXAMPLES / "offer-category.json").read_text(encoding="utf-8"))["offers"]
+    singles = [o for o in listing if o.get("product")]
+    compounds = json.loads((EXAMPLES / "fetch-offers.json").read_text(encoding="utf-8"))["offers"]
+    pairs = [(o, pw) for o in compounds for pw in o.get("products", [])]
+
+    mapper = OfferMapper(STORE_ID)  # one per store in the sync: steady state
+
+    def run_mapper():
+        return ([mapper.map_offer(o) for o in singles],
+                [mapper.map_compound_product(o, pw) for o, pw in pairs])
+
+    cases = {"OfferMapper": run_mapper}
+    if args.baseline:
+        old = _load_revision(args.baseline)
+        cases[f"{args.baseline} map_offer"] = lambda: (
+            [old.map_offer(STORE_ID, o) for o in singles],
+            [old.map_compound_product(STORE_ID, o, pw) for o, pw in pairs],
+        )
+        new_rows, old_rows = run_mapper(), cases[f"{args.baseline} map_offer"]()
+        for new, prev in zip(new_rows[0] + new_rows[1], old_rows[0] + old_rows[1]):
+            assert [_strip_time(r) for r in new[:2]] == [_strip_time(r) for r in prev], (new, prev)
+        print(f"Rows identical to {args.baseline}")
+
+    mapped, _ = run_mapper()
+    print(f"{len(singles)} listing offers ({sum(1 for r in mapped if r[2] is None)} kept), "
+          f"{len(pairs)} compound products; {args.iterations} iterations")
+    results = _timeit(cases, args.iterations)
+    for label, seconds in results.items():
+        print(f"  {label:<28} {seconds / (len(singles) + len(pairs)) * 1e6:8.2f} µs/offer")
+    if len(results) == 2:
+        new, old = results.values()
+        print(f"  speedup                      {old / new:8.2f}×")
+
+
+if __name__ == "__main__":
+    main()
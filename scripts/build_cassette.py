@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Build a replay cassette for store N110 from the captured payloads in examples/.
+
+The cassette answers every request that a sync of N110 makes:
+stores/search, the search-offers page the fetch planner probes (and, for a
+store this small, uses as its only page), offer-categories, the
+offer-category pages of "hedelmat-ja-vihannekset"
+(examples/offer-category.json) and the fetch-offers call for its compound
+offer (examples/fetch-offers.json).
+
+Usage:
+    python scripts/build_cassette.py [output_path]
+
+Then replay offline, e.g.:
+    KRUOKA_CASSETTE=tests/cassettes/examples-n110.jsonl KRUOKA_REPLAY_SPEED=0 \\
+        python scripts/profile_batching.py N110
+
+For real Citymarket-sized data, record a live run instead:
+    KRUOKA_CASSETTE=cassettes/n195.jsonl.gz KRUOKA_CASSETTE_MODE=record \\
+        python scripts/profile_batching.py N195
+"""
+import json
+import sys
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from helpers import MAX_OFFER_CATEGORY_LIMIT, HELSINKI_LAT, HELSINKI_LON
+from cassette import Cassette
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "examples"
+DEFAULT_OUTPUT = (
+    Path(__file__).resolve().parent.parent / "tests" / "cassettes" / "examples-n110.jsonl"
+)
+STORE_ID = "N110"
+SLUG = "hedelmat-ja-vihannekset"
+LATENCY = 0.35  # seconds — typical offer-category round-trip
+
+
+def build(output: str) -> Cassette:
+    """Write the example cassette to *output* and return it (record mode)."""
+    category_page = json.loads((EXAMPLES / "offer-category.json").read_text(encoding="utf-8"))
+    fetch_offers = json.loads((EXAMPLES / "fetch-offers.json").read_text(encoding="utf-8"))
+    total_hits = category_page["totalHits"]
+
+    store = {
+        "id": STORE_ID,
+        "name": "K-Supermarket Kamppi",
+        "slug": "k-supermarket-kamppi",
+        "chain": "ksupermarket",
+        "chainName": "K-Supermarket",
+        "location": {"address": "Urho Kekkosen katu 1", "city": "Helsinki",
+                     "postalCode": "00100"},
+        "geo": {"latitude": HELSINKI_LAT, "longitude": HELSINKI_LON},
+    }
+    compound_ids = [o["id"] for o in category_page["offers"] if not o.get("product")]
+
+    cassette = Cassette(output, mode="record")
+
+    def add(endpoint: str, body: dict, response: dict) -> None:
+        cassette.record(
+            "POST", endpoint, body, 200,
+            json.dumps(response, ensure_ascii=False), LATENCY,
+        )
+
+    add("stores/search", {"query": "", "offset": 0, "limit": 2000},
+        {"results": [store]})
+    query = urlencode({"storeId": STORE_ID, "offset": 0, "categoryPath": "", "language": "fi"})
+    cassette.record(
+        "GET", f"search-offers/?{query}", None, 200,
+        json.dumps({"totalHits": total_hits, "storeId": STORE_ID,
+                    "results": category_page["offers"], "categoryName": "",
+                    "suggestions": []}, ensure_ascii=False),
+        LATENCY,
+    )
+    add("offer-categories", {"storeId": STORE_ID},
+        {"offerCategories": [
+            {"slug": SLUG, "count": total_hits, "name": category_page["name"]},
+        ]})
+
+    # Page 1 is the captured response; later pages are past the data we have
+    offset = 0
+    page = category_page
+    while True:
+        add("offer-category", {
+            "storeId": STORE_ID,
+            "category": {"kind": "productCategory", "slug": SLUG},
+            "offset": offset,
+            "limit": MAX_OFFER_CATEGORY_LIMIT,
+            "pricing": {},
+        }, page)
+        offset += MAX_OFFER_CATEGORY_LIMIT
+        if offset >= total_hits + MAX_OFFER_CATEGORY_LIMIT:
+            break
+        page = {"name": category_page["name"], "offers": [],
+                "paginatedOfferIds": [], "totalHits": total_hits}
+
+    add("fetch-offers", {"storeId": STORE_ID, "offerIds": compound_ids, "pricing": {}},
+        fetch_offers)
+    return cassette
+
+
+def main() -> None:
+    output = sys.argv[1] if len(sys.argv) > 1 else str(DEFAULT_OUTPUT)
+    cassette = build(output)
+    print(f"Wrote {cassette.stats()['recorded']} interactions to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
-"""Debug script: check for null prices in K-Ruoka offers for 1-2 stores."""
+"""Debug script: check for null prices in K-Ruoka offers for 1-2 stores.
+
+With the response cache on (response_cache.py), a re-run inspects the same
+payloads, so a price fixed upstream shows up only once its entry expires.
+"""
 import sys
 import os
 import json
@@ -7,7 +11,7 @@ import json
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from helpers import search_all_offers_for_store, fetch_offers
-from sync_to_supabase import map_offer, map_compound_product, _is_compound_offer, _extract_product_fields, COMPOUND_FETCH_BATCH
+from sync_to_supabase import map_offer, map_compound_product, _is_compound_offer, COMPOUND_FETCH_BATCH
 
 def _chunked(lst, size):
     for i in range(0, len(lst), size):
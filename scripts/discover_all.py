@@ -6,6 +6,8 @@ Usage:
     python scripts/discover_all.py [max_stores]
 
 Calls the K-Ruoka API directly (not via Flask) to measure raw timings.
+Leave the response cache (response_cache.py) off when the timings matter:
+cached calls report near-zero.
 """
 import sys, json, time
 from pathlib import Path
@@ -9,6 +9,10 @@ Usage:
     python scripts/full_sweep.py --all          # all stores
     python scripts/full_sweep.py --all 100      # first 100 of all stores
     python scripts/full_sweep.py 50             # first 50 Helsinki-area stores
+
+With the response cache on (response_cache.py), an interrupted sweep can be
+re-run within the cache TTLs and only the stores it had not reached are
+requested.
 """
 import sys
 import json
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Local K-Ruoka API simulator for load and back-pressure testing.
+
+Serves synthetic data shaped like examples/offer-category.json and
+examples/fetch-offers.json for the 1,060 stores in
+examples/full-sweep-results.json (same per-store offer counts), so the rate
+limiter, re-auth and the whole sync_to_supabase.main path can be exercised at
+full scale on one machine without touching k-ruoka.fi.
+
+Endpoints (under /kr-api):
+    POST stores/search       all synthetic stores
+    POST offer-categories    per-store categories with counts
+    POST offer-category      pages of offers — HTTP 400 when limit > 25
+    POST fetch-offers        compound offers expanded into `products` — HTTP 400
+                             above 25 offerIds
+    GET  search-offers/      48 per page — empty results at offset >= 1000
+Plus:
+    POST /v1                 FlareSolverr-compatible CF "solve" issuing a
+                             cf_clearance cookie that expires after --cookie-ttl
+                             (API calls with an expired/missing cookie get 403)
+    /rest/v1/<table>         minimal PostgREST (upsert / select in_ / delete)
+                             so supabase-py can write to an in-memory DB
+    GET  /__stats            request, 429 and 403 counters
+
+Back-pressure:
+    --rate/--burst           server-side token bucket; excess requests get 429
+    --latency-median/-sigma  log-normal response latency
+    --tail-prob/-seconds     occasional very slow responses
+
+Usage:
+    python scripts/kruoka_simulator.py --port 8088 --rate 3 --burst 6
+
+    KRUOKA_BASE_URL=http://127.0.0.1:8088/kr-api \\
+    KRUOKA_SITE_URL=http://127.0.0.1:8088 \\
+    FLARESOLVERR_URL=http://127.0.0.1:8088/v1 \\
+    SUPABASE_URL=http://127.0.0.1:8088 SUPABASE_SERVICE_ROLE_KEY=sim.sim.sim \\
+        python sync_to_supabase.py
+
+Use --helsinki-fraction 1.0 to put every store inside the Helsinki filter so
+sync_to_supabase.main processes all 1,060 of them.
+"""
+import argparse
+import copy
+import functools
+import hashlib
+import json
+import math
+import random
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+EXAMPLES = ROOT / "examples"
+
+HELSINKI_LAT = 60.1699
+HELSINKI_LON = 24.9384
+MAX_OFFER_CATEGORY_LIMIT = 25
+SEARCH_OFFERS_PAGE_SIZE = 48
+SEARCH_OFFERS_MAX_OFFSET = 1000
+FETCH_OFFERS_MAX_IDS = 25
+CHAIN_OFFER_POOL = 4000      # chain offers shared between stores
+CHAIN_OFFER_SHARE = 0.6      # fraction of a store's offers that are chain offers
+COMPOUND_SHARE = 0.04        # offers without an embedded product
+MULTI_CATEGORY_SHARE = 0.05  # offers listed in two categories
+
+CATEGORIES = [  # (slug, finnish name, relative weight) — from N110
+    ("hedelmat-ja-vihannekset", "Hedelmät ja vihannekset", 13),
+    ("leivat-keksit-ja-leivonnaiset", "Leivät, keksit ja leivonnaiset", 110),
+    ("liha-ja-kasviproteiinit", "Liha ja kasviproteiinit", 77),
+    ("kala-ja-merenelavat", "Kala ja merenelävät", 23),
+    ("valmisruoka", "Valmisruoka", 43),
+    ("maito-juusto-munat-ja-rasvat", "Maito, juusto, munat ja rasvat", 124),
+    ("kuivat-elintarvikkeet-ja-leivonta", "Kuivat elintarvikkeet ja leivonta", 67),
+    ("sailykkeet-keitot-ja-ateria-ainekset", "Säilykkeet, keitot ja ateria-ainekset", 39),
+    ("oljyt-etikat-ja-salaattikastikkeet", "Öljyt, etikat ja salaattikastikkeet", 3),
+    ("mausteet-ja-maustaminen", "Mausteet ja maustaminen", 20),
+    ("texmex-ja-maailman-maut", "Texmex ja maailman maut", 22),
+    ("pakasteet", "Pakasteet", 71),
+    ("makeiset-ja-naposteltavat", "Makeiset ja naposteltavat", 122),
+    ("juomat", "Juomat", 114),
+    ("lapset", "Lapset", 18),
+    ("lemmikit", "Lemmikit", 39),
+    ("kosmetiikka-terveys-ja-hygienia", "Kosmetiikka, terveys ja hygienia", 171),
+    ("keittio-astiat-ja-kattaus", "Keittiö, astiat ja kattaus", 18),
+    ("kodinhoito-ja-taloustarvikkeet", "Kodinhoito ja taloustarvikkeet", 49),
+    ("kodintekstiilit-ja-sisustus", "Sisustus ja kodintekstiilit", 28),
+    ("kodinkoneet-ja-elektroniikka", "Kodinkoneet ja elektroniikka", 62),
+    ("kukat-ja-puutarha", "Kukat ja puutarha", 4),
+    ("vaatteet-ja-asusteet", "Vaatteet ja asusteet", 37),
+]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+class SyntheticCatalog:
+    """Deterministic synthetic stores and offers (same seed → same data)."""
+
+    def __init__(self, seed: int = 1, helsinki_fraction: float = 0.12):
+        self.seed = seed
+        page = json.loads((EXAMPLES / "offer-category.json").read_text(encoding="utf-8"))
+        detail = json.loads((EXAMPLES / "fetch-offers.json").read_text(encoding="utf-8"))
+        self._templates = [o for o in page["offers"] if o.get("product")]
+        self._compound_template = next(o for o in page["offers"] if not o.get("product"))
+        self._product_templates = detail["offers"][0]["products"]
+
+        sweep = json.loads((EXAMPLES / "full-sweep-results.json").read_text(encoding="utf-8"))
+        rng = random.Random(seed)
+        self.stores: list[dict] = []
+        self.offer_counts: dict[str, int] = {}
+        for entry in sweep["stores"]:
+            near = rng.random() < helsinki_fraction
+            # Within ~40 km of Helsinki, or 80–600 km away
+            dist_km = rng.uniform(0, 40) if near else rng.uniform(80, 600)
+            bearing = rng.uniform(0, 2 * math.pi)
+            lat = HELSINKI_LAT + (dist_km / 111.0) * math.cos(bearing)
+            lon = HELSINKI_LON + (dist_km / (111.0 * math.cos(math.radians(HELSINKI_LAT)))) * math.sin(bearing)
+            sid = entry["storeId"]
+            self.offer_counts[sid] = entry["totalOffers"]
+            self.stores.append({
+                "id": sid,
+                "name": entry["name"],
+                "slug": entry["name"].lower().replace(" ", "-"),
+                "chain": entry["chain"],
+                "chainName": entry["chain"],
+                "branchCode": sid,
+                "location": {"address": f"Simulaattorinkatu {len(self.stores) + 1}",
+                             "city": "Helsinki" if near else "Muualla",
+                             "postalCode": "00100"},
+                "geo": {"latitude": round(lat, 5), "longitude": round(lon, 5)},
+            })
+        self._store_ids = {s["id"] for s in self.stores}
+
+    def has_store(self, store_id: str) -> bool:
+        return store_id in self._store_ids
+
+    def _rng(self, *parts) -> random.Random:
+        digest = hashlib.sha256(repr((self.seed,) + parts).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _ean(self, rng: random.Random) -> str:
+        return "64" + "".join(str(rng.randrange(10)) for _ in range(11))
+
+    def _product_offer(self, offer_id: str, slug: str, name: str) -> dict:
+        """A single-product offer shaped like examples/offer-category.json."""
+        rng = self._rng("offer", offer_id)
+        offer = copy.deepcopy(rng.choice(self._templates))
+        ean = self._ean(rng)
+        normal = round(rng.uniform(0.99, 19.99), 2)
+        price = round(normal * rng.uniform(0.5, 0.95), 2)
+        batch_amount = 2 if rng.random() < 0.08 else None
+
+        product = offer["product"]["product"]
+        offer["id"] = offer_id
+        offer["campaignId"] = str(10_000_000 + rng.randrange(10_000_000))
+        offer["localizedTitle"] = {"finnish": f"Tuote {offer_id}", "english": f"Product {offer_id}"}
+        offer["title"] = f"Tuote {offer_id}"
+        offer["normalPricing"]["price"] = normal
+        offer["pricing"]["price"] = None if rng.random() < 0.05 else (
+            round(price * batch_amount, 2) if batch_amount else price
+        )
+        offer["product"]["id"] = ean
+        product.update({"id": ean, "ean": ean, "baseEan": ean})
+        product["availability"] = {"store": rng.random() > 0.04, "web": True}
+        product["category"]["tree"][0]["slug"] = slug
+        product["category"]["tree"][0]["localizedName"] = {"finnish": name}
+        product["images"] = [f"https://public.keskofiles.com/f/k-ruoka/product/{ean}"]
+        product.setdefault("productAttributes", {})["urlSlug"] = f"tuote-{ean}"
+
+        ms = product.setdefault("mobilescan", {}).setdefault("pricing", {})
+        ms["normal"] = {"price": normal, "unitPrice": {"value": normal, "unit": "kg"}}
+        if batch_amount:
+            ms.pop("discount", None)
+            ms["batch"] = {"price": round(price * batch_amount, 2), "amount": batch_amount,
+                           "unitPrice": {"value": price, "unit": "kg"},
+                           "startDate": "2026-01-28T05:30:49.000Z",
+                           "endDate": "2026-02-15T21:59:59.000Z"}
+        else:
+            ms.pop("batch", None)
+            ms["discount"] = {"price": price, "unitPrice": {"value": price, "unit": "kg"},
+                              "startDate": "2026-01-28T05:30:49.000Z",
+                              "endDate": "2026-02-15T21:59:59.000Z"}
+        return offer
+
+    def _compound_offer(self, offer_id: str) -> dict:
+        offer = copy.deepcopy(self._compound_template)
+        offer["id"] = offer_id
+        offer["localizedTitle"] = {"finnish": f"Yhdistelmä {offer_id}"}
+        offer["title"] = f"Yhdistelmä {offer_id}"
+        return offer
+
+    @functools.lru_cache(maxsize=64)
+    def store_offers(self, store_id: str) -> dict:
+        """Return {slug: [offer, ...]} for a store (cached per store)."""
+        rng = self._rng("store", store_id)
+        count = self.offer_counts.get(store_id, 0)
+        weights = [w for _, _, w in CATEGORIES]
+        by_slug: dict[str, list] = {slug: [] for slug, _, _ in CATEGORIES}
+        names = {slug: name for slug, name, _ in CATEGORIES}
+        used: set[str] = set()
+        n_store = 0
+        while len(used) < count:
+            if rng.random() < CHAIN_OFFER_SHARE:
+                offer_id = f"{300000 + rng.randrange(CHAIN_OFFER_POOL)}P"
+            else:
+                n_store += 1
+                offer_id = f"S{store_id[1:]}{n_store:05d}P"
+            if offer_id in used:
+                continue
+            used.add(offer_id)
+            slug = rng.choices(list(by_slug), weights)[0]
+            if self._rng("compound", offer_id).random() < COMPOUND_SHARE:
+                offer = self._compound_offer(offer_id)
+            else:
+                offer = self._product_offer(offer_id, slug, names[slug])
+            by_slug[slug].append(offer)
+            if rng.random() < MULTI_CATEGORY_SHARE:
+                by_slug[rng.choices(list(by_slug), weights)[0]].append(offer)
+        return {slug: offers for slug, offers in by_slug.items() if offers}
+
+    def category_names(self) -> dict[str, str]:
+        return {slug: name for slug, name, _ in CATEGORIES}
+
+    def compound_detail(self, store_id: str, offer_id: str) -> dict:
+        """fetch-offers entry for a compound offer (2–4 products)."""
+        rng = self._rng("compound-products", offer_id)
+        offer = self._compound_offer(offer_id)
+        products = []
+        for i in range(rng.randint(2, 4)):
+            pw = copy.deepcopy(self._product_templates[i % len(self._product_templates)])
+            ean = self._ean(rng)
+            pw["id"] = ean
+            pw["product"].update({"id": ean, "ean": ean, "baseEan": ean})
+            pw["product"].setdefault("store", {})["id"] = store_id
+            products.append(pw)
+        offer["products"] = products
+        return offer
+
+
+# ---------------------------------------------------------------------------
+# Server state: rate limiting, CF cookies, stats, in-memory PostgREST
+# ---------------------------------------------------------------------------
+
+class SimulatorState:
+    def __init__(self, args):
+        self.args = args
+        self.catalog = SyntheticCatalog(args.seed, args.helsinki_fraction)
+        self.lock = threading.Lock()
+        self.rng = random.Random(args.seed)
+        self._tat = 0.0  # server-side GCRA bucket
+        self.tokens: dict[str, float] = {}  # cf_clearance → issued (monotonic)
+        self.stats = {"requests": 0, "429": 0, "403": 0, "400": 0, "solves": 0,
+                      "byEndpoint": {}}
+        self.db: dict[str, dict] = {}
+
+    def count(self, key: str, endpoint: str | None = None) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+            if endpoint:
+                by = self.stats["byEndpoint"]
+                by[endpoint] = by.get(endpoint, 0) + 1
+
+    def allow_request(self) -> bool:
+        """Server-side token bucket (rate/burst); False means answer 429."""
+        if self.args.rate <= 0:
+            return True
+        interval = 1.0 / self.args.rate
+        with self.lock:
+            now = time.monotonic()
+            if now < self._tat - (self.args.burst - 1) * interval:
+                return False
+            self._tat = max(self._tat, now) + interval
+            return True
+
+    def latency(self) -> float:
+        with self.lock:
+            base = self.args.latency_median * math.exp(self.rng.gauss(0, self.args.latency_sigma))
+            if self.rng.random() < self.args.tail_prob:
+                base += self.args.tail_seconds
+        return base
+
+    def issue_token(self) -> str:
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.tokens[token] = time.monotonic()
+        return token
+
+    def token_valid(self, token: str | None) -> bool:
+        if self.args.no_auth:
+            return True
+        with self.lock:
+            issued = self.tokens.get(token or "")
+        return issued is not None and time.monotonic() - issued < self.args.cookie_ttl
+
+
+# ---------------------------------------------------------------------------
+# HTTP handler
+# ---------------------------------------------------------------------------
+
+class Handler(BaseHTTPRequestHandler):
+    state: SimulatorState = None  # set per server in make_server()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep the console quiet
+        if self.state.args.verbose:
+            super().log_message(fmt, *args)
+
+    # ---- plumbing ----
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _send(self, status: int, body, headers: dict | None = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _cookie(self, name: str) -> str | None:
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            k, _, v = part.strip().partition("=")
+            if k == name:
+                return v
+        return None
+
+    def do_HEAD(self):  # connection pre-warming
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        try:
+            if url.path == "/__stats":
+                return self._send(200, self.state.stats)
+            if url.path == "/v1":
+                return self._flaresolverr()
+            if url.path.startswith("/rest/v1/"):
+                return self._postgrest(method, url)
+            if url.path.startswith("/kr-api/"):
+                return self._api(method, url)
+            self._send(404, {"error": "not found"})
+        except Exception as e:  # noqa: BLE001
+            self._send(500, {"error": str(e)})
+
+    # ---- FlareSolverr ----
+
+    def _flaresolverr(self) -> None:
+        self._read_json()
+        time.sleep(self.state.args.solve_seconds)
+        self.state.count("solves")
+        host = self.headers.get("Host", "127.0.0.1").split(":")[0]
+        expires = time.time() + self.state.args.cookie_ttl
+        self._send(200, {"status": "ok", "solution": {
+            "userAgent": "Mozilla/5.0 (X11; Linux x86_64) KRuokaSimulator/1.0",
+            "cookies": [
+                {"name": "cf_clearance", "value": self.state.issue_token(),
+                 "domain": host, "expires": expires},
+                {"name": "__cf_bm", "value": secrets.token_hex(8),
+                 "domain": host, "expires": expires},
+            ],
+        }})
+
+    # ---- K-Ruoka API ----
+
+    def _api(self, method: str, url) -> None:
+        state = self.state
+        endpoint = url.path[len("/kr-api/"):]
+        body = self._read_json() if method == "POST" else None
+        state.count("requests", endpoint)
+
+        if not state.token_valid(self._cookie("cf_clearance")):
+            state.count("403")
+            return self._send(403, {"error": "cf challenge"})
+        if not state.allow_request():
+            state.count("429")
+            return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+
+        time.sleep(state.latency())
+        catalog = state.catalog
+
+        if endpoint == "stores/search":
+            offset, limit = body.get("offset", 0), body.get("limit", 2000)
+            return self._send(200, {"results": catalog.stores[offset:offset + limit],
+                                    "totalHits": len(catalog.stores)})
+
+        if endpoint == "offer-categories":
+            names = catalog.category_names()
+            offers = catalog.store_offers(body["storeId"]) if catalog.has_store(body["storeId"]) else {}
+            return self._send(200, {"offerCategories": [
+                {"slug": slug, "count": len(items), "name": {"finnish": names[slug]}}
+                for slug, items in offers.items()
+            ]})
+
+        if endpoint == "offer-category":
+            limit = body.get("limit", 25)
+            if limit > MAX_OFFER_CATEGORY_LIMIT:
+                state.count("400")
+                return self._send(400, {"error": f"limit must be <= {MAX_OFFER_CATEGORY_LIMIT}"})
+            slug = (body.get("category") or {}).get("slug", "")
+            offers = catalog.store_offers(body["storeId"]).get(slug, []) if catalog.has_store(body["storeId"]) else []
+            offset = body.get("offset", 0)
+            page = offers[offset:offset + limit]
+            return self._send(200, {
+                "name": {"finnish": catalog.category_names().get(slug, slug)},
+                "offers": page,
+                "paginatedOfferIds": [o["id"] for o in offers[offset + limit:]],
+                "totalHits": len(offers),
+            })
+
+        if endpoint == "fetch-offers":
+            store_id = body["storeId"]
+            if len(body.get("offerIds", [])) > FETCH_OFFERS_MAX_IDS:
+                state.count("400")
+                return self._send(400, {"error": f"at most {FETCH_OFFERS_MAX_IDS} offerIds"})
+            return self._send(200, {"storeId": store_id, "offers": [
+                catalog.compound_detail(store_id, oid) for oid in body.get("offerIds", [])
+            ]})
+
+        if endpoint.startswith("search-offers"):
+            qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+            store_id = qs.get("storeId", "")
+            path = qs.get("categoryPath", "")
+            offset = int(qs.get("offset", 0))
+            by_slug = catalog.store_offers(store_id) if catalog.has_store(store_id) else {}
+            seen, offers = set(), []
+            for slug, items in by_slug.items():
+                if path and slug != path:
+                    continue
+                for o in items:
+                    if o["id"] not in seen:
+                        seen.add(o["id"])
+                        offers.append(o)
+            results = [] if offset >= SEARCH_OFFERS_MAX_OFFSET else (
+                offers[offset:offset + SEARCH_OFFERS_PAGE_SIZE]
+            )
+            return self._send(200, {"totalHits": len(offers), "storeId": store_id,
+                                    "results": results, "categoryName": path,
+                                    "suggestions": []})
+
+        self._send(404, {"error": f"unknown endpoint {endpoint}"})
+
+    # ---- minimal PostgREST for supabase-py ----
+
+    def _postgrest(self, method: str, url) -> None:
+        table_name = url.path[len("/rest/v1/"):]
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with self.state.lock:
+            table = self.state.db.setdefault(table_name, {})
+
+        if method == "POST":
+            rows = self._read_json() or []
+            if isinstance(rows, dict):
+                rows = [rows]
+            conflict = qs.get("on_conflict", "id")
+            with self.state.lock:
+                for row in rows:
+                    if table_name == "products":
+                        existing = table.get(row.get("ean"), {})
+                        row.setdefault("id", existing.get("id") or secrets.token_hex(8))
+                    table[row[conflict]] = {**table.get(row[conflict], {}), **row}
+            return self._send(201, rows)
+
+        filters = []
+        for col, expr in qs.items():
+            if col in ("select", "on_conflict", "order", "limit"):
+                continue
+            op, _, value = expr.partition(".")
+            if op == "in":
+                values = {v.strip().strip('"') for v in value.strip("()").split(",")}
+                filters.append(lambda r, c=col, vs=values: str(r.get(c)) in vs)
+            elif op == "eq":
+                filters.append(lambda r, c=col, v=value: str(r.get(c)) == v)
+            elif op == "lt":
+                filters.append(lambda r, c=col, v=value: r.get(c) is not None and str(r.get(c)) < v)
+        with self.state.lock:
+            matched = [r for r in table.values() if all(f(r) for f in filters)]
+            if method == "DELETE":
+                for key in [k for k, r in table.items() if r in matched]:
+                    table.pop(key)
+        self._send(200, matched)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--helsinki-fraction", type=float, default=0.12,
+                        help="share of stores placed within 50 km of Helsinki")
+    parser.add_argument("--rate", type=float, default=3.0,
+                        help="sustained req/s before 429s (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=6)
+    parser.add_argument("--latency-median", type=float, default=0.25)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--tail-prob", type=float, default=0.005)
+    parser.add_argument("--tail-seconds", type=float, default=8.0)
+    parser.add_argument("--cookie-ttl", type=float, default=1800.0,
+                        help="seconds before cf_clearance stops working (403)")
+    parser.add_argument("--solve-seconds", type=float, default=2.0,
+                        help="simulated FlareSolverr solve time")
+    parser.add_argument("--no-auth", action="store_true",
+                        help="accept API calls without a cf_clearance cookie")
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+
+def make_server(args) -> ThreadingHTTPServer:
+    """Bind a simulator server for *args* (call ``serve_forever`` to run it)."""
+    handler = type("SimulatorHandler", (Handler,), {"state": SimulatorState(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    return server
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    server = make_server(args)
+    state = server.state
+    print(f"K-Ruoka simulator on http://{args.host}:{args.port} — "
+          f"{len(state.catalog.stores)} stores, {sum(state.catalog.offer_counts.values())} offers, "
+          f"{args.rate:g} req/s burst {args.burst}, cookie TTL {args.cookie_ttl:g}s",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(state.stats, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
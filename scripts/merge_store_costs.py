@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Merge the per-shard store cost files of a sharded sync run.
+
+Each ``sync_to_supabase.py --shard i/N`` job starts from the same
+.store-costs.json and writes its observations to .store-costs-<i>of<N>.json
+(see store_costs.py).  This folds them into OUTPUT — the file the shards
+started from — for the next run.  Shard files that don't exist (a shell glob
+that matched nothing) are skipped, and OUTPUT is left untouched when no
+shard file remains, so a run whose shards all failed keeps the old costs.
+
+Usage:
+    python scripts/merge_store_costs.py OUTPUT SHARD_FILE [SHARD_FILE ...]
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from store_costs import StoreCostModel
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        sys.exit(__doc__)
+    output, *inputs = argv
+    inputs = [path for path in inputs if os.path.isfile(path)]
+    if not inputs:
+        print(f"No shard store cost files — leaving {output} unchanged")
+        return 0
+    merged = StoreCostModel(output)
+    merged.merge([StoreCostModel(path) for path in inputs])
+    merged.save(output)
+    print(
+        f"Merged {len(inputs)} shard file(s): {len(merged.stores)} stores, "
+        f"{merged.seconds_per_call:.3f} s per API call → {output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
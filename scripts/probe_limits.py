@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Probe K-Ruoka's API limits and write them to api-limits.json.
+
+The page sizes and batch limits in helpers.py were found by hand; if
+K-Ruoka raises one, every sync keeps paying for round-trips it no longer
+needs.  This measures, within a small request budget:
+
+    offerCategoryLimit     largest offer-category ``limit`` that is served
+                           in full (400 or a short page above it)
+    fetchOffersBatch       largest fetch-offers ``offerIds`` batch answered
+                           for every ID
+    searchOffersPageSize   results per search-offers page, and whether a
+    searchOffersLimitParam ``limit`` query parameter raises it
+    searchOffersMaxOffset  first search-offers offset with no results even
+                           though ``totalHits`` is larger
+
+Each limit is found by galloping up from the current value and bisecting
+once a value is rejected.  A search the budget cuts short keeps the largest
+value it saw accepted and is listed under ``lowerBounds``.  helpers.py
+loads the file at import time (KRUOKA_API_LIMITS overrides its path) and
+falls back to the hand-found constants for anything missing.
+
+Usage:
+    python scripts/probe_limits.py [--store N110] [--big-store N190]
+                                   [--budget 60] [--output api-limits.json]
+
+--big-store should list more offers than the search-offers offset cap.
+"""
+import argparse
+import atexit
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import helpers
+
+CEILINGS = {  # never probe past these
+    "offerCategoryLimit": 200,
+    "fetchOffersBatch": 200,
+    "searchOffersPageSize": 500,
+}
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class LimitProber:
+    """Measures API limits with at most *budget* requests."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.requests = 0
+        self.lower_bounds: list[str] = []
+
+    def _request(self, method: str, endpoint: str, body: dict) -> tuple[int, dict | None]:
+        if self.requests >= self.budget:
+            raise BudgetExhausted
+        self.requests += 1
+        if method == "POST":
+            resp = helpers._post_raw(endpoint, body)
+        else:
+            url = f"{helpers.BASE_URL}/{endpoint}?{helpers._build_query_string(body)}"
+            resp = helpers._http_request("GET", url)
+        return resp.status_code, resp.json() if resp.status_code == 200 else None
+
+    def largest(self, name: str, accepts, start: int, ceiling: int) -> int:
+        """Largest n ≤ *ceiling* with ``accepts(n)`` (0 if none), assuming monotonicity."""
+        lo, hi, n = 0, ceiling + 1, min(start, ceiling)
+        try:
+            while True:
+                if not accepts(n):
+                    hi = n
+                    break
+                lo = n
+                if n >= ceiling:
+                    break
+                n = min(n * 2, ceiling)
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if accepts(mid):
+                    lo = mid
+                else:
+                    hi = mid
+        except BudgetExhausted:
+            self.lower_bounds.append(name)
+        print(f"  {name:<24} {lo}  ({self.requests}/{self.budget} requests used)")
+        return lo
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    def search_page(self, store_id: str, offset: int, limit: int | None = None) -> dict | None:
+        params = {"storeId": store_id, "offset": offset, "categoryPath": "", "language": "fi"}
+        if limit is not None:
+            params["limit"] = limit
+        return self._request("GET", "search-offers/", params)[1]
+
+    def probe_offer_category(self, store_id: str) -> int:
+        categories = self._request("POST", "offer-categories", {"storeId": store_id})[1] or {}
+        category = max(
+            categories.get("offerCategories") or [], key=lambda c: c.get("count", 0), default=None,
+        )
+        if category is None:
+            print("  offerCategoryLimit       skipped (no offer categories)")
+            return 0
+        total = category.get("count", 0)
+
+        def accepts(limit: int) -> bool:
+            status, page = self._request("POST", "offer-category", {
+                "storeId": store_id,
+                "category": {"kind": "productCategory", "slug": category["slug"]},
+                "offset": 0,
+                "limit": limit,
+                "pricing": {},
+            })
+            return status == 200 and len(page.get("offers", [])) == min(limit, page.get("totalHits", total))
+
+        # Beyond the category's size a larger limit cannot be told apart
+        ceiling = min(CEILINGS["offerCategoryLimit"], max(total, helpers.MAX_OFFER_CATEGORY_LIMIT))
+        return self.largest("offerCategoryLimit", accepts, helpers.MAX_OFFER_CATEGORY_LIMIT, ceiling)
+
+    def probe_fetch_offers(self, store_id: str, offer_ids: list[str]) -> int:
+        def accepts(n: int) -> bool:
+            status, data = self._request("POST", "fetch-offers", {
+                "storeId": store_id, "offerIds": offer_ids[:n], "pricing": {},
+            })
+            return status == 200 and len(data.get("offers", [])) == n
+
+        ceiling = min(CEILINGS["fetchOffersBatch"], len(offer_ids))
+        return self.largest("fetchOffersBatch", accepts, helpers.FETCH_OFFERS_MAX_IDS, ceiling)
+
+    def probe_search_page_size(self, store_id: str, first: dict) -> tuple[int, bool]:
+        size = len(first.get("results", []))
+        total = first.get("totalHits", 0)
+        if total <= size:
+            self.lower_bounds.append("searchOffersPageSize")
+            return size, False
+
+        def accepts(limit: int) -> bool:
+            page = self.search_page(store_id, 0, limit)
+            return page is not None and len(page.get("results", [])) == min(limit, total)
+
+        ceiling = min(CEILINGS["searchOffersPageSize"], total)
+        larger = self.largest("searchOffersPageSize", accepts, size * 2, ceiling)
+        return (larger, True) if larger > size else (size, False)
+
+    def probe_search_max_offset(self, store_id: str, total: int) -> int:
+        def accepts(offset: int) -> bool:
+            page = self.search_page(store_id, offset)
+            return page is not None and bool(page.get("results"))
+
+        last = self.largest(
+            "searchOffersMaxOffset", accepts, helpers.SEARCH_OFFERS_MAX_OFFSET - 1, total - 1,
+        )
+        if last >= total - 1 and "searchOffersMaxOffset" not in self.lower_bounds:
+            self.lower_bounds.append("searchOffersMaxOffset")  # served the whole listing
+        return last + 1
+
+
+def probe(store_id: str, big_store_id: str, budget: int) -> dict:
+    """Run every probe and return the limits file contents."""
+    prober = LimitProber(budget)
+    limits: dict = {}
+    try:
+        first = prober.search_page(store_id, 0) or {}
+        limits["offerCategoryLimit"] = prober.probe_offer_category(store_id)
+        offer_ids = [o["id"] for o in first.get("results", [])]
+        offset = len(offer_ids)
+        while len(offer_ids) < CEILINGS["fetchOffersBatch"] and offset < first.get("totalHits", 0):
+            page = prober.search_page(store_id, offset) or {}
+            if not page.get("results"):
+                break
+            offer_ids += [o["id"] for o in page["results"]]
+            offset += len(page["results"])
+        limits["fetchOffersBatch"] = prober.probe_fetch_offers(store_id, offer_ids)
+        size, limit_param = prober.probe_search_page_size(store_id, first)
+        limits["searchOffersPageSize"] = size
+        limits["searchOffersLimitParam"] = limit_param
+        big_total = (prober.search_page(big_store_id, 0) or {}).get("totalHits", 0)
+        limits["searchOffersMaxOffset"] = prober.probe_search_max_offset(big_store_id, big_total)
+    except BudgetExhausted:
+        print(f"Request budget of {budget} spent; remaining limits keep their defaults")
+    return {
+        "version": 1,
+        "probedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **{k: v for k, v in limits.items() if v},
+        "lowerBounds": prober.lower_bounds,
+        "requests": prober.requests,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--store", default="N110", help="store for category / batch probes")
+    parser.add_argument("--big-store", default="N190", help="store with > offset-cap offers")
+    parser.add_argument("--budget", type=int, default=60, help="maximum API requests")
+    parser.add_argument("--output", default=helpers.API_LIMITS_PATH)
+    args = parser.parse_args()
+
+    atexit.register(helpers.close_browser)
+    print(f"Probing API limits (budget {args.budget} requests)…")
+    result = probe(args.store, args.big_store, args.budget)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {args.output}: {json.dumps(result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ Usage:
     python scripts/profile_batching.py [store_id1] [store_id2]
 
 Requires FLARESOLVERR_URL env var (e.g. http://localhost:8191/v1).
+Leave the response cache (response_cache.py) off: cached calls skip the
+network and would hide the batching cost being profiled.
 """
 import sys
 import os
@@ -17,7 +19,12 @@ import atexit
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from helpers import search_all_offers_for_store, fetch_offers, close_browser
+from helpers import (
+    search_all_offers_for_store,
+    fetch_offers,
+    close_browser,
+    response_cache_stats,
+)
 
 # Import mapping functions from sync script
 from sync_to_supabase import (
@@ -185,6 +192,12 @@ def main() -> None:
               f"map_regular={r['t_map_regular']*1000:.0f}ms, "
               f"compound={r['t_compound_total']:.1f}s")
 
+    cache_stats = response_cache_stats()
+    if cache_stats is not None:
+        print(f"\n  Response cache: {cache_stats['hits']} hits, "
+              f"{cache_stats['misses']} misses "
+              f"(hit rate {cache_stats['hitRate']:.0%})")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,248 @@
+"""
+Per-store cost model and cost-balanced sharding for the sync run.
+
+Store cost is very skewed — a K-Citymarket has 20+ pages of offers, a
+small K-Market one or two — so splitting the store list into N equal-sized
+chunks leaves one shard doing most of the work.  ``StoreCostModel``
+estimates each store's cost in upstream API calls from, in order:
+
+  1. the calls the store took in previous runs (``.store-costs.json``,
+     smoothed so one odd run does not swing the split), then
+  2. a sweep results file (``scripts/full_sweep.py`` output,
+     ``totalApiCallsForOffers``), then
+  3. the median of the stores it does know about.
+
+Sweep results only count search-offers pages, so sweep-only stores also get
+the fetch-offers calls their compound offers will need, at the compound
+share observed across the stores with history.
+
+``lpt_shards`` splits stores into N shards of nearly equal total cost
+using LPT (longest processing time first): stores in descending cost, each
+to the currently lightest shard — within 4/3 of the optimal makespan.  The
+split is deterministic (ties broken by store ID) so every matrix job
+computes the same shards from the same cost file.
+
+Matrix jobs must all split the same cost file, so a sharded run writes its
+observations to a per-shard file (``shard_path``) instead; a final job
+merges those back into the shared file (scripts/merge_store_costs.py).
+
+``schedule`` orders a run's stores: largest first, so the pool's tail is
+short stores; when the predicted work does not fit the time budget, the
+highest-value stores (most offers) are picked first instead.
+
+The model also keeps ``secondsPerCall``, the wall-clock seconds per API
+call a whole shard achieved, which turns a shard's predicted calls into a
+predicted duration that the run summary compares with the actual one.
+"""
+import heapq
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+
+import helpers
+
+logger = logging.getLogger(__name__)
+
+COSTS_VERSION = 1
+SMOOTHING = 0.5              # weight of the newest observation
+DEFAULT_STORE_CALLS = 3.0    # nothing known about any store
+DEFAULT_SECONDS_PER_CALL = 1.0
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse ``"i/N"`` (1 ≤ i ≤ N) into ``(i, N)``; raises ValueError."""
+    index, _, count = spec.partition("/")
+    i, n = int(index), int(count)
+    if not 1 <= i <= n:
+        raise ValueError(f"shard {spec!r}: need 1 <= i <= N")
+    return i, n
+
+
+def shard_path(path: str, shard: int, shards: int) -> str:
+    """Per-shard variant of *path* (``x.json`` → ``x-2of4.json``); *path* for 1/1."""
+    if shards == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{shard}of{shards}{ext}"
+
+
+def lpt_shards(store_ids: list[str], cost: dict[str, float], n: int) -> list[list[str]]:
+    """Split *store_ids* into *n* shards of nearly equal total *cost* (LPT)."""
+    order = sorted(store_ids, key=lambda sid: (-cost[sid], sid))
+    heap = [(0.0, i) for i in range(n)]  # (load, shard index)
+    shards: list[list[str]] = [[] for _ in range(n)]
+    for sid in order:
+        load, i = heapq.heappop(heap)
+        shards[i].append(sid)
+        heapq.heappush(heap, (load + cost[sid], i))
+    return shards
+
+
+def schedule(
+    store_ids: list[str], cost: dict[str, float], value: dict[str, float],
+    capacity: float | None = None,
+) -> list[str]:
+    """Order *store_ids* for a run with room for *capacity* cost (None: unlimited).
+
+    Largest cost first.  If the total exceeds *capacity*, the stores that
+    fit — taken by descending *value* — go first (largest first among
+    them) and the rest follow by value, for whatever time is left.
+    """
+    by_cost = sorted(store_ids, key=lambda sid: (-cost[sid], sid))
+    if capacity is None or sum(cost.values()) <= capacity:
+        return by_cost
+    chosen, used = set(), 0.0
+    for sid in sorted(store_ids, key=lambda sid: (-value[sid], sid)):
+        if used + cost[sid] <= capacity:
+            chosen.add(sid)
+            used += cost[sid]
+    rest = sorted((sid for sid in store_ids if sid not in chosen), key=lambda sid: (-value[sid], sid))
+    return [sid for sid in by_cost if sid in chosen] + rest
+
+
+class StoreCostModel:
+    """Predicted API calls per store plus observed seconds per call."""
+
+    def __init__(self, path: str, sweep_path: str | None = None):
+        self.path = path
+        self.stores: dict[str, dict] = {}   # store ID → {"apiCalls", "runs", ...}
+        self.seconds_per_call = DEFAULT_SECONDS_PER_CALL
+        self.sweep: dict[str, float] = {}          # store ID → search-offers calls
+        self.sweep_offers: dict[str, float] = {}   # store ID → offers
+        self._lock = threading.Lock()
+        self._load(sweep_path)
+
+    def _load(self, sweep_path: str | None) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == COSTS_VERSION:
+                self.stores = data.get("stores", {})
+                self.seconds_per_call = data.get("secondsPerCall", DEFAULT_SECONDS_PER_CALL)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("Store costs: ignoring unreadable %s: %s", self.path, e)
+        if not sweep_path:
+            return
+        try:
+            with open(sweep_path, encoding="utf-8") as f:
+                sweep = json.load(f)
+            for s in sweep.get("stores", []):
+                if s.get("totalApiCallsForOffers"):
+                    self.sweep[s["storeId"]] = float(s["totalApiCallsForOffers"])
+                    self.sweep_offers[s["storeId"]] = float(s.get("totalOffers", 0))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Store costs: ignoring unreadable sweep %s: %s", sweep_path, e)
+
+    # ------------------------------------------------------------------
+    # Prediction
+    # ------------------------------------------------------------------
+
+    @property
+    def compound_share(self) -> float:
+        """Compound offers per listed offer, over the stores with history."""
+        listed = sum(e.get("listed", 0) for e in self.stores.values())
+        compounds = sum(e.get("compounds", 0) for e in self.stores.values())
+        return compounds / listed if listed else 0.0
+
+    def costs(self, store_ids: list[str]) -> dict[str, float]:
+        """Predicted API calls for each of *store_ids*."""
+        share = self.compound_share
+        known = {}
+        for sid in store_ids:
+            if sid in self.stores:
+                known[sid] = float(self.stores[sid]["apiCalls"])
+            elif sid in self.sweep:
+                compounds = self.sweep_offers[sid] * share
+                known[sid] = self.sweep[sid] + math.ceil(compounds / helpers.FETCH_OFFERS_MAX_IDS)
+        fallback = statistics.median(known.values()) if known else DEFAULT_STORE_CALLS
+        return {sid: known.get(sid, fallback) for sid in store_ids}
+
+    def values(self, store_ids: list[str]) -> dict[str, float]:
+        """Offers each of *store_ids* contributes (last run, else the sweep)."""
+        known = {}
+        for sid in store_ids:
+            if sid in self.stores and "offers" in self.stores[sid]:
+                known[sid] = float(self.stores[sid]["offers"])
+            elif sid in self.sweep_offers:
+                known[sid] = self.sweep_offers[sid]
+        fallback = statistics.median(known.values()) if known else 0.0
+        return {sid: known.get(sid, fallback) for sid in store_ids}
+
+    def predicted_seconds(self, api_calls: float) -> float:
+        """Wall-clock seconds a shard needs for *api_calls* calls."""
+        return api_calls * self.seconds_per_call
+
+    # ------------------------------------------------------------------
+    # Observation
+    # ------------------------------------------------------------------
+
+    def record_store(
+        self, store_id: str, api_calls: int, seconds: float, offers: int,
+        *, listed: int = 0, compounds: int = 0,
+    ) -> None:
+        """Fold one store's observed API calls into its smoothed cost.
+
+        *offers* is what the store wrote, *listed* the offers its listing
+        returned and *compounds* how many of those were compound offers.
+        """
+        with self._lock:
+            entry = self.stores.get(store_id)
+            calls = float(api_calls)
+            if entry is not None:
+                calls = SMOOTHING * calls + (1 - SMOOTHING) * entry["apiCalls"]
+            self.stores[store_id] = {
+                "apiCalls": round(calls, 2),
+                "lastApiCalls": api_calls,
+                "lastSeconds": round(seconds, 1),
+                "offers": offers,
+                "listed": listed,
+                "compounds": compounds,
+                "runs": (entry or {}).get("runs", 0) + 1,
+            }
+
+    def record_shard(self, api_calls: int, seconds: float) -> None:
+        """Fold a whole shard's wall-clock seconds per API call into the model."""
+        if api_calls <= 0:
+            return
+        with self._lock:
+            observed = seconds / api_calls
+            self.seconds_per_call = round(
+                SMOOTHING * observed + (1 - SMOOTHING) * self.seconds_per_call, 4,
+            )
+
+    def merge(self, others: list["StoreCostModel"]) -> None:
+        """Fold in the cost files other shards wrote after the same start.
+
+        Every shard starts from the same file and only updates its own
+        stores, so the entry with the most runs is the fresh one.
+        """
+        with self._lock:
+            for other in others:
+                for sid, entry in other.stores.items():
+                    if entry.get("runs", 0) > self.stores.get(sid, {}).get("runs", 0):
+                        self.stores[sid] = entry
+            rates = [self.seconds_per_call] + [o.seconds_per_call for o in others]
+            self.seconds_per_call = round(statistics.mean(rates), 4)
+
+    def save(self, path: str | None = None) -> None:
+        """Atomically rewrite the cost file (or write it to *path*)."""
+        path = path or self.path
+        tmp = f"{path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "version": COSTS_VERSION,
+                        "secondsPerCall": self.seconds_per_call,
+                        "stores": self.stores,
+                    }, f, indent=1, sort_keys=True)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning("Store costs: could not write %s: %s", path, e)
@@ -5,21 +5,54 @@ Sync K-Ruoka offers (Helsinki area) to Supabase.
 This script is designed to run as a GitHub Actions job. It:
 1. Fetches all K-Ruoka stores within 50km of Helsinki
 2. Upserts stores into the Supabase `stores` table
-3. For each store, fetches all offers via the search-offers API
-4. Maps K-Ruoka offers to the food-vibe schema
+3. For each store, fetches all offers with the cheapest plan (search-offers
+   pages, or offer-category walks for stores past the search-offers cap)
+4. Maps K-Ruoka offers to the food-vibe schema (offer_mapper.py)
 5. Upserts products (by EAN) and offers into Supabase
 6. Deletes stale offers (not seen in this sync run)
 
+Stores 3-6 run on a bounded pool of STORE_WORKERS store workers, so while
+one store is writing to Supabase the next ones are already fetching under
+the shared upstream rate limiter.  Each store's page stream is a bounded
+queue (STREAM_PREFETCH_PAGES), which holds fetching back when a worker's
+writes fall behind.  The run summary reports the time spent in each stage
+(pipeline_stats.py).
+
+Progress is journalled after every store (run_journal.py).  SIGTERM or
+SIGINT drains the run: the current store's mapped offers are flushed, a
+checkpoint is written and the script exits.  ``--resume`` continues an
+unfinished run from its journal with the original sync time, so stale-offer
+deletion still compares against the start of the run.
+
+``--shard i/N`` syncs only the i-th of N cost-balanced shards of the store
+list (store_costs.py), so a GitHub Actions matrix can split the run.  Each
+run records every store's API calls to refine the cost model and reports
+the shard's predicted against its actual duration.
+
+Stores are scheduled largest first and every finished store logs an ETA.
+With ``--budget-minutes`` (KRUOKA_TIME_BUDGET_MINUTES) a run that cannot
+fit all its stores syncs the highest-value ones first, and leaves stores it
+can no longer finish in time to the next ``--resume``.
+
+Usage:
+    python sync_to_supabase.py [--resume] [--shard i/N] [--budget-minutes M]
+
 Environment variables required:
     SUPABASE_URL - Supabase project URL
     SUPABASE_SERVICE_ROLE_KEY - Supabase service role key
 """
+import argparse
+import itertools
 import os
+import signal
 import sys
+import threading
 import time
 import json
 import logging
 import atexit
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 
 import requests
@@ -29,10 +62,22 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from helpers import (
     fetch_helsinki_stores,
-    search_all_offers_for_store,
+    iter_store_offers,
     fetch_offers,
     close_browser,
+    log_rate_controller_summary,
+    rate_controller_summary,
+    log_hedging_summary,
+    cf_strategy_summary,
+    offer_state_summary,
+    OFFER_STATE_FULL_REFRESH_EVERY,
+    FETCH_OFFERS_MAX_IDS,
 )
+from compound_cache import CompositionCache
+from offer_mapper import OfferMapper
+from pipeline_stats import EtaEstimator, StageTimer
+from run_journal import RunJournal
+from store_costs import StoreCostModel, lpt_shards, parse_shard, schedule, shard_path
 from supabase import create_client
 
 logging.basicConfig(
@@ -47,15 +92,53 @@ atexit.register(close_browser)
 
 SOURCE = "k-ruoka"
 BATCH_SIZE = 500  # Supabase upsert batch size
-COMPOUND_FETCH_BATCH = 25  # Max offer IDs per fetch-offers API call
+COMPOUND_FETCH_BATCH = FETCH_OFFERS_MAX_IDS  # Max offer IDs per fetch-offers API call
+# fetch-offers batches a store keeps in flight while its listing is still
+# paging (the rate limiter paces them with the pages).  1 expands inline.
+COMPOUND_CONCURRENCY = int(os.environ.get("KRUOKA_COMPOUND_CONCURRENCY", "2"))
+
+# Compound-offer compositions reused across runs (see compound_cache.py) —
+# kept next to the offer state unless KRUOKA_COMPOSITION_CACHE names a file;
+# off when neither is set.
+COMPOSITION_CACHE_PATH = os.environ.get("KRUOKA_COMPOSITION_CACHE") or (
+    os.path.join(os.environ["KRUOKA_OFFER_STATE_DIR"], "compositions.json.gz")
+    if os.environ.get("KRUOKA_OFFER_STATE_DIR") else None
+)
+
+# Stores synced concurrently.  All workers share the upstream rate limiter,
+# so extra workers fill its idle time (Supabase writes) rather than adding
+# load; keep it small enough for the Supabase connection budget.
+STORE_WORKERS = max(1, int(os.environ.get("KRUOKA_STORE_WORKERS", "3")))
+
+# Run journal for --resume (see run_journal.py).  A journal older than
+# RESUME_MAX_AGE is not resumed — its sync_time would be too stale.
+JOURNAL_PATH = os.environ.get(
+    "KRUOKA_SYNC_JOURNAL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sync-journal.json"),
+)
+RESUME_MAX_AGE = float(os.environ.get("KRUOKA_RESUME_MAX_AGE_HOURS", "12")) * 3600
+
+# Store cost model for --shard (see store_costs.py): observed API calls per
+# store, falling back to a full_sweep.py results file for unseen stores.
+COSTS_PATH = os.environ.get(
+    "KRUOKA_STORE_COSTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".store-costs.json"),
+)
+SWEEP_RESULTS_PATH = os.environ.get(
+    "KRUOKA_SWEEP_RESULTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples", "full-sweep-results.json"),
+)
+
+# Wall-clock budget for a run (0 = none).  Keep it under the job timeout so
+# a tight run ends with its most valuable stores synced and checkpointed.
+TIME_BUDGET_MINUTES = float(os.environ.get("KRUOKA_TIME_BUDGET_MINUTES", "0"))
+
+_drain = threading.Event()  # set by SIGTERM/SIGINT: stop after the current page
+_stages = StageTimer()      # fetch / map / expand / write seconds, all workers
+_compositions: CompositionCache | None = None
+_compound_pool: ThreadPoolExecutor | None = None
+_compound_pool_lock = threading.Lock()
 
-UNIT_MAP = {
-    "kpl": "pcs", "st": "pcs", "pcs": "pcs",
-    "kg": "kg", "kg1": "kg",
-    "l": "l", "ltr": "l",
-    "g": "g", "gr": "g",
-    "ml": "ml",
-}
 
 
 # ---------------------------------------------------------------------------
@@ -109,13 +192,6 @@ def map_store(store_data: dict) -> dict:
     }
 
 
-def map_unit(raw_unit: str | None) -> str | None:
-    """Map a raw unit string (e.g. 'kpl', 'kg') to a standard short code."""
-    if not raw_unit:
-        return None
-    return UNIT_MAP.get(raw_unit.lower().strip())
-
-
 def _is_compound_offer(offer: dict) -> bool:
     """Return True if the offer has no embedded product (compound/multi-product).
 
@@ -125,208 +201,13 @@ def _is_compound_offer(offer: dict) -> bool:
     return not offer.get("product")
 
 
-def _extract_product_fields(
-    product: dict,
-    offer: dict,
-    effective_price: float | None = None,
-) -> dict:
-    """Extract common fields from a product dict nested in an offer.
-
-    Shared logic between map_offer (single-product) and map_compound_product.
-    Returns a dict with keys: ean, image_url, source_url, raw_categories,
-    unit_price, unit, valid_from, valid_to, quantity_required, ms_pricing.
-
-    ``effective_price`` is the resolved offer-level price.  When supplied the
-    function compares it with ``mobilescan.pricing.batch.price`` to decide
-    whether this offer is actually a batch deal.  Without the comparison the
-    batch amount would be applied to *every* offer for a product that has a
-    concurrent batch campaign – even plain per-unit discounts.
-    """
-    mobilescan = product.get("mobilescan", {}) or {}
-    ms_pricing = mobilescan.get("pricing", {}) or {}
-
-    # ---- unit price / unit (prefer discount, then batch, then normal) ----
-    unit_price = None
-    unit = None
-
-    discount_up = (ms_pricing.get("discount", {}) or {}).get("unitPrice", {}) or {}
-    batch_up = (ms_pricing.get("batch", {}) or {}).get("unitPrice", {}) or {}
-    normal_up = (ms_pricing.get("normal", {}) or {}).get("unitPrice", {}) or {}
-
-    if discount_up.get("value") is not None:
-        unit_price = discount_up["value"]
-        unit = map_unit(discount_up.get("unit"))
-    elif batch_up.get("value") is not None:
-        unit_price = batch_up["value"]
-        unit = map_unit(batch_up.get("unit"))
-    elif normal_up.get("value") is not None:
-        unit_price = normal_up["value"]
-        unit = map_unit(normal_up.get("unit"))
-
-    # ---- EAN ----
-    ean = product.get("ean")
-    if ean is not None:
-        ean = str(ean).strip()
-        if not ean:
-            ean = None
-
-    # ---- image URL ----
-    images = product.get("images") or []
-    image_url = images[0] if images else offer.get("image")
-
-    # ---- source URL ----
-    url_slug = (product.get("productAttributes", {}) or {}).get("urlSlug")
-    if url_slug:
-        source_url = f"https://www.k-ruoka.fi/kauppa/tuote/{url_slug}"
-    elif ean:
-        source_url = f"https://www.k-ruoka.fi/kauppa/tuotehaku?haku={ean}"
-    else:
-        source_url = None
-
-    # ---- validity dates (prefer discount, fall back to batch) ----
-    discount_info = ms_pricing.get("discount", {}) or {}
-    batch_info = ms_pricing.get("batch", {}) or {}
-    valid_from = discount_info.get("startDate") or batch_info.get("startDate")
-    valid_to = discount_info.get("endDate") or batch_info.get("endDate")
-
-    # ---- categories (reversed: leaf → top for UI display) ----
-    raw_categories = None
-    tree = (product.get("category", {}) or {}).get("tree")
-    if tree and isinstance(tree, list):
-        raw_categories = list(reversed([
-            {
-                "name": (entry.get("localizedName", {}) or {}).get("finnish", ""),
-                "slug": entry.get("slug", ""),
-            }
-            for entry in tree
-        ]))
-
-    # ---- batch / quantity_required ----
-    # Only mark the offer as a batch deal when the resolved offer price
-    # matches the batch price from mobilescan.  A product can participate in
-    # both a per-unit discount AND a batch campaign at the same time; using
-    # the batch amount unconditionally would mis-label the per-unit offer.
-    batch = ms_pricing.get("batch", {}) or {}
-    batch_price = batch.get("price")
-    if (
-        batch_price is not None
-        and effective_price is not None
-        and abs(effective_price - batch_price) < 0.02
-    ):
-        quantity_required = batch.get("amount", 1) if batch.get("amount") else 1
-    else:
-        quantity_required = 1
-
-    return {
-        "ean": ean,
-        "image_url": image_url,
-        "source_url": source_url,
-        "raw_categories": raw_categories,
-        "unit_price": unit_price,
-        "unit": unit,
-        "valid_from": valid_from,
-        "valid_to": valid_to,
-        "quantity_required": quantity_required,
-        "ms_pricing": ms_pricing,
-    }
-
-
 def map_offer(store_id: str, offer: dict) -> tuple[dict | None, dict | None]:
     """Map a K-Ruoka offer to an (offer_row, product_row | None) tuple.
 
-    Returns (None, None) when the offer should be skipped:
-    - product.availability.store is False
-    - price >= normal_price (no actual discount)
-    - price is still None after all fallbacks
-
-    Safely navigates all nested fields — missing keys resolve to None.
+    Returns (None, None) when the offer is skipped (see offer_mapper.py).
+    The sync itself maps through one ``OfferMapper`` per store.
     """
-    offer_id = offer.get("id", "unknown")
-    now = _now_iso()
-
-    # ---- title ----
-    loc_title = offer.get("localizedTitle", {}) or {}
-    title = loc_title.get("finnish") or loc_title.get("english") or "Unknown"
-
-    # ---- top-level pricing ----
-    pricing = offer.get("pricing", {}) or {}
-    price = pricing.get("price")
-
-    normal_pricing = offer.get("normalPricing", {}) or {}
-    normal_price = normal_pricing.get("price")
-
-    # ---- product & mobilescan ----
-    product_wrapper = offer.get("product", {}) or {}
-    product = product_wrapper.get("product", {}) or {}
-
-    # ---- Price fallback: top-level → discount → batch ----
-    # Many offers (esp. Plussa percentage-based) have no top-level price.
-    # The real price lives inside mobilescan.pricing.discount or .batch.
-    if price is None:
-        ms = (product.get("mobilescan", {}) or {}).get("pricing", {}) or {}
-        price = (ms.get("discount", {}) or {}).get("price")
-        if price is None:
-            price = (ms.get("batch", {}) or {}).get("price")
-    if normal_price is None:
-        ms = (product.get("mobilescan", {}) or {}).get("pricing", {}) or {}
-        normal_price = (ms.get("normal", {}) or {}).get("price")
-
-    # ---- Skip if price is still None after all fallbacks ----
-    if price is None:
-        return None, None
-
-    # ---- Skip if product is not available in-store ----
-    availability = product.get("availability", {}) or {}
-    if availability.get("store") is False:
-        return None, None
-
-    fields = _extract_product_fields(product, offer, effective_price=price)
-    qty = fields["quantity_required"]
-
-    # Scale normal_price to batch total so it's comparable to price
-    # (normalPricing.price is per-item, pricing.price is batch total)
-    if normal_price is not None and qty > 1:
-        normal_price = round(normal_price * qty, 2)
-
-    # ---- Skip if price equals or exceeds normal price (no real discount) ----
-    if price is not None and normal_price is not None and price >= normal_price:
-        return None, None
-
-    # Fall back EAN to product_wrapper.id (for single-product offers)
-    ean = fields["ean"] or product_wrapper.get("id")
-    if ean is not None:
-        ean = str(ean).strip()
-        if not ean:
-            ean = None
-
-    offer_row = {
-        "id": f"k-ruoka:{store_id}:{offer_id}",
-        "store_id": f"k-ruoka:{store_id}",
-        "title": title,
-        "price": price,
-        "unit_price": fields["unit_price"],
-        "unit": fields["unit"],
-        "normal_price": normal_price,
-        "quantity_required": fields["quantity_required"],
-        "source_url": fields["source_url"],
-        "image_url": fields["image_url"],
-        "raw_categories": fields["raw_categories"],
-        "valid_from": fields["valid_from"],
-        "valid_to": fields["valid_to"],
-        "updated_at": now,
-        # canonical_product_id is set later after product upsert
-    }
-
-    # ---- product row (skip internal EANs starting with '2') ----
-    product_row = None
-    if ean and not ean.startswith("2"):
-        product_row = {
-            "ean": ean,
-            "name": title,
-            "image_url": fields["image_url"],
-        }
-
-    return offer_row, product_row
+    return OfferMapper(store_id, _now_iso()).map_offer(offer)[:2]
 
 
 def map_compound_product(
@@ -339,85 +220,7 @@ def map_compound_product(
     Returns (offer_row, product_row | None) or (None, None) if skipped.
     The offer ID includes the EAN to ensure uniqueness per product.
     """
-    offer_id = offer.get("id", "unknown")
-    now = _now_iso()
-
-    product = product_wrapper.get("product", {}) or {}
-
-    # ---- Skip if product is not available in-store ----
-    availability = product.get("availability", {}) or {}
-    if availability.get("store") is False:
-        return None, None
-
-    # ---- title (prefer product-level name, fall back to offer title) ----
-    product_name = (product.get("localizedName", {}) or {}).get("finnish")
-    loc_title = offer.get("localizedTitle", {}) or {}
-    offer_title = loc_title.get("finnish") or loc_title.get("english") or "Unknown"
-    title = product_name or offer_title
-
-    # ---- top-level pricing (from parent offer) ----
-    pricing = offer.get("pricing", {}) or {}
-    price = pricing.get("price")
-
-    normal_pricing = offer.get("normalPricing", {}) or {}
-    normal_price = normal_pricing.get("price")
-
-    # ---- Price fallback: top-level → discount → batch ----
-    if price is None:
-        ms = (product.get("mobilescan", {}) or {}).get("pricing", {}) or {}
-        price = (ms.get("discount", {}) or {}).get("price")
-        if price is None:
-            price = (ms.get("batch", {}) or {}).get("price")
-    if normal_price is None:
-        ms = (product.get("mobilescan", {}) or {}).get("pricing", {}) or {}
-        normal_price = (ms.get("normal", {}) or {}).get("price")
-
-    # ---- Skip if price is still None after all fallbacks ----
-    if price is None:
-        return None, None
-
-    fields = _extract_product_fields(product, offer, effective_price=price)
-    ean = fields["ean"]
-
-    if not ean:
-        return None, None
-
-    qty = fields["quantity_required"]
-
-    # Scale normal_price to batch total so it's comparable to price
-    # (normalPricing.price is per-item, pricing.price is batch total)
-    if normal_price is not None and qty > 1:
-        normal_price = round(normal_price * qty, 2)
-
-    # ---- Skip if price equals or exceeds normal price (no real discount) ----
-    if price is not None and normal_price is not None and price >= normal_price:
-        return None, None
-
-    offer_row = {
-        "id": f"k-ruoka:{store_id}:{offer_id}:{ean}",
-        "store_id": f"k-ruoka:{store_id}",
-        "title": title,
-        "price": price,
-        "unit_price": fields["unit_price"],
-        "unit": fields["unit"],
-        "normal_price": normal_price,
-        "quantity_required": fields["quantity_required"],
-        "source_url": fields["source_url"],
-        "image_url": fields["image_url"],
-        "raw_categories": fields["raw_categories"],
-        "valid_from": fields["valid_from"],
-        "valid_to": fields["valid_to"],
-        "updated_at": now,
-    }
-    
-    # if not ean.startswith("2"):  # ---- product row (skip internal EANs starting with '2') ----
-    product_row = {
-        "ean": ean,
-        "name": title,
-        "image_url": fields["image_url"],
-    }
-
-    return offer_row, product_row
+    return OfferMapper(store_id, _now_iso()).map_compound_product(offer, product_wrapper)[:2]
 
 
 # ---------------------------------------------------------------------------
@@ -476,6 +279,60 @@ def _upsert_offers(supabase, offer_rows: list[dict]) -> None:
         supabase.table("offers").upsert(batch, on_conflict="id").execute()
 
 
+class _OfferWriter:
+    """Upserts one store's mapped rows in BATCH_SIZE flushes as they arrive.
+
+    Each flush upserts the products its offers reference that this store
+    has not written yet, looks up their UUIDs (cached for the rest of the
+    store) and then upserts the offers with ``canonical_product_id`` set.
+    """
+
+    def __init__(self, supabase, store_id: str):
+        self.supabase = supabase
+        self.store_id = store_id
+        self.offer_rows: list[dict] = []
+        self.offer_eans: dict[str, str] = {}        # offer_id → EAN, until flushed
+        self.new_products: dict[str, dict] = {}     # EAN → product row, until flushed
+        self.ean_to_id: dict[str, str | None] = {}  # EAN → product UUID
+        self.offers_written = 0
+        self.products_written = 0
+
+    def add(self, offer_row: dict | None, product_row: dict | None) -> None:
+        """Queue a mapped offer/product pair; flush once a batch is full."""
+        if offer_row is None:
+            return
+        self.offer_rows.append(offer_row)
+        if product_row:
+            ean = product_row["ean"]
+            self.offer_eans[offer_row["id"]] = ean
+            if ean not in self.ean_to_id and ean not in self.new_products:
+                self.new_products[ean] = product_row
+        if len(self.offer_rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the queued products, then the queued offers."""
+        with _stages.stage("write"):
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.new_products:
+            eans = list(self.new_products)
+            _upsert_products(self.supabase, list(self.new_products.values()))
+            self.ean_to_id.update(dict.fromkeys(eans))
+            self.ean_to_id.update(_fetch_product_ids(self.supabase, eans))
+            self.products_written += len(eans)
+            self.new_products.clear()
+        if not self.offer_rows:
+            return
+        for row in self.offer_rows:
+            ean = self.offer_eans.pop(row["id"], None)
+            row["canonical_product_id"] = self.ean_to_id.get(ean) if ean else None
+        _upsert_offers(self.supabase, self.offer_rows)
+        self.offers_written += len(self.offer_rows)
+        self.offer_rows = []
+
+
 def _delete_stale_offers(supabase, store_db_id: str, sync_time: str) -> int:
     """Delete offers for *store_db_id* whose updated_at is older than *sync_time*.
 
@@ -495,166 +352,336 @@ def _delete_stale_offers(supabase, store_db_id: str, sync_time: str) -> int:
 # Per-store sync
 # ---------------------------------------------------------------------------
 
-def sync_store_offers(supabase, store_id: str, sync_time: str) -> int:
+class SyncInterrupted(Exception):
+    """A store sync stopped part-way because the run is draining."""
+
+    def __init__(self, store_id: str, offers_written: int):
+        super().__init__(f"store {store_id} interrupted after {offers_written} offers")
+        self.store_id = store_id
+        self.offers_written = offers_written
+
+
+def _fetch_compound_batch(store_id: str, offer_ids: list[str]) -> dict | None:
+    """fetch-offers for one batch of compound offers; None if it failed."""
+    try:
+        detail = fetch_offers(store_id, offer_ids)
+        if _compositions is not None:
+            for detail_offer in detail.get("offers", []):
+                _compositions.record(store_id, detail_offer)
+        return detail
+    except Exception:
+        logger.warning(
+            "Store %s: failed to batch-fetch compound offers %s, skipping",
+            store_id, offer_ids, exc_info=True,
+        )
+        return None
+
+
+def _get_compound_pool() -> ThreadPoolExecutor:
+    global _compound_pool
+    if _compound_pool is None:
+        with _compound_pool_lock:
+            if _compound_pool is None:
+                _compound_pool = ThreadPoolExecutor(
+                    max_workers=COMPOUND_CONCURRENCY * STORE_WORKERS,
+                    thread_name_prefix="kruoka-compound",
+                )
+    return _compound_pool
+
+
+class _CompoundExpander:
+    """Expands one store's compound offers while its listing is still paging.
+
+    Compound IDs are queued as pages are mapped, and every full
+    COMPOUND_FETCH_BATCH is sent to the compound pool straight away, so its
+    fetch-offers call competes for the rate limiter with the store's
+    remaining listing pages instead of waiting for them.  At most
+    COMPOUND_CONCURRENCY batches per store are in flight.  Finished batches
+    are mapped into the writer on the store's own thread (``collect``).
+    Offers whose composition is cached (``_compositions``) skip the fetch.
+    """
+
+    def __init__(self, store_id: str, writer: _OfferWriter, mapper: OfferMapper, skipped: Counter):
+        self.store_id = store_id
+        self.writer = writer
+        self.mapper = mapper
+        self.skipped = skipped      # skip reason → count, shared with the listing
+        self.offer_ids: list[str] = []
+        self.in_flight: deque[Future] = deque()
+        self.calls = 0
+        self.cached = 0
+        self.added = 0
+
+    def add(self, offer: dict) -> None:
+        """Expand a cached compound offer, or queue it and dispatch full batches."""
+        if _compositions is not None:
+            detail = _compositions.lookup(self.store_id, offer)
+            if detail is not None:
+                self.cached += 1
+                with _stages.stage("expand"):
+                    self._queue_products({"offers": [detail]})
+                return
+        self.offer_ids.append(offer["id"])
+        if len(self.offer_ids) >= COMPOUND_FETCH_BATCH:
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        batch_ids = self.offer_ids[:COMPOUND_FETCH_BATCH]
+        del self.offer_ids[:COMPOUND_FETCH_BATCH]
+        self.calls += 1
+        if COMPOUND_CONCURRENCY <= 1:
+            with _stages.stage("expand"):
+                self._queue_products(_fetch_compound_batch(self.store_id, batch_ids))
+            return
+        if len(self.in_flight) >= COMPOUND_CONCURRENCY:
+            with _stages.stage("expand"):
+                self._queue_products(self.in_flight.popleft().result())
+        self.in_flight.append(
+            _get_compound_pool().submit(_fetch_compound_batch, self.store_id, batch_ids)
+        )
+
+    def collect(self, wait: bool = False) -> None:
+        """Map the batches that have arrived (all of them when *wait*)."""
+        with _stages.stage("expand"):
+            while self.in_flight and (wait or self.in_flight[0].done()):
+                self._queue_products(self.in_flight.popleft().result())
+
+    def finish(self, expand_rest: bool = True) -> None:
+        """Dispatch the partial batch (if *expand_rest*) and wait for all."""
+        while expand_rest and self.offer_ids:
+            self._dispatch()
+        self.collect(wait=True)
+
+    def _queue_products(self, detail: dict | None) -> None:
+        for detail_offer in (detail or {}).get("offers", []):
+            products_list = detail_offer.get("products", [])
+            if not products_list:
+                logger.debug(
+                    "Store %s: compound offer %s has no products",
+                    self.store_id, detail_offer.get("id"),
+                )
+                continue
+            for pw in products_list:
+                try:
+                    o_row, p_row, skip = self.mapper.map_compound_product(detail_offer, pw)
+                except Exception:
+                    logger.warning(
+                        "Store %s: failed to map compound offer %s, skipping",
+                        self.store_id, detail_offer.get("id"), exc_info=True,
+                    )
+                    continue
+                if skip:
+                    self.skipped[skip] += 1
+                    continue
+                self.writer.add(o_row, p_row)
+                self.added += 1
+
+
+def sync_store_offers(
+    supabase, store_id: str, sync_time: str, *,
+    should_stop: callable = None, stats: dict | None = None,
+) -> int:
     """Fetch and sync all offers for a single store.
 
+    Offers stream in page by page (``iter_store_offers``) and are mapped and
+    upserted in BATCH_SIZE flushes while later pages are still being
+    fetched; compound offers are expanded COMPOUND_FETCH_BATCH at a time
+    alongside the paging (``_CompoundExpander``).
+    Stale offers are deleted only after the whole store went through.
+
     Args:
         supabase: Supabase client instance.
         store_id: K-Ruoka store ID (e.g. "N110").
         sync_time: ISO timestamp marking the start of this sync run.
+        should_stop: Checked after every page; once it returns True the
+            offers mapped so far are flushed and ``SyncInterrupted`` is
+            raised (stale offers are left alone).
+        stats: If given, filled with the store's ``apiCalls`` (offer pages
+            plus compound fetch-offers calls), fetch ``plan``, ``listed``
+            offers and how many of them were ``compounds``.
 
     Returns:
         Number of offers synced for this store.
     """
-    # 1. Fetch all offers from K-Ruoka
-    result = search_all_offers_for_store(store_id)
-    offers_raw = result.get("offers", [])
-    logger.info(
-        "Store %s: fetched %d offers in %.1fs (%d API calls)",
-        store_id,
-        len(offers_raw),
-        result.get("elapsedSeconds", 0),
-        result.get("apiCalls", 0),
-    )
-
-    if not offers_raw:
-        # No offers — still delete stale ones
-        deleted = _delete_stale_offers(supabase, f"k-ruoka:{store_id}", sync_time)
-        if deleted:
-            logger.info("Store %s: deleted %d stale offers", store_id, deleted)
-        return 0
-
-    # 2. Map offers
-    offer_rows: list[dict] = []
-    product_rows_map: dict[str, dict] = {}  # deduplicate by EAN
-    offer_ean_map: dict[str, str] = {}  # offer_id → EAN (for canonical_product_id lookup)
-    skipped_availability = 0
-    skipped_same_price = 0
+    writer = _OfferWriter(supabase, store_id)
+    mapper = OfferMapper(store_id, _now_iso())
+    fetch_summary: dict = {}
+    skipped: Counter = Counter()    # skip reason → offers
     compound_count = 0
-    compound_products = 0
-
-    def _add_mapped(offer_row: dict | None, product_row: dict | None) -> None:
-        """Append a mapped offer/product pair, tracking skips."""
-        if offer_row is None:
-            return
-        offer_rows.append(offer_row)
-        if product_row:
-            offer_ean_map[offer_row["id"]] = product_row["ean"]
-            if product_row["ean"] not in product_rows_map:
-                product_rows_map[product_row["ean"]] = product_row
-
-    # ---- First pass: process regular offers, collect compound offer IDs ----
-    compound_offer_ids: list[str] = []
-
-    for raw_offer in offers_raw:
-        try:
-            if _is_compound_offer(raw_offer):
-                compound_count += 1
-                offer_id = raw_offer.get("id", "?")
-                if offer_id != "?":
-                    compound_offer_ids.append(offer_id)
-                continue
-
-            # ---- Regular single-product offer ----
-            offer_row, product_row = map_offer(store_id, raw_offer)
-            if offer_row is None:
-                # Determine reason for skip (for logging)
-                p = (raw_offer.get("pricing", {}) or {}).get("price")
-                np = (raw_offer.get("normalPricing", {}) or {}).get("price")
-                if p is not None and np is not None and p >= np:
-                    skipped_same_price += 1
-                else:
-                    skipped_availability += 1
-                continue
-            _add_mapped(offer_row, product_row)
-        except Exception:
-            logger.warning(
-                "Store %s: failed to map offer %s, skipping",
-                store_id,
-                raw_offer.get("id", "?"),
-                exc_info=True,
-            )
+    compounds = _CompoundExpander(store_id, writer, mapper, skipped)
 
-    # ---- Batch-fetch compound offers (multiple IDs per API call) ----
-    if compound_offer_ids:
-        logger.info(
-            "Store %s: batch-fetching %d compound offers in %d call(s)",
-            store_id,
-            len(compound_offer_ids),
-            (len(compound_offer_ids) + COMPOUND_FETCH_BATCH - 1) // COMPOUND_FETCH_BATCH,
-        )
-        for batch_ids in _chunked(compound_offer_ids, COMPOUND_FETCH_BATCH):
+    def map_page(page: list[dict]) -> None:
+        """Map one page, queueing regular offers and dispatching compound IDs."""
+        nonlocal compound_count
+        for raw_offer in page:
             try:
-                detail = fetch_offers(store_id, batch_ids)
-                detail_offers = detail.get("offers", [])
-
-                # Build a lookup so we can match returned offers to IDs
-                for detail_offer in detail_offers:
-                    detail_id = detail_offer.get("id")
-                    products_list = detail_offer.get("products", [])
-                    if not products_list:
-                        logger.debug(
-                            "Store %s: compound offer %s has no products",
-                            store_id, detail_id,
-                        )
-                        continue
-                    for pw in products_list:
-                        o_row, p_row = map_compound_product(
-                            store_id, detail_offer, pw,
-                        )
-                        if o_row is None:
-                            skipped_availability += 1
-                            continue
-                        _add_mapped(o_row, p_row)
-                        compound_products += 1
+                if _is_compound_offer(raw_offer):
+                    compound_count += 1
+                    if raw_offer.get("id"):
+                        compounds.add(raw_offer)
+                    continue
+
+                # ---- Regular single-product offer ----
+                offer_row, product_row, skip = mapper.map_offer(raw_offer)
+                if skip:
+                    skipped[skip] += 1
+                    continue
+                writer.add(offer_row, product_row)
             except Exception:
                 logger.warning(
-                    "Store %s: failed to batch-fetch compound offers %s, skipping",
-                    store_id, batch_ids, exc_info=True,
+                    "Store %s: failed to map offer %s, skipping",
+                    store_id,
+                    raw_offer.get("id", "?"),
+                    exc_info=True,
                 )
 
-    if skipped_availability or skipped_same_price or compound_count:
+    # 1. Fetch, map and write offers page by page
+    stream = iter_store_offers(store_id, summary=fetch_summary)
+    while True:
+        with _stages.stage("fetch"):
+            page = next(stream, None)
+        if page is None:
+            break
+        with _stages.stage("map"):
+            map_page(page)
+        compounds.collect()
+        if should_stop and should_stop():
+            stream.close()
+            compounds.finish(expand_rest=False)
+            writer.flush()
+            logger.warning(
+                "Store %s: stopped part-way, flushed %d offers", store_id, writer.offers_written,
+            )
+            raise SyncInterrupted(store_id, writer.offers_written)
+
+    logger.info(
+        "Store %s: fetched %d offers in %.1fs via %s (%d API calls, %d predicted)",
+        store_id,
+        fetch_summary.get("totalHits", 0),
+        fetch_summary.get("elapsedSeconds", 0),
+        fetch_summary.get("plan", "?"),
+        fetch_summary.get("apiCalls", 0),
+        fetch_summary.get("predictedCalls", 0),
+    )
+    if fetch_summary.get("reusedListings"):
         logger.info(
-            "Store %s: skipped %d (availability) + %d (same-price), "
-            "expanded %d compound offers → %d products",
-            store_id, skipped_availability, skipped_same_price,
-            compound_count, compound_products,
+            "Store %s: %d unchanged listing(s) reused, %d page(s) skipped",
+            store_id, fetch_summary["reusedListings"], fetch_summary["skippedPages"],
         )
 
-    # 3. Upsert products
-    product_rows = list(product_rows_map.values())
-    if product_rows:
-        _upsert_products(supabase, product_rows)
-        logger.info("Store %s: upserted %d products", store_id, len(product_rows))
-
-    # 4. Fetch product UUIDs and attach to offers
-    eans = list(product_rows_map.keys())
-    ean_to_id = _fetch_product_ids(supabase, eans)
-    for row in offer_rows:
-        ean = offer_ean_map.get(row["id"])
-        if ean and ean in ean_to_id:
-            row["canonical_product_id"] = ean_to_id[ean]
-        else:
-            row["canonical_product_id"] = None
+    # 2. Expand the remaining compound offers and write what is left
+    compounds.finish()
+    writer.flush()
 
-    # 5. Upsert offers
-    _upsert_offers(supabase, offer_rows)
-    logger.info("Store %s: upserted %d offers", store_id, len(offer_rows))
+    if skipped or compound_count:
+        logger.info(
+            "Store %s: skipped %d (%s), "
+            "expanded %d compound offers (%d from cached compositions) → %d products",
+            store_id, sum(skipped.values()),
+            ", ".join(f"{n} {reason}" for reason, n in skipped.most_common()) or "none",
+            compound_count, compounds.cached, compounds.added,
+        )
+    if writer.offers_written:
+        logger.info(
+            "Store %s: upserted %d products and %d offers",
+            store_id, writer.products_written, writer.offers_written,
+        )
 
-    # 6. Delete stale offers
-    deleted = _delete_stale_offers(supabase, f"k-ruoka:{store_id}", sync_time)
+    # 3. Delete stale offers
+    with _stages.stage("write"):
+        deleted = _delete_stale_offers(supabase, f"k-ruoka:{store_id}", sync_time)
     if deleted:
         logger.info("Store %s: deleted %d stale offers", store_id, deleted)
 
-    return len(offer_rows)
+    if stats is not None:
+        stats["apiCalls"] = fetch_summary.get("apiCalls", 0) + compounds.calls
+        stats["plan"] = fetch_summary.get("plan")
+        stats["listed"] = fetch_summary.get("totalHits", 0)
+        stats["compounds"] = compound_count
+    return writer.offers_written
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
-def main() -> None:
+def _install_drain_handlers() -> None:
+    """First SIGTERM/SIGINT drains the run; a second one stops it at once."""
+
+    def handle(signum, _frame):
+        if _drain.is_set():
+            raise KeyboardInterrupt
+        logger.warning(
+            "Received %s — finishing the current page, flushing and checkpointing",
+            signal.Signals(signum).name,
+        )
+        _drain.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+
+def _select_shard(
+    stores: list[dict], costs: StoreCostModel, shard: int, shards: int,
+) -> list[dict]:
+    """The stores of cost-balanced *shard* (1-based) of *shards*, in fetch order."""
+    if shards == 1:
+        return stores
+    ids = sorted(s["id"] for s in stores)  # same input on every matrix job
+    split = lpt_shards(ids, costs.costs(ids), shards)
+    mine = set(split[shard - 1])
+    return [s for s in stores if s["id"] in mine]
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}m{secs:02d}s"
+
+
+def _schedule_stores(
+    journal: RunJournal, costs: StoreCostModel, budget_seconds: float,
+) -> tuple[list[dict], dict[str, float]]:
+    """Pending stores in run order, and each one's predicted API calls.
+
+    Stores interrupted last time go first; the rest follow ``schedule``,
+    with the budget (if any) converted to API calls at the model's rate.
+    """
+    pending = journal.pending()
+    cost = costs.costs([s["id"] for s in pending])
+    resumed = [s for s in pending if s["id"] in journal.in_flight]
+    rest = {s["id"]: s for s in pending if s["id"] not in journal.in_flight}
+    capacity = None
+    if budget_seconds:
+        capacity = budget_seconds / costs.seconds_per_call - sum(cost[s["id"]] for s in resumed)
+    order = schedule(list(rest), {sid: cost[sid] for sid in rest}, costs.values(list(rest)), capacity)
+    return resumed + [rest[sid] for sid in order], cost
+
+
+def main(argv: list[str] | None = None) -> None:
     """Entry point — sync Helsinki-area K-Ruoka stores and offers to Supabase."""
+    global _compositions
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue an unfinished run from its journal (keeps its sync time)",
+    )
+    parser.add_argument(
+        "--shard", default="1/1", metavar="i/N",
+        help="sync only the i-th of N cost-balanced store shards (default 1/1)",
+    )
+    parser.add_argument(
+        "--budget-minutes", type=float, default=TIME_BUDGET_MINUTES, metavar="M",
+        help="wall-clock budget; stores that no longer fit are left for --resume",
+    )
+    args = parser.parse_args(argv)
+    try:
+        shard, shards = parse_shard(args.shard)
+    except ValueError as e:
+        parser.error(str(e))
+    journal_path = shard_path(JOURNAL_PATH, shard, shards)  # one journal per shard
+    costs = StoreCostModel(COSTS_PATH, SWEEP_RESULTS_PATH)
+    if COMPOSITION_CACHE_PATH:
+        _compositions = CompositionCache(COMPOSITION_CACHE_PATH, OFFER_STATE_FULL_REFRESH_EVERY)
 
     # ---- validate env ----
     supabase_url = os.environ.get("SUPABASE_URL")
@@ -667,61 +694,178 @@ def main() -> None:
     logger.info("Supabase client initialised (%s)", supabase_url)
 
     t_start = time.perf_counter()
-    sync_time = _now_iso()
+    journal = RunJournal.load(journal_path, RESUME_MAX_AGE) if args.resume else None
 
-    # ---- 1. Fetch stores ----
-    logger.info("Fetching Helsinki-area K-Ruoka stores…")
-    stores = fetch_helsinki_stores()
-    logger.info("Found %d stores", len(stores))
-
-    if not stores:
-        logger.warning("No stores found — exiting")
-        sys.exit(0)
-
-    # ---- 2. Upsert stores ----
-    upsert_stores(supabase, stores)
-
-    # ---- 3. Sync offers for each store ----
-    total_offers = 0
-    errors: list[str] = []
-
-    for idx, store in enumerate(stores, 1):
+    if journal is not None:
+        logger.info(
+            "Resuming run from %s: %d/%d stores done, sync time %s",
+            journal_path, len(journal.completed), len(journal.stores), journal.sync_time,
+        )
+    else:
+        sync_time = _now_iso()
+
+        # ---- 1. Fetch stores ----
+        logger.info("Fetching Helsinki-area K-Ruoka stores…")
+        stores = fetch_helsinki_stores()
+        logger.info("Found %d stores", len(stores))
+
+        if not stores:
+            logger.warning("No stores found — exiting")
+            sys.exit(0)
+        stores = _select_shard(stores, costs, shard, shards)
+        if shards > 1:
+            logger.info("Shard %d/%d: %d stores", shard, shards, len(stores))
+
+        # ---- 2. Upsert stores ----
+        upsert_stores(supabase, stores)
+
+        journal = RunJournal(
+            journal_path, sync_time,
+            [{"id": s["id"], "name": s.get("name", "")} for s in stores],
+        )
+        journal.save()
+
+    # ---- 3. Sync offers, STORE_WORKERS stores at a time ----
+    _install_drain_handlers()
+    budget = args.budget_minutes * 60
+    pending, predicted = _schedule_stores(journal, costs, budget)
+    started = itertools.count(len(journal.stores) - len(pending) + 1)
+    finished = itertools.count(len(journal.stores) - len(pending) + 1)
+    predicted_calls = sum(predicted.values())
+    predicted_seconds = costs.predicted_seconds(predicted_calls)
+    eta = EtaEstimator(predicted_calls, costs.seconds_per_call)
+    actual_calls = 0
+    calls_lock = threading.Lock()
+    over_budget: list[str] = []
+    committed = 0.0  # predicted calls of the stores started so far
+
+    def upstream_progress() -> tuple[int, float]:
+        """Upstream calls and seconds since the store workers started."""
+        calls = rate_controller_summary()["responses"] - responses_before
+        return calls, time.perf_counter() - t_stores
+
+    def sync_store(store: dict) -> None:
+        nonlocal actual_calls, committed
+        if _drain.is_set():
+            return
         sid = store["id"]
+        if budget:
+            # The run finishes once every started store's calls are made
+            calls, elapsed = upstream_progress()
+            with calls_lock:
+                needed = eta.seconds_for(committed + predicted[sid], calls, elapsed)
+                fits = t_stores - t_start + needed <= budget
+                if fits:
+                    committed += predicted[sid]
+                else:
+                    over_budget.append(sid)
+            if not fits:
+                logger.info("Store %s: would not finish within the time budget, leaving it", sid)
+                eta.store_skipped(predicted[sid])
+                return
         logger.info(
             "--- [%d/%d] Syncing store %s (%s) ---",
-            idx,
-            len(stores),
+            next(started),
+            len(journal.stores),
             sid,
             store.get("name", ""),
         )
+        journal.start_store(sid)
+        stats: dict = {}
+        t0 = time.perf_counter()
         try:
-            count = sync_store_offers(supabase, sid, sync_time)
-            total_offers += count
+            count = sync_store_offers(
+                supabase, sid, journal.sync_time, should_stop=_drain.is_set, stats=stats,
+            )
+            journal.store_done(sid, count)
+            costs.record_store(
+                sid, stats.get("apiCalls", 0), time.perf_counter() - t0, count,
+                listed=stats.get("listed", 0), compounds=stats.get("compounds", 0),
+            )
+            with calls_lock:
+                actual_calls += stats.get("apiCalls", 0)
+            eta.store_done(predicted[sid], stats.get("apiCalls", 0))
+            remaining = eta.remaining_seconds(*upstream_progress())
+            logger.info(
+                "--- [%d/%d] Store %s done — ETA %s (about %s) ---",
+                next(finished), len(journal.stores), sid, _format_duration(remaining),
+                time.strftime("%H:%M", time.localtime(time.time() + remaining)),
+            )
+        except SyncInterrupted as e:
+            journal.store_interrupted(sid, e.offers_written)
         except Exception:
             logger.error("Store %s FAILED", sid, exc_info=True)
-            errors.append(sid)
-
+            journal.store_failed(sid)
 
+    logger.info(
+        "Syncing %d store(s) with %d worker(s): predicted %.0f API calls, ~%s",
+        len(pending), STORE_WORKERS, predicted_calls, _format_duration(predicted_seconds),
+    )
+    t_stores = time.perf_counter()
+    responses_before = rate_controller_summary()["responses"]
+    try:
+        with ThreadPoolExecutor(STORE_WORKERS, thread_name_prefix="kruoka-store") as pool:
+            # list() re-raises anything sync_store let through
+            list(pool.map(sync_store, pending))
+        stores_elapsed = time.perf_counter() - t_stores
+        if not journal.resumes and not _drain.is_set() and not over_budget:
+            costs.record_shard(actual_calls, stores_elapsed)
+    finally:
+        # Also on the KeyboardInterrupt of a second SIGTERM/SIGINT
+        costs.save(shard_path(COSTS_PATH, shard, shards))  # merged after a matrix run
+        if _compositions is not None:
+            _compositions.save()
+
+    if _drain.is_set():
+        logger.warning(
+            "Sync drained after %d/%d stores — checkpoint saved to %s, "
+            "continue with --resume",
+            len(journal.completed), len(journal.stores), journal_path,
+        )
+        sys.exit(1)
+    if over_budget:
+        logger.warning(
+            "Time budget reached: %d store(s) left for --resume %s",
+            len(over_budget), over_budget,
+        )
+    else:
+        journal.finish()
 
     # ---- 4. Summary ----
     elapsed = time.perf_counter() - t_start
+    errors = journal.failed
     logger.info("=" * 60)
-    logger.info("Sync complete")
-    logger.info("  Stores synced : %d", len(stores))
-    logger.info("  Total offers  : %d", total_offers)
+    logger.info("Sync complete%s", f" (resumed {journal.resumes}x)" if journal.resumes else "")
+    logger.info("  Stores synced : %d/%d", len(journal.completed), len(journal.stores))
+    logger.info("  Total offers  : %d", journal.total_offers)
     logger.info("  Errors        : %d  %s", len(errors), errors if errors else "")
     logger.info("  Elapsed       : %.1f s (%.1f min)", elapsed, elapsed / 60)
+    logger.info(
+        "  Shard %d/%d     : predicted %.0f API calls / %.0f s, actual %d / %.0f s",
+        shard, shards, predicted_calls, predicted_seconds, actual_calls, stores_elapsed,
+    )
+    rate = rate_controller_summary()
+    _stages.log_summary(
+        stores_elapsed, STORE_WORKERS, rate["responses"] - responses_before, rate["rate"],
+    )
+    log_rate_controller_summary()
+    log_hedging_summary()
+    logger.info("  CF strategies : %s", cf_strategy_summary())
+    if offer_state_summary() is not None:
+        logger.info("  Offer state   : %s", offer_state_summary())
+    if _compositions is not None:
+        logger.info("  Compositions  : %s", _compositions.summary())
     logger.info("=" * 60)
 
     # ---- 5. Trigger merged_products rebuild on food-vibe (best-effort) ----
     trigger_merged_rebuild()
 
     # Fail the GH Actions job if too many stores errored out (> 25%)
-    if errors and len(errors) > len(stores) * 0.25:
+    if errors and len(errors) > len(journal.stores) * 0.25:
         logger.error(
             "Too many errors (%d/%d stores failed) \u2014 exiting with code 1",
             len(errors),
-            len(stores),
+            len(journal.stores),
         )
         sys.exit(1)
 
@@ -0,0 +1,163 @@
+"""
+Shared fixtures for the offline tests.
+
+``fake_supabase`` is a tiny in-memory stand-in for the supabase-py client that
+supports exactly the query chains sync_to_supabase.py uses:
+    table(...).upsert(rows, on_conflict=...).execute()
+    table(...).select(...).in_(col, values).execute()
+    table(...).delete().eq(col, value).lt(col, value).execute()
+
+``sim`` starts scripts/kruoka_simulator.py on a free port and points the real
+curl_cffi transport in helpers.py at it; ``fast_limiter`` lifts the rate
+limits for multi-page tests; ``simulator`` is the simulator module itself.
+"""
+import importlib.util
+import itertools
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import helpers
+from cf_race import StrategyStats
+from rate_control import AimdRateController, EndpointRateLimiter
+
+ROOT = Path(__file__).resolve().parent.parent
+_spec = importlib.util.spec_from_file_location(
+    "kruoka_simulator", ROOT / "scripts" / "kruoka_simulator.py"
+)
+kruoka_simulator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(kruoka_simulator)
+
+
+class _FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._op = None
+        self._rows: list[dict] = []
+        self._conflict = "id"
+        self._filters: list = []
+
+    def upsert(self, rows, on_conflict="id"):
+        self._op, self._rows, self._conflict = "upsert", list(rows), on_conflict
+        return self
+
+    def select(self, _columns):
+        self._op = "select"
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        self._filters.append(lambda r: r.get(column) is not None and r.get(column) < value)
+        return self
+
+    def execute(self):
+        table = self._db.tables.setdefault(self._table, {})
+        self._db.calls.append((self._table, self._op, len(self._rows)))
+        if self._op == "upsert":
+            for row in self._rows:
+                row = dict(row)
+                if self._table == "products":
+                    row.setdefault("id", table.get(row["ean"], {}).get("id")
+                                   or f"uuid-{next(self._db.ids)}")
+                table[row[self._conflict]] = {**table.get(row[self._conflict], {}), **row}
+            return SimpleNamespace(data=self._rows)
+        matched = [r for r in table.values() if all(f(r) for f in self._filters)]
+        if self._op == "delete":
+            for r in matched:
+                key = r.get("ean") if self._table == "products" else r.get("id")
+                table.pop(key, None)
+        return SimpleNamespace(data=matched)
+
+
+class FakeSupabase:
+    """In-memory supabase-py stand-in (see module docstring)."""
+
+    def __init__(self):
+        self.tables: dict[str, dict] = {}
+        self.calls: list[tuple] = []
+        self.ids = itertools.count(1)
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+
+@pytest.fixture
+def fake_supabase() -> FakeSupabase:
+    return FakeSupabase()
+
+
+@pytest.fixture
+def example_cassette(tmp_path) -> str:
+    """Path to a replay cassette built from examples/ (store N110)."""
+    path = tmp_path / "examples-n110.jsonl"
+    subprocess.run(
+        [sys.executable, str(ROOT / "scripts" / "build_cassette.py"), str(path)],
+        check=True, capture_output=True,
+    )
+    return str(path)
+
+
+@pytest.fixture
+def simulator():
+    """The scripts/kruoka_simulator.py module (its API limits can be patched)."""
+    return kruoka_simulator
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    """Start a simulator on a free port and point helpers at it."""
+    args = kruoka_simulator.build_parser().parse_args([
+        "--port", "0", "--rate", "0", "--latency-median", "0.001",
+        "--tail-prob", "0", "--solve-seconds", "0",
+    ])
+    server = kruoka_simulator.make_server(args)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(helpers, "BASE_URL", f"{site}/kr-api")
+    monkeypatch.setattr(helpers, "SITE_URL", site)
+    monkeypatch.setenv("FLARESOLVERR_URL", f"{site}/v1")
+    monkeypatch.delenv("CAPTCHA_API_KEY", raising=False)
+    monkeypatch.setattr(helpers, "_cf_strategy_stats", StrategyStats(None))
+    # Same limits as helpers, but never load or save the repo's .rate-state.json
+    controller = AimdRateController(
+        initial_rate=1.0 / helpers.GLOBAL_MIN_INTERVAL, burst=helpers.GLOBAL_BURST,
+        min_rate=helpers.MIN_RATE, max_rate=helpers.MAX_RATE, state_path=None,
+    )
+    monkeypatch.setattr(helpers, "_rate_controller", controller)
+    monkeypatch.setattr(helpers, "_endpoint_limiter", EndpointRateLimiter(
+        controller, helpers.ENDPOINT_RATE_LIMITS, default=helpers.DEFAULT_ENDPOINT_RATE_LIMIT,
+    ))
+    helpers.close_browser()
+    yield server
+    helpers.close_browser()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fast_limiter(monkeypatch):
+    """Lift the rate limits so multi-page tests are bound by latency only."""
+    fast = AimdRateController(initial_rate=100.0, burst=50, max_rate=100.0)
+    monkeypatch.setattr(helpers, "_rate_controller", fast)
+    monkeypatch.setattr(
+        helpers, "_endpoint_limiter",
+        EndpointRateLimiter(fast, {}, default=(100.0, 50)),
+    )
@@ -0,0 +1,106 @@
+"""
+Tests for async_helpers.py — AsyncKRuokaClient against the local simulator
+(paging, 429 back-off and the shared 403 re-authentication).
+
+Run:
+    python -m pytest tests/test_async_helpers.py -v
+"""
+import asyncio
+
+import pytest
+
+import async_helpers
+import helpers
+from async_helpers import AsyncKRuokaClient
+
+
+def _run(fn):
+    """Run ``fn(client)`` on a fresh event loop with an open client."""
+    async def main():
+        async with AsyncKRuokaClient() as client:
+            return await fn(client)
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def fast_429(monkeypatch):
+    """Millisecond 429 back-offs, recorded instead of pausing the limiter."""
+    pauses: list[float] = []
+    monkeypatch.setattr(async_helpers, "INITIAL_429_BACKOFF", 0.01)
+    monkeypatch.setattr(helpers, "_pause_rate_limiter", pauses.append)
+    return pauses
+
+
+class TestPaging:
+    def test_category_pages_match_catalog(self, sim, fast_limiter):
+        offers = sim.state.catalog.store_offers("N110")
+        slug = max(offers, key=lambda s: len(offers[s]))
+        result = _run(lambda c: c.fetch_all_offers_for_category("N110", slug))
+        pages = -(-len(offers[slug]) // helpers.MAX_OFFER_CATEGORY_LIMIT)
+        assert pages >= 4
+        assert [o["id"] for o in result["offers"]] == list(dict.fromkeys(o["id"] for o in offers[slug]))
+        assert result["totalHits"] == len(offers[slug])
+        assert result["apiCalls"] == pages
+
+    def test_store_sweep_matches_offer_counts(self, sim, fast_limiter):
+        counts = sim.state.catalog.offer_counts
+        store_id = min(counts, key=counts.get)
+        result = _run(lambda c: c.search_all_offers_for_store(store_id))
+        assert result["totalHits"] == counts[store_id]
+        assert len({o["id"] for o in result["offers"]}) == counts[store_id]
+
+    def test_limit_defaults_to_the_probed_limit(self, sim):
+        offers = sim.state.catalog.store_offers("N110")
+        slug = max(offers, key=lambda s: len(offers[s]))
+        category = {"kind": "productCategory", "slug": slug}
+        page = _run(lambda c: c.fetch_offer_category("N110", category))
+        assert len(page["offers"]) == helpers.MAX_OFFER_CATEGORY_LIMIT
+
+
+class TestBackPressure:
+    def test_429_backs_off_and_retries(self, sim, fast_429, monkeypatch):
+        async def throttled(client):
+            answers = iter([False, False])  # two 429s, then served
+            monkeypatch.setattr(sim.state, "allow_request", lambda: next(answers, True))
+            return await client.fetch_offer_categories("N110")
+
+        assert _run(throttled)["offerCategories"]
+        assert sim.state.stats["429"] == 2
+        assert fast_429 == [0.01, 0.02]  # doubling, and every caller paused
+
+    def test_429_gives_up_after_max_retries(self, sim, fast_limiter, fast_429, monkeypatch):
+        async def throttled(client):
+            monkeypatch.setattr(sim.state, "allow_request", lambda: False)
+            return await client._post_raw("offer-categories", {"storeId": "N110"})
+
+        assert _run(throttled).status_code == 429
+        assert sim.state.stats["429"] == helpers.MAX_429_RETRIES + 1
+        assert len(fast_429) == helpers.MAX_429_RETRIES
+
+
+class TestReauth:
+    def test_concurrent_403s_share_one_reauth(self, sim, fast_limiter):
+        async def burst(client):
+            await client.fetch_offer_categories("N110")
+            generation = helpers._cf_generation
+            sim.state.tokens.clear()  # the clearance the session holds is now rejected
+            results = await asyncio.gather(
+                *(client.fetch_offer_categories("N110") for _ in range(6))
+            )
+            return generation, results
+
+        generation, results = _run(burst)
+        assert all(r["offerCategories"] for r in results)
+        assert sim.state.stats["403"] >= 1
+        assert sim.state.stats["solves"] == 2
+        assert helpers._cf_generation == generation + 1
+
+    def test_gives_up_when_reauth_is_still_rejected(self, sim, monkeypatch):
+        async def rejected(client):
+            await client.fetch_offer_categories("N110")
+            monkeypatch.setattr(sim.state, "token_valid", lambda token: False)
+            return await client._post_raw("offer-categories", {"storeId": "N110"})
+
+        resp = _run(rejected)
+        assert resp.status_code == 403
+        assert sim.state.stats["solves"] == 2  # one re-auth, then the 403 stands
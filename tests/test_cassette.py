@@ -0,0 +1,60 @@
+"""
+Offline tests for record/replay cassettes (cassette.py) — the helpers and the
+per-store sync run end-to-end against the example payloads in examples/.
+
+Run:
+    python -m pytest tests/test_cassette.py -v
+"""
+import pytest
+
+import helpers
+from cassette import Cassette, CassetteMiss
+
+
+@pytest.fixture
+def replay(example_cassette):
+    cassette = helpers.use_cassette(example_cassette, mode="replay", speed=0.0)
+    yield cassette
+    helpers.stop_cassette()
+
+
+class TestCassette:
+    def test_record_then_replay_in_order(self, tmp_path):
+        path = str(tmp_path / "c.jsonl.gz")
+        rec = Cassette(path, mode="record")
+        rec.record("POST", "offer-categories", {"storeId": "N1"}, 429, "slow down", 0.1)
+        rec.record("POST", "offer-categories", {"storeId": "N1"}, 200, "{}", 0.2)
+
+        play = Cassette(path, mode="replay", speed=0.5)
+        first = play.lookup("POST", "offer-categories", {"storeId": "N1"})
+        second = play.lookup("POST", "offer-categories", {"storeId": "N1"})
+        again = play.lookup("POST", "offer-categories", {"storeId": "N1"})
+        assert (first["status"], second["status"], again["status"]) == (429, 200, 200)
+        assert play.delay_for(second) == pytest.approx(0.1)
+
+    def test_unrecorded_request_raises(self, tmp_path):
+        path = str(tmp_path / "c.jsonl")
+        Cassette(path, mode="record")
+        with pytest.raises(CassetteMiss):
+            Cassette(path, mode="replay").lookup("GET", "search-offers/", None)
+
+
+class TestReplayTransport:
+    def test_search_all_offers_for_store(self, replay):
+        result = helpers.search_all_offers_for_store("N110")
+        assert result["totalHits"] == 9
+        assert result["apiCalls"] == 2  # categories + the one page totalHits=13 needs
+        assert replay.stats()["misses"] == 0
+
+    def test_fetch_offers_compound(self, replay):
+        detail = helpers.fetch_offers("N110", ["301851P"])
+        assert len(detail["offers"][0]["products"]) == 2
+
+    def test_sync_store_offers(self, replay, fake_supabase):
+        from sync_to_supabase import sync_store_offers
+
+        synced = sync_store_offers(fake_supabase, "N110", "2026-01-01T00:00:00+00:00")
+        offers = fake_supabase.tables["offers"]
+        assert synced == len(offers) > 0
+        assert all(row["store_id"] == "k-ruoka:N110" for row in offers.values())
+        assert any(key.startswith("k-ruoka:N110:301851P:") for key in offers)
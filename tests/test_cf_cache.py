@@ -0,0 +1,68 @@
+"""
+Tests for the encrypted Cloudflare clearance cache (cf_cache.py), offline
+and through helpers.py against the local simulator.
+
+Run:
+    python -m pytest tests/test_cf_cache.py -v
+"""
+import time
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+import helpers
+from cf_cache import ClearanceCache
+
+SITE = "https://www.k-ruoka.fi"
+COOKIES = {"cf_clearance": "abc", "__cf_bm": "def"}
+
+
+class TestClearanceCache:
+    def test_round_trip_is_encrypted(self, tmp_path):
+        path = str(tmp_path / "cf.bin")
+        ClearanceCache(path, "passphrase", SITE).save(COOKIES, "UA/1", time.time() + 600)
+        assert b"cf_clearance" not in open(path, "rb").read()
+        cookies, ua, _ = ClearanceCache(path, "passphrase", SITE).load()
+        assert (cookies, ua) == (COOKIES, "UA/1")
+
+    def test_wrong_key_is_ignored(self, tmp_path):
+        path = str(tmp_path / "cf.bin")
+        ClearanceCache(path, "right", SITE).save(COOKIES, "UA/1", time.time() + 600)
+        assert ClearanceCache(path, "wrong", SITE).load() is None
+
+    def test_expired_or_nearly_expired_is_ignored(self, tmp_path, caplog):
+        path = str(tmp_path / "cf.bin")
+        cache = ClearanceCache(path, "k", SITE, min_remaining=120)
+        caplog.set_level("INFO", logger="cf_cache")
+        cache.save(COOKIES, "UA/1", time.time() + 60)
+        assert cache.load() is None
+        assert "too close to reuse" in caplog.text
+        cache.save(COOKIES, "UA/1", time.time() - 60)
+        assert cache.load() is None
+        assert "expired 60s ago" in caplog.text
+
+    def test_other_site_is_ignored(self, tmp_path):
+        path = str(tmp_path / "cf.bin")
+        ClearanceCache(path, "k", SITE).save(COOKIES, "UA/1", time.time() + 600)
+        assert ClearanceCache(path, "k", "http://127.0.0.1:8088").load() is None
+
+
+class TestCachedClearance:
+    """helpers.py reusing a cached clearance against the local simulator."""
+
+    def test_cached_clearance_skips_cf_bypass(self, sim, monkeypatch, tmp_path):
+        monkeypatch.setattr(helpers, "CF_CACHE_KEY", "test-key")
+        monkeypatch.setattr(helpers, "CF_CACHE_PATH", str(tmp_path / "cf.bin"))
+        monkeypatch.setattr(helpers, "_clearance_cache", None)
+        helpers.fetch_offer_categories("N110")
+        assert sim.state.stats["solves"] == 1
+
+        helpers.close_browser()  # simulate a fresh process
+        helpers.fetch_offer_categories("N110")
+        assert sim.state.stats["solves"] == 1
+
+        helpers.close_browser()
+        sim.state.tokens.clear()  # the cached clearance is no longer accepted
+        helpers.fetch_offer_categories("N110")
+        assert sim.state.stats["solves"] == 2
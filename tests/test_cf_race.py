@@ -0,0 +1,90 @@
+"""
+Offline tests for racing the CF bypass strategies (cf_race.py).
+
+Run:
+    python -m pytest tests/test_cf_race.py -v
+"""
+import threading
+import time
+
+import pytest
+
+import cf_race
+from cf_race import StrategyStats
+
+CLEARANCE = ({"cf_clearance": "ok"}, "UA/1")
+
+
+def _slow(torn_down: threading.Event):
+    def solve():
+        try:
+            for _ in range(100):
+                cf_race.sleep(0.1)
+            return CLEARANCE
+        finally:
+            torn_down.set()  # e.g. the browser's ctx.close()
+    return solve
+
+
+def _failing():
+    raise RuntimeError("FlareSolverr timed out")
+
+
+class TestRace:
+    def test_first_clearance_wins_and_losers_are_cancelled(self):
+        torn_down = threading.Event()
+        t0 = time.monotonic()
+        name, value = cf_race.race([("Browser", _slow(torn_down)), ("2Captcha", lambda: CLEARANCE)])
+        assert (name, value) == ("2Captcha", CLEARANCE)
+        assert time.monotonic() - t0 < 1
+        assert torn_down.wait(1)
+
+    def test_failures_fall_through_to_a_later_strategy(self):
+        name, _ = cf_race.race([("FlareSolverr", _failing), ("2Captcha", lambda: CLEARANCE)])
+        assert name == "2Captcha"
+
+    def test_all_failed_raises(self):
+        with pytest.raises(RuntimeError, match="All CF bypass strategies failed"):
+            cf_race.race([("FlareSolverr", _failing), ("Browser", _failing)])
+
+    def test_stagger_gives_head_start(self):
+        started = []
+        def late():
+            started.append("Browser")
+            return CLEARANCE
+        name, _ = cf_race.race([("FlareSolverr", lambda: CLEARANCE), ("Browser", late)], stagger=5)
+        time.sleep(0.1)
+        assert name == "FlareSolverr" and started == []
+
+    def test_sleep_outside_race_is_plain_sleep(self):
+        cf_race.sleep(0)
+        cf_race.check()
+        assert not cf_race.racing()
+
+
+class TestStrategyStats:
+    def test_default_order_until_every_strategy_has_history(self, tmp_path):
+        stats = StrategyStats(str(tmp_path / "s.json"), min_attempts=2)
+        for _ in range(2):
+            stats.record("Browser", True, 20.0)
+        assert stats.order(["FlareSolverr", "Browser"]) == ["FlareSolverr", "Browser"]
+
+    def test_orders_by_expected_time_and_persists(self, tmp_path):
+        path = str(tmp_path / "s.json")
+        stats = StrategyStats(path, min_attempts=2)
+        for ok in (False, False, True):
+            stats.record("FlareSolverr", ok, 30.0)
+        for _ in range(3):
+            stats.record("2Captcha", True, 40.0)
+        reloaded = StrategyStats(path, min_attempts=2)
+        assert reloaded.order(["FlareSolverr", "2Captcha"]) == ["2Captcha", "FlareSolverr"]
+        assert reloaded.summary()["FlareSolverr"]["successes"] == 1
+
+    def test_race_records_outcomes(self, tmp_path):
+        stats = StrategyStats(str(tmp_path / "s.json"))
+        cf_race.race(
+            [("FlareSolverr", _failing), ("2Captcha", lambda: CLEARANCE)],
+            stats=stats, stagger=0.2,
+        )
+        s = stats.summary()
+        assert (s["FlareSolverr"]["successes"], s["2Captcha"]["successes"]) == (0, 1)
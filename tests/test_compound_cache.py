@@ -0,0 +1,154 @@
+"""
+Tests for the compound-offer composition cache (compound_cache.py), using
+the captured fetch-offers response in examples/fetch-offers.json, and for
+sync_store_offers reusing it against the local simulator.
+
+Run:
+    python -m pytest tests/test_compound_cache.py -v
+"""
+import copy
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import compound_cache
+import sync_to_supabase
+from compound_cache import CompositionCache
+from sync_to_supabase import map_compound_product
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples")
+DURING_CAMPAIGN = datetime(2026, 2, 1, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def detail():
+    with open(os.path.join(EXAMPLES, "fetch-offers.json"), encoding="utf-8") as f:
+        return json.load(f)["offers"][0]
+
+
+@pytest.fixture
+def listing(detail):
+    """The offer as a store's listing shows it (no products)."""
+    return {k: v for k, v in detail.items() if k != "products"}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(compound_cache.time, "time", lambda: DURING_CAMPAIGN)
+    c = CompositionCache(str(tmp_path / "compositions.json.gz"), recheck_every=1000)
+    monkeypatch.setattr(c, "_due", lambda store_id, key: False)
+    return c
+
+
+def rows(store_id, offer):
+    return [
+        {k: v for k, v in map_compound_product(store_id, offer, pw)[0].items() if k != "updated_at"}
+        for pw in offer["products"]
+    ]
+
+
+class TestCompositionCache:
+    def test_store_reuses_its_own_fetch(self, cache, detail, listing):
+        assert cache.lookup("N110", listing) is None
+        cache.record("N110", detail)
+        hit = cache.lookup("N110", listing)
+        assert hit is not None
+        assert rows("N110", hit) == rows("N110", detail)
+        assert cache.summary()["hits"] == 1 and cache.summary()["misses"] == 1
+
+    def test_chain_composition_needs_each_stores_own_fetch(self, cache, detail, listing):
+        cache.record("N110", detail)
+        assert cache.lookup("N200", listing) is None  # N200's availability is unknown
+        cache.record("N200", detail)
+        assert cache.lookup("N200", listing) is not None
+        assert cache.summary()["entries"] == 1  # one composition for the campaign
+
+    def test_store_local_offers_are_not_shared(self, cache, detail, listing):
+        detail["offerType"] = listing["offerType"] = "store"
+        cache.record("N110", detail)
+        assert cache.lookup("N200", listing) is None
+        assert cache.lookup("N110", listing) is not None
+
+    def test_repriced_listing_fetches_again(self, cache, detail, listing):
+        cache.record("N110", detail)
+        repriced = {**listing, "pricing": {**listing["pricing"], "price": 4.5}}
+        assert cache.lookup("N110", repriced) is None
+        assert cache.summary()["repriced"] == 1
+        cache.record("N110", {**detail, "pricing": repriced["pricing"]})
+        assert {r["price"] for r in rows("N110", cache.lookup("N110", repriced))} == {4.5}
+
+    def test_stores_share_one_composition(self, cache, detail, listing):
+        cache.record("N110", detail)
+        refreshed = copy.deepcopy(detail)
+        refreshed["products"][0]["product"]["name"] = "Uusi nimi"
+        cache.record("N200", refreshed)
+        # N110 keeps its own availability and pricing but sees the latest composition
+        assert cache.lookup("N110", listing)["products"][0]["product"]["name"] == "Uusi nimi"
+
+    def test_unavailable_products_stay_skipped_for_that_store(self, cache, detail, listing):
+        missing = copy.deepcopy(detail)
+        missing["products"][0]["product"]["availability"]["store"] = False
+        cache.record("N300", missing)
+        cache.record("N200", detail)
+        mine = cache.lookup("N300", listing)
+        assert map_compound_product("N300", mine, mine["products"][0]) == (None, None)
+        other = cache.lookup("N200", listing)
+        assert map_compound_product("N200", other, other["products"][0])[0] is not None
+
+    def test_ended_campaigns_expire(self, cache, detail, listing, monkeypatch):
+        cache.record("N110", detail)
+        monkeypatch.setattr(compound_cache.time, "time", lambda: DURING_CAMPAIGN + 30 * 86400)
+        assert cache.lookup("N110", listing) is None
+        assert cache.summary()["expired"] == 1
+
+    def test_due_recheck_fetches_again(self, tmp_path, detail, listing, monkeypatch):
+        monkeypatch.setattr(compound_cache.time, "time", lambda: DURING_CAMPAIGN)
+        cache = CompositionCache(str(tmp_path / "c.json.gz"), recheck_every=1)
+        cache.record("N110", detail)
+        assert cache.lookup("N110", listing) is None
+        assert cache.summary()["rechecks"] == 1
+
+    def test_round_trip(self, cache, detail, listing, monkeypatch):
+        cache.record("N110", detail)
+        cache.save()
+        loaded = CompositionCache(cache.path)
+        monkeypatch.setattr(loaded, "_due", lambda store_id, key: False)
+        assert loaded.runs == 2
+        assert loaded.lookup("N110", listing)["products"][0]["id"] == detail["products"][0]["id"]
+        assert loaded.lookup("N200", listing) is None
+
+
+class TestSyncWithCache:
+    """sync_store_offers with a composition cache, against the local simulator."""
+
+    def test_cached_compositions_skip_fetch_offers(self, sim, fast_limiter, fake_supabase, monkeypatch, tmp_path):
+        # the captured product templates' campaigns end 2026-02-15
+        monkeypatch.setattr(compound_cache.time, "time", lambda: 1769904000.0)  # 2026-02-01
+        cache = compound_cache.CompositionCache(str(tmp_path / "compositions.json.gz"))
+        monkeypatch.setattr(cache, "_due", lambda store_id, key: False)
+        monkeypatch.setattr(sync_to_supabase, "_compositions", cache)
+        counts = sim.state.catalog.offer_counts
+        first, second = sorted((s for s in counts if counts[s] <= 1000), key=counts.get)[-2:]
+
+        sent = []
+        real_fetch_offers = sync_to_supabase.fetch_offers
+        monkeypatch.setattr(
+            sync_to_supabase, "fetch_offers",
+            lambda sid, offer_ids: sent.extend((sid, o) for o in offer_ids) or real_fetch_offers(sid, offer_ids),
+        )
+        compounds, fetched = [], []
+        for store_id in (first, second, first):  # the first store syncs twice
+            stats, before = {}, len(sent)
+            sync_to_supabase.sync_store_offers(
+                fake_supabase, store_id, "2026-01-01T00:00:00+00:00", stats=stats,
+            )
+            compounds.append(stats["compounds"])
+            fetched.append(len(sent) - before)
+        # another store's fetch never stands in for a store's own availability
+        assert fetched[:2] == compounds[:2]
+        # the second sync of the first store reuses its own compositions
+        assert fetched[2] == 0 and compounds[2] == compounds[0] > 0
+        assert cache.summary()["hits"] == compounds[0]
+        assert cache.summary()["repriced"] == 0  # fetch-offers echoes the listing pricing
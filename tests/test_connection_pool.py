@@ -0,0 +1,25 @@
+"""
+Tests for the shared connection pool (connection_pool.py) under the
+helpers.py transport, against the local simulator.
+
+Run:
+    python -m pytest tests/test_connection_pool.py -v
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import helpers
+from connection_pool import SharedConnectionPool
+
+
+class TestSharedConnectionPool:
+    def test_threads_share_pooled_connections(self, sim, fast_limiter, monkeypatch):
+        pool = SharedConnectionPool(max_connections=2)
+        monkeypatch.setattr(helpers, "_pool", pool)  # closed by close_browser()
+        helpers.fetch_offer_categories("N110")  # CF solve and a warm connection
+        before = pool.stats()
+        with ThreadPoolExecutor(4) as workers:
+            list(workers.map(helpers.fetch_offer_categories, ["N110"] * 8))
+        after = pool.stats()
+        assert after["requests"] - before["requests"] == 8
+        assert after["newConnections"] - before["newConnections"] <= pool.max_connections
+        assert after["reusedConnections"] - before["reusedConnections"] >= 8 - pool.max_connections
@@ -0,0 +1,66 @@
+"""
+Tests for the hedged-request controller (hedging.py), offline and through
+the helpers.py transport against the local simulator.
+
+Run:
+    python -m pytest tests/test_hedging.py -v
+"""
+import time
+
+import pytest
+
+import helpers
+from hedging import HedgeController
+
+
+class TestHedgeController:
+    def test_no_delay_until_enough_samples(self):
+        h = HedgeController(min_samples=20)
+        for _ in range(19):
+            h.observe("category-page", 0.3)
+        assert h.hedge_delay("category-page") is None
+        h.observe("category-page", 0.3)
+        assert h.hedge_delay("category-page") == pytest.approx(0.5)  # min_delay
+
+    def test_delay_is_p95_per_class(self):
+        h = HedgeController(min_samples=10, min_delay=0.0)
+        for i in range(100):
+            h.observe("category-page", i / 100)
+            h.observe("categories", 0.1)
+        assert h.hedge_delay("category-page") == pytest.approx(0.95)
+        assert h.hedge_delay("categories") == pytest.approx(0.1)
+        assert h.hedge_delay("stores") is None
+
+    def test_budget_caps_hedges(self):
+        h = HedgeController(max_fraction=0.05)
+        for _ in range(40):
+            h.count_request()
+        assert [h.try_acquire() for _ in range(3)] == [True, True, False]
+        assert h.summary()["budgetDenied"] == 1
+
+    def test_saved_time_accumulates(self):
+        h = HedgeController()
+        h.record_win(True)
+        h.record_saved(1.25)
+        h.record_saved(-0.5)  # primary finished first after all — no saving
+        s = h.summary()
+        assert (s["hedgeWins"], s["savedSeconds"]) == (1, 1.25)
+
+
+class TestHedgedTransport:
+    """helpers.py hedging against the local simulator."""
+
+    def test_hedge_answers_before_slow_primary(self, sim, monkeypatch):
+        hedger = HedgeController(max_fraction=1.0, min_samples=3, min_delay=0.05)
+        monkeypatch.setattr(helpers, "_hedger", hedger)
+        monkeypatch.setattr(helpers, "HEDGE_REQUESTS", True)
+        for _ in range(3):
+            helpers.fetch_offer_categories("N110")
+
+        delays = iter([1.5])  # the next request hangs, its duplicate does not
+        monkeypatch.setattr(sim.state, "latency", lambda: next(delays, 0.001))
+        t0 = time.monotonic()
+        helpers.fetch_offer_categories("N110")
+        assert time.monotonic() - t0 < 1.4
+        summary = hedger.summary()
+        assert (summary["hedged"], summary["hedgeWins"]) == (1, 1)
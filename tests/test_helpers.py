@@ -0,0 +1,164 @@
+"""
+Tests for the curl_cffi transport in helpers.py against the local simulator
+(scripts/kruoka_simulator.py): paging, the fetch planner, streaming, the
+offer-category limit of 25, request deadlines and the Cloudflare session
+(FlareSolverr solve, 403 re-auth, proactive refresh).
+
+Run:
+    python -m pytest tests/test_helpers.py -v
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import helpers
+
+
+class TestPaging:
+    def test_store_sweep_matches_offer_counts(self, sim):
+        stores = helpers.fetch_all_stores()
+        assert len(stores) == 1060
+        counts = sim.state.catalog.offer_counts
+        store_id = min(counts, key=counts.get)
+        result = helpers.search_all_offers_for_store(store_id)
+        assert result["totalHits"] == counts[store_id]
+
+    def test_category_pages_fetched_concurrently(self, sim, fast_limiter):
+        offers = sim.state.catalog.store_offers("N110")
+        slug = max(offers, key=lambda s: len(offers[s]))
+        sim.state.args.latency_median = 0.1
+        sim.state.args.latency_sigma = 0.0
+        t0 = time.monotonic()
+        result = helpers.fetch_all_offers_for_category("N110", slug)
+        elapsed = time.monotonic() - t0
+        pages = -(-len(offers[slug]) // helpers.MAX_OFFER_CATEGORY_LIMIT)
+        assert pages >= 4
+        expected = list(dict.fromkeys(o["id"] for o in offers[slug]))
+        assert [o["id"] for o in result["offers"]] == expected
+        assert result["apiCalls"] == pages
+        assert elapsed < 0.1 * pages * 0.8  # not one round-trip after another
+
+    def test_limit_above_25_is_rejected(self, sim):
+        with pytest.raises(Exception):
+            helpers.fetch_offer_category("N110", "juomat", limit=26)
+        assert sim.state.stats["400"] == 1
+
+    def test_compound_offers_expand(self, sim):
+        offers = sim.state.catalog.store_offers("N110")
+        compound = next(o["id"] for items in offers.values() for o in items
+                        if not o.get("product"))
+        detail = helpers.fetch_offers("N110", [compound])
+        assert 2 <= len(detail["offers"][0]["products"]) <= 4
+
+    def test_hung_request_times_out(self, sim, monkeypatch):
+        monkeypatch.setitem(helpers.ENDPOINT_TIMEOUTS, "categories", 0.3)
+        sim.state.args.latency_median = 1.0
+        sim.state.args.latency_sigma = 0.0
+        with pytest.raises(TimeoutError):
+            helpers.fetch_offer_categories("N110")
+
+
+class TestPlanner:
+    def test_planner_uses_search_offers_below_cap(self, sim, fast_limiter):
+        counts = sim.state.catalog.offer_counts
+        store_id = max((s for s in counts if counts[s] <= 1000), key=counts.get)
+        result = helpers.fetch_store_offers_planned(store_id)
+        assert result["plan"] == "search-offers"
+        assert result["totalHits"] == counts[store_id]
+        assert result["apiCalls"] == result["predictedCalls"] == -(-counts[store_id] // 48)
+        assert "offer-category" not in sim.state.stats["byEndpoint"]
+
+    def test_planner_walks_categories_above_cap(self, sim, fast_limiter):
+        counts = sim.state.catalog.offer_counts
+        store_id = min((s for s in counts if counts[s] > 1000), key=counts.get)
+        result = helpers.fetch_store_offers_planned(store_id)
+        assert result["plan"] == "categories"
+        assert result["totalHits"] == counts[store_id]
+        assert result["apiCalls"] == result["predictedCalls"]
+        by_endpoint = dict(sim.state.stats["byEndpoint"])
+        by_endpoint.pop("stores/search", None)  # the CF session check
+        assert result["apiCalls"] == sum(by_endpoint.values())
+
+
+class TestStreaming:
+    def test_store_offers_stream_page_by_page(self, sim, fast_limiter):
+        counts = sim.state.catalog.offer_counts
+        store_id = min((s for s in counts if counts[s] > 1000), key=counts.get)
+        summary = {}
+        pages = list(helpers.iter_store_offers(store_id, summary=summary))
+        ids = [o["id"] for page in pages for o in page]
+        assert len(pages) > 10
+        assert len(ids) == len(set(ids)) == counts[store_id]
+        assert summary["plan"] == "categories"
+        assert summary["totalHits"] == counts[store_id]
+
+    def test_abandoned_stream_stops_paging(self, sim, fast_limiter):
+        counts = sim.state.catalog.offer_counts
+        store_id = max(counts, key=counts.get)
+        stream = helpers.iter_store_offers(store_id, prefetch=2)
+        next(stream)
+        stream.close()
+        time.sleep(0.5)
+        requests = sim.state.stats["requests"]
+        time.sleep(0.5)
+        assert sim.state.stats["requests"] == requests
+        assert not any(t.name.startswith("kruoka-stream") for t in threading.enumerate())
+
+
+class TestCloudflareSession:
+    def test_expired_cookie_triggers_reauth(self, sim):
+        helpers.fetch_offer_categories("N110")
+        sim.state.args.cookie_ttl = 0.0
+        with pytest.raises(Exception):
+            helpers.fetch_offer_categories("N110")
+        assert sim.state.stats["solves"] >= 2
+        sim.state.args.cookie_ttl = 1800.0
+        assert helpers.fetch_offer_categories("N110")["offerCategories"]
+
+    def test_concurrent_403s_share_one_reauth(self, sim):
+        helpers.fetch_offer_categories("N110")
+        generation = helpers._cf_generation
+        sim.state.tokens.clear()  # the clearance every thread holds is now rejected
+        with ThreadPoolExecutor(6) as pool:
+            results = list(pool.map(helpers.fetch_offer_categories, ["N110"] * 6))
+        assert all(r["offerCategories"] for r in results)
+        assert sim.state.stats["solves"] == 2
+        assert helpers._cf_generation == generation + 1
+
+    def test_clearance_refreshed_before_expiry(self, sim, monkeypatch):
+        monkeypatch.setattr(helpers, "CF_REFRESH_MARGIN", sim.state.args.cookie_ttl - 0.3)
+        monkeypatch.setattr(helpers, "CF_REFRESH_RETRY", 0.1)
+        helpers.fetch_offer_categories("N110")
+        generation = helpers._cf_generation
+        deadline = time.monotonic() + 5
+        while helpers._cf_generation == generation and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert helpers._cf_generation > generation
+        assert helpers.fetch_offer_categories("N110")["offerCategories"]
+
+    def test_close_stops_background_refresh(self, sim, monkeypatch):
+        helpers.fetch_offer_categories("N110")
+        solving, release = threading.Event(), threading.Event()
+
+        def failing_solve():
+            solving.set()
+            release.wait(5)
+            raise RuntimeError("solver down")
+
+        monkeypatch.setattr(helpers, "_resolve_cloudflare", failing_solve)
+        monkeypatch.setattr(helpers, "CF_REFRESH_MARGIN", 10 ** 6)
+        monkeypatch.setattr(helpers, "CF_REFRESH_RETRY", 0.05)
+        with helpers._init_lock:
+            helpers._schedule_refresh()
+            timer = helpers._refresh_timer
+        assert solving.wait(5)
+        closer = threading.Thread(target=helpers.close_browser)
+        closer.start()
+        closer.join(0.2)
+        assert closer.is_alive()  # waits for the in-flight refresh
+        release.set()
+        closer.join(5)
+        assert not closer.is_alive() and not timer.is_alive()
+        assert helpers._refresh_timer is None  # the failure did not re-arm
@@ -0,0 +1,100 @@
+"""
+Tests for offer_mapper.py — single-pass offer mapping and skip reasons.
+
+Run:
+    python -m pytest tests/test_offer_mapper.py -v
+"""
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from offer_mapper import (
+    SKIP_NO_EAN, SKIP_NO_PRICE, SKIP_SAME_PRICE, SKIP_UNAVAILABLE, OfferMapper,
+)
+from sync_to_supabase import map_compound_product, map_offer
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "examples"
+
+
+@pytest.fixture
+def listing() -> list[dict]:
+    page = json.loads((EXAMPLES / "offer-category.json").read_text(encoding="utf-8"))
+    return [o for o in page["offers"] if o.get("product")]
+
+
+@pytest.fixture
+def compound() -> dict:
+    return json.loads((EXAMPLES / "fetch-offers.json").read_text(encoding="utf-8"))["offers"][0]
+
+
+class TestListingOffers:
+    def test_maps_captured_page(self, listing):
+        mapper = OfferMapper("N110", "2026-02-01T00:00:00+00:00")
+        offer = listing[0]
+        row, product, skip = mapper.map_offer(offer)
+        assert skip is None
+        assert row["id"] == f"k-ruoka:N110:{offer['id']}"
+        assert row["store_id"] == "k-ruoka:N110"
+        assert row["price"] == offer["pricing"]["price"]
+        assert row["normal_price"] == offer["normalPricing"]["price"]
+        assert row["raw_categories"][-1]["slug"] == "hedelmat-ja-vihannekset"
+        assert product == {"ean": "6418248002382", "name": row["title"], "image_url": row["image_url"]}
+
+    def test_one_timestamp_per_mapper(self, listing):
+        mapper = OfferMapper("N110")
+        stamps = {mapper.map_offer(o)[0]["updated_at"] for o in listing}
+        assert stamps == {mapper.now}
+
+    def test_skip_reasons(self, listing):
+        mapper = OfferMapper("N110")
+        no_price = copy.deepcopy(listing[0])
+        no_price["pricing"].pop("price")
+        no_price["product"]["product"].pop("mobilescan")
+        unavailable = copy.deepcopy(listing[0])
+        unavailable["product"]["product"]["availability"]["store"] = False
+        same_price = copy.deepcopy(listing[0])
+        same_price["normalPricing"]["price"] = same_price["pricing"]["price"]
+        assert mapper.map_offer(no_price) == (None, None, SKIP_NO_PRICE)
+        assert mapper.map_offer(unavailable) == (None, None, SKIP_UNAVAILABLE)
+        assert mapper.map_offer(same_price) == (None, None, SKIP_SAME_PRICE)
+
+    def test_batch_deal_scales_normal_price(self, listing):
+        offer = copy.deepcopy(listing[0])
+        price = offer["pricing"]["price"]
+        offer["product"]["product"]["mobilescan"]["pricing"]["batch"] = {"price": price + 0.01, "amount": 3}
+        row, _, _ = OfferMapper("N110").map_offer(offer)
+        assert row["quantity_required"] == 3
+        assert row["normal_price"] == round(offer["normalPricing"]["price"] * 3, 2)
+
+        offer["product"]["product"]["mobilescan"]["pricing"]["batch"]["price"] = price + 1
+        row, _, _ = OfferMapper("N110").map_offer(offer)
+        assert row["quantity_required"] == 1
+
+    def test_internal_ean_gets_no_product_row(self, listing):
+        offer = copy.deepcopy(listing[0])
+        offer["product"]["product"]["ean"] = "2001234567890"
+        row, product, skip = OfferMapper("N110").map_offer(offer)
+        assert row is not None and product is None and skip is None
+
+    def test_wrapper_matches_mapper(self, listing):
+        for offer in listing:
+            row, product = map_offer("N110", offer)
+            expected = OfferMapper("N110", row["updated_at"]).map_offer(offer)
+            assert (row, product) == expected[:2]
+
+
+class TestCompoundProducts:
+    def test_row_per_product(self, compound):
+        mapper = OfferMapper("N110")
+        rows = [mapper.map_compound_product(compound, pw) for pw in compound["products"]]
+        eans = [pw["product"]["ean"] for pw in compound["products"]]
+        assert [r[0]["id"] for r in rows] == [f"k-ruoka:N110:{compound['id']}:{ean}" for ean in eans]
+        assert [r[1]["ean"] for r in rows] == eans
+
+    def test_missing_ean_skipped(self, compound):
+        pw = copy.deepcopy(compound["products"][0])
+        pw["product"]["ean"] = " "
+        assert OfferMapper("N110").map_compound_product(compound, pw) == (None, None, SKIP_NO_EAN)
+        assert map_compound_product("N110", compound, pw) == (None, None)
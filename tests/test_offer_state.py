@@ -0,0 +1,93 @@
+"""
+Tests for incremental listing change detection (offer_state.py), offline
+and through helpers.py against the local simulator.
+
+Run:
+    python -m pytest tests/test_offer_state.py -v
+"""
+import helpers
+from offer_state import OfferStateStore, fingerprint
+
+
+def page(prices: list[float], total: int = 60) -> dict:
+    return {
+        "totalHits": total,
+        "offers": [
+            {"id": f"o{i}", "pricing": {"price": p}, "normalPricing": {"price": p + 1}}
+            for i, p in enumerate(prices)
+        ],
+    }
+
+
+def store_phase(store: OfferStateStore, store_id: str) -> bool:
+    """Run load/save once and return whether it was a full refresh."""
+    state = store.load(store_id)
+    store.save(state)
+    return state.full_refresh
+
+
+class TestFingerprint:
+    def test_changes_with_price_ids_or_total(self):
+        base = fingerprint(page([1.0, 2.0]))
+        assert fingerprint(page([1.0, 2.0])) == base
+        assert fingerprint(page([1.0, 2.5])) != base
+        assert fingerprint(page([1.0, 2.0], total=61)) != base
+        assert fingerprint(page([1.0])) != base
+
+    def test_search_offers_items_key(self):
+        p = page([1.0])
+        assert fingerprint({"totalHits": 60, "results": p["offers"]}, "results") == fingerprint(p)
+
+
+class TestOfferStateStore:
+    def test_unchanged_first_page_reuses_offers(self, tmp_path, monkeypatch):
+        store = OfferStateStore(str(tmp_path), full_refresh_every=1000)
+        monkeypatch.setattr(store, "_phase", lambda _store_id: 1)  # no refresh in runs 1–3
+        offers = [{"id": f"o{i}"} for i in range(60)]
+        state = store.load("N110")
+        assert state.reuse("category:juomat", page([1.0])) is None
+        state.record("category:juomat", page([1.0]), offers)
+        store.save(state)
+
+        state = store.load("N110")
+        assert state.reuse("category:juomat", page([1.0])) == offers
+        assert state.reuse("category:leivat", page([1.0])) is None
+        store.save(state)
+        state = store.load("N110")
+        assert state.reuse("category:juomat", page([1.5])) is None
+
+    def test_untouched_listings_are_dropped(self, tmp_path):
+        store = OfferStateStore(str(tmp_path), full_refresh_every=1000)
+        state = store.load("N110")
+        state.record("category:gone", page([1.0]), [{"id": "o0"}])
+        store.save(state)
+        store.save(store.load("N110"))
+        assert store.load("N110")._previous == {}
+
+    def test_full_refresh_every_n_runs_staggered(self, tmp_path):
+        store = OfferStateStore(str(tmp_path), full_refresh_every=4)
+        runs = {sid: [store_phase(store, sid) for _ in range(8)] for sid in ("N110", "N111", "N195", "N200")}
+        assert all(sum(r) == 2 for r in runs.values())
+        assert len({r.index(True) for r in runs.values()}) > 1
+
+    def test_corrupt_file_is_ignored(self, tmp_path):
+        store = OfferStateStore(str(tmp_path))
+        (tmp_path / "N110.json.gz").write_bytes(b"not gzip")
+        state = store.load("N110")
+        assert state.runs == 1 and state.reuse("category:x", page([1.0])) is None
+
+
+class TestPlannedFetch:
+    """helpers.fetch_store_offers_planned with offer state, against the local simulator."""
+
+    def test_unchanged_categories_are_not_repaged(self, sim, fast_limiter, tmp_path, monkeypatch):
+        monkeypatch.setattr(helpers, "_offer_state", None)
+        state = helpers.enable_offer_state(str(tmp_path), full_refresh_every=1000)
+        monkeypatch.setattr(state, "_phase", lambda _store_id: 1)  # no refresh in runs 1–2
+        counts = sim.state.catalog.offer_counts
+        store_id = min((s for s in counts if counts[s] > 1000), key=counts.get)
+        first = helpers.fetch_store_offers_planned(store_id)
+        second = helpers.fetch_store_offers_planned(store_id)
+        assert {o["id"] for o in second["offers"]} == {o["id"] for o in first["offers"]}
+        assert second["reusedListings"] > 0 and second["skippedPages"] > 0
+        assert second["apiCalls"] < first["apiCalls"] / 2
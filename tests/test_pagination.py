@@ -0,0 +1,98 @@
+"""
+Offline tests for concurrent offer-category pagination in helpers.py
+(reassembly in offset order, de-duplication, re-paging when totalHits moves).
+
+Run:
+    python -m pytest tests/test_pagination.py -v
+"""
+import threading
+
+import pytest
+
+import helpers
+
+LIMIT = helpers.MAX_OFFER_CATEGORY_LIMIT
+
+
+class FakeCategory:
+    """Serves offer-category pages from a mutable list of offer IDs."""
+
+    def __init__(self, size: int):
+        self.ids = [f"o{i}" for i in range(size)]
+        self.calls: list[int] = []
+        self.lock = threading.Lock()
+        self.on_call = None
+
+    def __call__(self, endpoint: str, payload: dict) -> dict:
+        assert endpoint == "offer-category"
+        offset = payload["offset"]
+        with self.lock:
+            self.calls.append(offset)
+            if self.on_call:
+                self.on_call(self, offset)
+            ids = self.ids[offset:offset + payload["limit"]]
+            return {"totalHits": len(self.ids), "offers": [{"id": i} for i in ids]}
+
+
+@pytest.fixture
+def category(monkeypatch):
+    fake = FakeCategory(130)
+    monkeypatch.setattr(helpers, "_post_with_retry", fake)
+    return fake
+
+
+class TestConcurrentPagination:
+    def test_pages_reassembled_in_offset_order(self, category):
+        result = helpers.fetch_all_offers_for_category("N110", "juomat")
+        assert [o["id"] for o in result["offers"]] == category.ids
+        assert result["totalHits"] == 130
+        assert result["apiCalls"] == 6
+        assert sorted(category.calls) == list(range(0, 130, LIMIT))
+
+    def test_serial_fallback(self, category, monkeypatch):
+        monkeypatch.setattr(helpers, "PAGE_CONCURRENCY", 1)
+        result = helpers.fetch_all_offers_for_category("N110", "juomat")
+        assert category.calls == list(range(0, 130, LIMIT))
+        assert len(result["offers"]) == 130
+
+    def test_growth_repages_stale_range(self, category):
+        def grow(fake, offset):
+            if offset == 100 and len(fake.ids) == 130:  # new offers land at the end
+                fake.ids += [f"new{i}" for i in range(30)]
+
+        category.on_call = grow
+        result = helpers.fetch_all_offers_for_category("N110", "juomat")
+        assert result["totalHits"] == 160
+        assert [o["id"] for o in result["offers"]] == category.ids
+        # pages served before the change are fetched again, the rest are not
+        repaged = category.calls[6:]
+        assert 150 in repaged and 100 not in repaged
+
+    def test_removal_does_not_lose_shifted_offers(self, category):
+        def shrink(fake, offset):
+            if offset == 75 and "o10" in fake.ids:  # everything after o10 shifts left
+                fake.ids.remove("o10")
+
+        category.on_call = shrink
+        result = helpers.fetch_all_offers_for_category("N110", "juomat")
+        ids = [o["id"] for o in result["offers"]]
+        assert ids == category.ids
+        assert len(ids) == len(set(ids)) == 129
+
+    def test_duplicate_ids_dropped(self, monkeypatch):
+        pages = {
+            0: {"totalHits": 30, "offers": [{"id": f"o{i}"} for i in range(25)]},
+            25: {"totalHits": 30, "offers": [{"id": "o24"}] + [{"id": f"o{i}"} for i in range(25, 29)]},
+        }
+        monkeypatch.setattr(helpers, "_post_with_retry", lambda _e, p: pages[p["offset"]])
+        result = helpers.fetch_all_offers_for_category("N110", "juomat")
+        assert [o["id"] for o in result["offers"]] == [f"o{i}" for i in range(29)]
+
+    def test_failed_page_raises(self, category):
+        def fail(fake, offset):
+            if offset == 50:
+                raise RuntimeError("boom")
+
+        category.on_call = fail
+        with pytest.raises(RuntimeError):
+            helpers.fetch_all_offers_for_category("N110", "juomat")
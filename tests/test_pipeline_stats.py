@@ -0,0 +1,66 @@
+"""
+Offline tests for per-stage pipeline timing (pipeline_stats.py).
+
+Run:
+    python -m pytest tests/test_pipeline_stats.py -v
+"""
+import threading
+import time
+
+from pipeline_stats import EtaEstimator, StageTimer
+
+
+class TestStageTimer:
+    def test_nested_stage_pauses_the_outer_one(self):
+        timer = StageTimer()
+        with timer.stage("map"):
+            time.sleep(0.02)
+            with timer.stage("write"):
+                time.sleep(0.05)
+            time.sleep(0.02)
+        s = timer.seconds
+        assert 0.05 <= s["write"] < 0.09
+        assert 0.04 <= s["map"] < 0.07  # write's 50 ms not counted twice
+        assert s["fetch"] == s["expand"] == 0.0
+
+    def test_threads_accumulate_into_one_total(self):
+        timer = StageTimer()
+
+        def work():
+            with timer.stage("fetch"):
+                time.sleep(0.03)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert timer.seconds["fetch"] >= 0.12
+
+    def test_stage_closes_on_exception(self):
+        timer = StageTimer()
+        try:
+            with timer.stage("expand"):
+                raise ValueError
+        except ValueError:
+            pass
+        with timer.stage("map"):
+            pass
+        assert timer._local.stack == []
+
+
+class TestEtaEstimator:
+    def test_model_rate_until_warmed_up_then_live_rate(self):
+        eta = EtaEstimator(predicted_calls=100, seconds_per_call=2.0)
+        assert eta.remaining_seconds(upstream_calls=0, elapsed=0) == 200
+        assert eta.remaining_seconds(upstream_calls=5, elapsed=1) == 190
+        # 40 calls in 20 s: 0.5 s per call for the 60 left
+        assert eta.remaining_seconds(upstream_calls=40, elapsed=20) == 30
+
+    def test_finished_stores_correct_the_prediction(self):
+        eta = EtaEstimator(predicted_calls=100, seconds_per_call=1.0)
+        eta.store_done(predicted_calls=20, actual_calls=30)  # stores take 1.5x the calls
+        assert eta.remaining_seconds(upstream_calls=30, elapsed=30) == 120
+        eta.store_skipped(40)
+        assert eta.remaining_seconds(upstream_calls=30, elapsed=30) == 60
+        assert eta.seconds_for(10, upstream_calls=30, elapsed=30) == 15
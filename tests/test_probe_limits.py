@@ -0,0 +1,84 @@
+"""
+Tests for scripts/probe_limits.py against the local simulator, and for
+loading its api-limits.json in helpers.py.
+
+Run:
+    python -m pytest tests/test_probe_limits.py -v
+"""
+import importlib.util
+import json
+from pathlib import Path
+
+import helpers
+
+ROOT = Path(__file__).resolve().parent.parent
+_spec = importlib.util.spec_from_file_location("probe_limits", ROOT / "scripts" / "probe_limits.py")
+probe_limits = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(probe_limits)
+
+
+def _big_store(sim) -> str:
+    counts = sim.state.catalog.offer_counts
+    return max(counts, key=counts.get)
+
+
+class TestProbe:
+    def test_finds_simulator_limits(self, sim, fast_limiter, simulator):
+        result = probe_limits.probe("N110", _big_store(sim), budget=80)
+        assert result["offerCategoryLimit"] == simulator.MAX_OFFER_CATEGORY_LIMIT
+        assert result["fetchOffersBatch"] == simulator.FETCH_OFFERS_MAX_IDS
+        assert result["searchOffersPageSize"] == simulator.SEARCH_OFFERS_PAGE_SIZE
+        assert result["searchOffersMaxOffset"] == simulator.SEARCH_OFFERS_MAX_OFFSET
+        assert "searchOffersLimitParam" not in result  # the simulator ignores ?limit=
+        assert result["lowerBounds"] == []
+        assert result["requests"] <= 80
+
+    def test_finds_a_raised_limit(self, sim, fast_limiter, simulator, monkeypatch):
+        monkeypatch.setattr(simulator, "MAX_OFFER_CATEGORY_LIMIT", 60)
+        offers = sim.state.catalog.store_offers("N110")
+        assert max(len(items) for items in offers.values()) > 60
+        prober = probe_limits.LimitProber(budget=30)
+        assert prober.probe_offer_category("N110") == 60
+        assert sim.state.stats["400"] >= 1
+
+    def test_no_categories_keeps_the_default(self, monkeypatch):
+        prober = probe_limits.LimitProber(budget=5)
+        monkeypatch.setattr(prober, "_request", lambda method, endpoint, body: (500, None))
+        assert prober.probe_offer_category("N110") == 0  # left out of api-limits.json
+        assert prober.lower_bounds == []
+
+    def test_budget_keeps_lower_bound(self, sim, fast_limiter):
+        prober = probe_limits.LimitProber(budget=3)
+        found = prober.largest("x", lambda n: prober._request(
+            "POST", "offer-categories", {"storeId": "N110"},
+        )[0] == 200, 4, 1000)
+        assert found == 16
+        assert prober.lower_bounds == ["x"]
+        assert prober.requests == 3
+
+
+class TestLoadApiLimits:
+    def test_missing_file_uses_defaults(self, tmp_path):
+        assert helpers._load_api_limits(str(tmp_path / "nope.json")) == {}
+
+    def test_keeps_only_valid_limits(self, tmp_path):
+        path = tmp_path / "api-limits.json"
+        path.write_text(json.dumps({
+            "version": 1,
+            "offerCategoryLimit": 50,
+            "fetchOffersBatch": 0,
+            "searchOffersPageSize": "48",
+            "searchOffersMaxOffset": True,
+            "searchOffersLimitParam": True,
+            "lowerBounds": [],
+            "requests": 41,
+        }))
+        assert helpers._load_api_limits(str(path)) == {
+            "offerCategoryLimit": 50,
+            "searchOffersLimitParam": True,
+        }
+
+    def test_unreadable_file_uses_defaults(self, tmp_path):
+        path = tmp_path / "api-limits.json"
+        path.write_text("{not json")
+        assert helpers._load_api_limits(str(path)) == {}
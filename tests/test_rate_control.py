@@ -0,0 +1,216 @@
+"""
+Offline tests for the adaptive rate controller and endpoint token buckets
+(rate_control.py).
+
+These do not touch the network.
+
+Run:
+    python -m pytest tests/test_rate_control.py -v
+"""
+import json
+
+import rate_control
+from rate_control import AimdRateController, EndpointRateLimiter, TokenBucket
+
+
+def _controller(**kwargs) -> AimdRateController:
+    defaults = dict(
+        initial_rate=2.0, min_rate=0.5, max_rate=4.0,
+        increase_step=0.5, healthy_window=5, decrease_cooldown=0.0,
+    )
+    defaults.update(kwargs)
+    return AimdRateController(**defaults)
+
+
+def _busy(c: AimdRateController, responses: int) -> None:
+    """Record healthy *responses* to requests the controller held back."""
+    c.reserve()  # takes the free slot; every later one waits
+    for _ in range(responses):
+        c.reserve()
+        c.record(200, 0.1)
+
+
+class TestAimdRateController:
+    def test_healthy_window_increases_rate(self):
+        c = _controller()
+        _busy(c, 5)
+        assert c.rate == 2.5
+        assert c.safe_rate == 2.0  # new rate not yet proven
+
+    def test_rate_is_capped_at_max(self):
+        c = _controller()
+        _busy(c, 100)
+        assert c.rate == 4.0
+
+    def test_responses_the_rate_did_not_hold_back_do_not_raise_it(self):
+        c = _controller()
+        for _ in range(100):
+            c.record(200, 0.1)  # requests sent without waiting for a slot
+        assert c.rate == 2.0
+        assert c.counters["increases"] == 0
+
+    def test_increase_stops_at_the_ceiling(self):
+        c = _controller()
+        c.ceiling = 2.7
+        _busy(c, 100)
+        assert c.rate == 2.7
+
+    def test_429_cuts_rate_multiplicatively(self):
+        c = _controller()
+        c.record(429, 0.1)
+        assert c.rate == 1.0
+        assert c.safe_rate == 1.0
+
+    def test_decrease_cooldown_absorbs_burst_of_429s(self):
+        c = _controller(decrease_cooldown=60.0)
+        for _ in range(5):
+            c.record(429, 0.1)
+        assert c.rate == 1.0
+
+    def test_rate_never_drops_below_min(self):
+        c = _controller()
+        for _ in range(10):
+            c.record(429, 0.1)
+        assert c.rate == 0.5
+
+    def test_latency_spike_cuts_rate(self):
+        c = _controller(healthy_window=1000)
+        for _ in range(20):
+            c.record(200, 0.2)
+        c.record(200, 5.0)
+        assert c.rate < 2.0
+        assert c.counters["decreases_latency"] == 1
+
+    def test_reserve_spaces_slots_by_interval(self):
+        c = _controller()
+        waits = [c.reserve() for _ in range(3)]
+        assert waits[0] == 0.0
+        assert abs(waits[2] - 2 * c.interval) < 0.05
+
+    def test_safe_rate_round_trips_through_state_file(self, tmp_path):
+        path = str(tmp_path / "rate.json")
+        c = _controller(state_path=path)
+        _busy(c, 10)  # 2.0 → 2.5 → proven → 3.0
+        assert json.load(open(path))["safe_rate"] == 2.5
+
+        resumed = _controller(state_path=path)
+        assert resumed.rate == 2.5
+
+    def test_state_file_written_outside_the_lock(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "rate.json")
+        c = _controller(state_path=path)
+        held = []
+        real_replace = rate_control.os.replace
+        monkeypatch.setattr(
+            rate_control.os, "replace",
+            lambda src, dst: held.append(c._lock.locked()) or real_replace(src, dst),
+        )
+        c.record(429, 0.1)
+        assert held == [False]
+        assert json.load(open(path))["safe_rate"] == 1.0
+
+    def test_corrupt_state_file_is_ignored(self, tmp_path):
+        path = tmp_path / "rate.json"
+        path.write_text("not json")
+        c = _controller(state_path=str(path))
+        assert c.rate == 2.0
+
+
+class TestTokenBucket:
+    def test_burst_is_available_immediately(self):
+        b = TokenBucket(rate=1.0, burst=3)
+        slots = []
+        for _ in range(4):
+            slot = b.earliest(100.0)
+            b.commit(slot)
+            slots.append(slot)
+        assert slots == [100.0, 100.0, 100.0, 101.0]
+
+    def test_burst_of_one_is_fixed_spacing(self):
+        b = TokenBucket(rate=2.0, burst=1)
+        slots = []
+        for _ in range(3):
+            slot = b.earliest(10.0)
+            b.commit(slot)
+            slots.append(slot)
+        assert slots == [10.0, 10.5, 11.0]
+
+    def test_drain_removes_burst_credit(self):
+        b = TokenBucket(rate=1.0, burst=3)
+        b.drain_until(50.0)
+        assert b.earliest(0.0) == 50.0
+
+
+class TestEndpointRateLimiter:
+    def _limiter(self, global_burst=10):
+        controller = AimdRateController(initial_rate=4.0, burst=global_burst, max_rate=4.0)
+        return EndpointRateLimiter(
+            controller,
+            {"category-page": (2.0, 4), "stores": (0.5, 1)},
+            default=(1.0, 1),
+        )
+
+    def test_endpoint_burst_goes_out_together(self):
+        limiter = self._limiter()
+        waits = [limiter.reserve("category-page") for _ in range(4)]
+        assert max(waits) < 0.05
+
+    def test_classes_have_independent_buckets(self):
+        limiter = self._limiter()
+        limiter.reserve("stores")
+        assert limiter.reserve("stores") > 1.5
+        assert limiter.reserve("category-page") < 0.05
+
+    def test_global_ceiling_bounds_bursts(self):
+        limiter = self._limiter(global_burst=2)
+        waits = [limiter.reserve("category-page") for _ in range(3)]
+        assert waits[1] < 0.05
+        assert waits[2] > 0.2  # third request waits for the global 4 req/s slot
+
+    def test_class_limited_traffic_does_not_raise_the_ceiling(self):
+        limiter = self._limiter()
+        limiter.controller.increase_step, limiter.controller.max_rate = 0.5, 10.0
+        for _ in range(100):  # stores (0.5 req/s) holds every request back
+            limiter.reserve("stores")
+            limiter.controller.record(200, 0.1)
+        assert limiter.controller.rate == 4.0
+
+    def test_ceiling_is_the_sum_of_the_active_classes(self):
+        limiter = self._limiter(global_burst=1)
+        limiter.reserve("stores")
+        assert limiter.controller.ceiling == 0.5
+        limiter.reserve("category-page")
+        limiter.reserve("unknown")
+        limiter.reserve("other")  # shares the default bucket with "unknown"
+        assert limiter.controller.ceiling == 3.5
+
+    def test_429_on_a_class_lowers_that_class_throughput(self):
+        controller = AimdRateController(initial_rate=10.0, burst=10, max_rate=10.0)
+        limiter = EndpointRateLimiter(
+            controller, {"search-offers": (2.0, 1), "category-page": (2.0, 1)},
+        )
+        waits = [limiter.reserve("search-offers") for _ in range(2)]
+        limiter.record("search-offers", 429, 0.1)
+        waits += [limiter.reserve("search-offers") for _ in range(2)]
+        assert abs(waits[1] - waits[0] - 0.5) < 0.05  # 2 req/s before the 429
+        assert abs(waits[3] - waits[2] - 1.0) < 0.05  # 1 req/s after it
+        assert limiter.rates()["category-page"] == 2.0  # other classes keep their rate
+
+    def test_class_rate_recovers_up_to_its_limit(self):
+        controller = AimdRateController(
+            initial_rate=10.0, burst=10, max_rate=10.0, increase_step=0.5, healthy_window=2,
+        )
+        limiter = EndpointRateLimiter(controller, {"search-offers": (2.0, 1)})
+        limiter.class_controller("search-offers").decrease_cooldown = 0.0
+        limiter.record("search-offers", 429, 0.1)
+        limiter.reserve("search-offers")
+        for _ in range(20):
+            limiter.reserve("search-offers")
+            limiter.record("search-offers", 200, 0.1)
+        assert limiter.rates()["search-offers"] == 2.0
+
+    def test_pause_applies_to_every_class(self):
+        limiter = self._limiter()
+        limiter.pause(5.0)
+        assert limiter.reserve("category-page") > 4.5
+        assert limiter.counters == {"category-page": 1}
@@ -0,0 +1,85 @@
+"""
+Offline tests for the on-disk response cache (response_cache.py).
+
+Run:
+    python -m pytest tests/test_response_cache.py -v
+"""
+import os
+import time
+
+import helpers
+from response_cache import ResponseCache, canonical_key
+
+
+class TestCanonicalKey:
+    def test_payload_key_order_does_not_matter(self):
+        a = canonical_key("post", "offer-category", {"storeId": "N110", "offset": 0})
+        b = canonical_key("POST", "offer-category", {"offset": 0, "storeId": "N110"})
+        assert a == b
+
+    def test_method_endpoint_and_payload_are_part_of_key(self):
+        base = canonical_key("POST", "offer-category", {"offset": 0})
+        assert base != canonical_key("GET", "offer-category", {"offset": 0})
+        assert base != canonical_key("POST", "offer-categories", {"offset": 0})
+        assert base != canonical_key("POST", "offer-category", {"offset": 25})
+
+
+class TestResponseCache:
+    def test_round_trip(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        key = canonical_key("POST", "offer-categories", {"storeId": "N110"})
+        assert cache.get(key) is None
+        cache.put(key, {"offerCategories": [{"slug": "juomat"}]})
+        assert cache.get(key) == {"offerCategories": [{"slug": "juomat"}]}
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_expired_entry_is_a_miss(self, tmp_path):
+        cache = ResponseCache(str(tmp_path), ttls={"categories": 0.0})
+        cache.put("ab" * 32, {"x": 1})
+        time.sleep(0.01)
+        assert cache.get("ab" * 32, "categories") is None
+        assert cache.stats()["expired"] == 1
+
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        body = {"blob": os.urandom(2000).hex()}
+        cache = ResponseCache(str(tmp_path))
+        keys = [canonical_key("POST", "x", {"i": i}) for i in range(3)]
+        for i, k in enumerate(keys):
+            cache.put(k, body)
+            os.utime(cache._path(k), (1000 + i, 1000 + i))
+        entry_size = os.path.getsize(cache._path(keys[0]))
+        cache.max_bytes = int(entry_size * 3.5)  # room for three entries
+
+        cache.get(keys[0])  # bump the oldest
+        cache.put(canonical_key("POST", "x", {"i": 3}), body)
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[1]) is None
+        assert cache.stats()["totalBytes"] <= cache.max_bytes
+
+    def test_corrupt_entry_is_dropped(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        key = "cd" * 32
+        cache.put(key, {"x": 1})
+        with open(cache._path(key), "wb") as f:
+            f.write(b"garbage")
+        assert cache.get(key) is None
+        assert not os.path.exists(cache._path(key))
+
+
+class TestHelpersIntegration:
+    def test_cached_json_serves_second_call_from_disk(self, tmp_path):
+        helpers.enable_response_cache(str(tmp_path))
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return {"totalHits": 3}
+
+        try:
+            payload = {"storeId": "N110", "offset": 0}
+            assert helpers._cached_json("POST", "offer-category", payload, fetch) == {"totalHits": 3}
+            assert helpers._cached_json("POST", "offer-category", payload, fetch) == {"totalHits": 3}
+            assert len(calls) == 1
+        finally:
+            helpers.disable_response_cache()
@@ -0,0 +1,229 @@
+"""
+Offline tests for the sync run journal (run_journal.py) and the
+checkpoint / --resume flow in sync_to_supabase.main.
+
+Run:
+    python -m pytest tests/test_run_journal.py -v
+"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import sync_to_supabase
+from run_journal import RunJournal
+from store_costs import shard_path
+
+STORES = [{"id": f"N{i}", "name": f"Store {i}"} for i in range(1, 6)]
+
+
+class TestRunJournal:
+    def test_round_trip_and_pending_order(self, tmp_path):
+        path = str(tmp_path / "journal.json")
+        journal = RunJournal(path, "2026-01-01T00:00:00+00:00", STORES)
+        journal.start_store("N1")
+        journal.store_done("N1", 10)
+        journal.start_store("N2")
+        journal.store_failed("N2")
+        journal.start_store("N3")
+        journal.store_interrupted("N3", 4)
+
+        resumed = RunJournal.load(path, max_age=3600)
+        assert resumed.sync_time == "2026-01-01T00:00:00+00:00"
+        assert resumed.resumes == 1
+        assert resumed.completed == {"N1": 10}
+        assert [s["id"] for s in resumed.pending()] == ["N3", "N2", "N4", "N5"]
+
+    def test_concurrent_stores_interrupted_together_resume_first(self, tmp_path):
+        path = str(tmp_path / "journal.json")
+        journal = RunJournal(path, "t", STORES)
+        for sid in ("N1", "N2", "N4"):
+            journal.start_store(sid)
+        journal.store_done("N2", 3)
+        journal.store_interrupted("N1", 5)
+        journal.store_interrupted("N4", 0)
+
+        resumed = RunJournal.load(path, max_age=3600)
+        assert resumed.in_flight == {"N1": 5, "N4": 0}
+        assert [s["id"] for s in resumed.pending()] == ["N1", "N4", "N3", "N5"]
+
+    def test_started_store_survives_a_hard_kill(self, tmp_path):
+        path = str(tmp_path / "journal.json")
+        journal = RunJournal(path, "t", STORES)
+        journal.start_store("N4")  # then SIGKILL: nothing else is written
+        resumed = RunJournal.load(path, max_age=3600)
+        assert resumed.in_flight == {"N4": 0}
+        assert resumed.pending()[0]["id"] == "N4"
+
+    def test_finished_or_old_runs_are_not_resumed(self, tmp_path):
+        path = str(tmp_path / "journal.json")
+        journal = RunJournal(path, "t", STORES)
+        journal.save()
+        assert RunJournal.load(path, max_age=3600) is not None
+        journal.started_at = time.time() - 7200
+        journal.save()
+        assert RunJournal.load(path, max_age=3600) is None
+        journal.started_at = time.time()
+        journal.finish()
+        assert RunJournal.load(path, max_age=3600) is None
+
+    def test_unreadable_journal_is_ignored(self, tmp_path):
+        path = tmp_path / "journal.json"
+        path.write_text("{not json")
+        assert RunJournal.load(str(path), max_age=3600) is None
+
+
+@pytest.fixture
+def run_env(monkeypatch, tmp_path, fake_supabase):
+    """Point main() at a fake Supabase, five stores and a temp journal."""
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.invalid")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "key")
+    monkeypatch.setattr(sync_to_supabase, "create_client", lambda *_: fake_supabase)
+    monkeypatch.setattr(sync_to_supabase, "fetch_helsinki_stores", lambda: list(STORES))
+    monkeypatch.setattr(sync_to_supabase, "upsert_stores", lambda *_: None)
+    monkeypatch.setattr(sync_to_supabase, "trigger_merged_rebuild", lambda: None)
+    monkeypatch.setattr(sync_to_supabase, "_install_drain_handlers", lambda: None)
+    monkeypatch.setattr(sync_to_supabase, "_drain", sync_to_supabase.threading.Event())
+    monkeypatch.setattr(sync_to_supabase, "JOURNAL_PATH", str(tmp_path / "journal.json"))
+    monkeypatch.setattr(sync_to_supabase, "COSTS_PATH", str(tmp_path / "costs.json"))
+    monkeypatch.setattr(sync_to_supabase, "SWEEP_RESULTS_PATH", None)
+    monkeypatch.setattr(sync_to_supabase, "STORE_WORKERS", 1)  # deterministic store order
+    return sync_to_supabase
+
+
+class TestResume:
+    def test_drained_run_resumes_with_original_sync_time(self, run_env, monkeypatch):
+        calls = []
+
+        def first_run(_sb, store_id, sync_time, should_stop=None, **_):
+            calls.append((store_id, sync_time))
+            if store_id == "N3":
+                run_env._drain.set()  # SIGTERM arrives mid-store
+                assert should_stop()
+                raise run_env.SyncInterrupted(store_id, 7)
+            return 10
+
+        monkeypatch.setattr(run_env, "sync_store_offers", first_run)
+        with pytest.raises(SystemExit):
+            run_env.main([])
+        sync_time = calls[0][1]
+        journal = RunJournal.load(run_env.JOURNAL_PATH, max_age=3600)
+        assert journal.completed == {"N1": 10, "N2": 10}
+        assert journal.in_flight == {"N3": 7}
+
+        run_env._drain.clear()
+        calls.clear()
+        monkeypatch.setattr(
+            run_env, "sync_store_offers",
+            lambda _sb, sid, st, **_: calls.append((sid, st)) or 5,
+        )
+        run_env.main(["--resume"])
+        assert calls == [(sid, sync_time) for sid in ("N3", "N4", "N5")]
+        assert RunJournal.load(run_env.JOURNAL_PATH, max_age=3600) is None  # finished
+
+    def test_second_signal_still_saves_the_store_costs(self, run_env, monkeypatch):
+        def store(_sb, sid, st, stats=None, **_):
+            if sid == "N2":
+                raise KeyboardInterrupt  # what the second SIGTERM raises
+            stats["apiCalls"] = 4
+            return 1
+
+        monkeypatch.setattr(run_env, "sync_store_offers", store)
+        with pytest.raises(KeyboardInterrupt):
+            run_env.main([])
+        with open(run_env.COSTS_PATH) as f:
+            assert json.load(f)["stores"]["N1"]["lastApiCalls"] == 4
+
+    def test_without_resume_starts_fresh(self, run_env, monkeypatch):
+        seen = []
+        monkeypatch.setattr(
+            run_env, "sync_store_offers",
+            lambda _sb, sid, st, **_: seen.append(sid) or 1,
+        )
+        RunJournal(run_env.JOURNAL_PATH, "old", STORES[:1]).save()
+        run_env.main([])
+        assert seen == [s["id"] for s in STORES]
+
+    def test_store_workers_overlap_and_all_stores_finish(self, run_env, monkeypatch):
+        monkeypatch.setattr(run_env, "STORE_WORKERS", 3)
+        lock = threading.Lock()
+        active = peak = 0
+
+        def slow_store(_sb, sid, st, **_):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return 2
+
+        monkeypatch.setattr(run_env, "sync_store_offers", slow_store)
+        run_env.main([])
+        assert peak == 3
+        with open(run_env.JOURNAL_PATH) as f:
+            data = json.load(f)
+        assert data["finished"] and data["completed"] == {s["id"]: 2 for s in STORES}
+
+    def test_shards_partition_the_stores_and_record_costs(self, run_env, monkeypatch):
+        seen = {}
+
+        def store(_sb, sid, st, stats=None, **_):
+            stats["apiCalls"] = int(sid[1:])
+            seen.setdefault(sid, 0)
+            seen[sid] += 1
+            return 1
+
+        monkeypatch.setattr(run_env, "sync_store_offers", store)
+        run_env.main(["--shard", "1/2"])
+        first = set(seen)
+        run_env.main(["--shard", "2/2"])
+        assert first and first != set(seen)
+        assert seen == {s["id"]: 1 for s in STORES}  # every store exactly once
+        assert not os.path.exists(run_env.COSTS_PATH)  # the shared input is left alone
+        costs = {}
+        for i in (1, 2):
+            assert os.path.exists(shard_path(run_env.JOURNAL_PATH, i, 2))
+            with open(shard_path(run_env.COSTS_PATH, i, 2)) as f:
+                costs.update(json.load(f)["stores"])
+        assert costs["N5"]["lastApiCalls"] == 5
+
+    def write_costs(self, run_env, calls: dict, offers: dict | None = None):
+        stores = {
+            sid: {"apiCalls": n, "offers": (offers or {}).get(sid, n), "runs": 1}
+            for sid, n in calls.items()
+        }
+        with open(run_env.COSTS_PATH, "w") as f:
+            json.dump({"version": 1, "secondsPerCall": 1.0, "stores": stores}, f)
+
+    def test_largest_stores_go_first(self, run_env, monkeypatch):
+        self.write_costs(run_env, {"N1": 2, "N2": 30, "N3": 5, "N4": 12, "N5": 1})
+        seen = []
+        monkeypatch.setattr(
+            run_env, "sync_store_offers",
+            lambda _sb, sid, st, **_: seen.append(sid) or 1,
+        )
+        run_env.main([])
+        assert seen == ["N2", "N4", "N3", "N1", "N5"]
+
+    def test_tight_budget_syncs_the_most_valuable_stores(self, run_env, monkeypatch):
+        # 1 s per call: a 33 s budget fits 30 of the 60 predicted calls
+        calls = {"N1": 20, "N2": 20, "N3": 10, "N4": 5, "N5": 5}
+        self.write_costs(
+            run_env, calls, offers={"N1": 50, "N2": 900, "N3": 800, "N4": 10, "N5": 700},
+        )
+        seen = []
+
+        def store(_sb, sid, st, stats=None, **_):
+            stats["apiCalls"] = calls[sid]
+            seen.append(sid)
+            return 1
+
+        monkeypatch.setattr(run_env, "sync_store_offers", store)
+        run_env.main(["--budget-minutes", "0.55"])
+        assert seen == ["N2", "N3"]  # then N5 (700 offers) no longer fits
+        journal = RunJournal.load(run_env.JOURNAL_PATH, max_age=3600)
+        assert [s["id"] for s in journal.pending()] == ["N1", "N4", "N5"]
@@ -13,6 +13,10 @@ Run:
 Note: These tests require a running Chrome instance (DrissionPage).
 On the first run, you may need to solve a Cloudflare challenge in the
 Chrome window that opens.
+
+Offline: record one live run, then replay it without CF or network:
+    KRUOKA_CASSETTE=cassettes/service.jsonl.gz KRUOKA_CASSETTE_MODE=record python -m pytest tests/test_service.py
+    KRUOKA_CASSETTE=cassettes/service.jsonl.gz KRUOKA_REPLAY_SPEED=0 python -m pytest tests/test_service.py
 """
 import time
 import pytest
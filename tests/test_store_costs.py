@@ -0,0 +1,150 @@
+"""
+Offline tests for the store cost model and LPT sharding (store_costs.py).
+
+Run:
+    python -m pytest tests/test_store_costs.py -v
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+import helpers
+from store_costs import StoreCostModel, lpt_shards, parse_shard, schedule
+
+SWEEP = os.path.join(os.path.dirname(__file__), "..", "examples", "full-sweep-results.json")
+
+_spec = importlib.util.spec_from_file_location(
+    "merge_store_costs", os.path.join(os.path.dirname(__file__), "..", "scripts", "merge_store_costs.py"))
+merge_store_costs = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(merge_store_costs)
+
+
+class TestSharding:
+    def test_parse_shard(self):
+        assert parse_shard("2/4") == (2, 4)
+        for bad in ("0/4", "5/4", "x/2", "3"):
+            with pytest.raises(ValueError):
+                parse_shard(bad)
+
+    def test_lpt_balances_skewed_sweep_costs(self):
+        costs = StoreCostModel("/nonexistent/costs.json", SWEEP).sweep
+        ids = sorted(costs)[:150]
+        shards = lpt_shards(ids, costs, 4)
+        assert sorted(sid for shard in shards for sid in shard) == ids
+        loads = [sum(costs[sid] for sid in shard) for shard in shards]
+        # LPT is within one largest store of the ideal
+        assert max(loads) - sum(loads) / 4 <= max(costs[sid] for sid in ids)
+        assert lpt_shards(ids, costs, 4) == shards  # deterministic
+
+    def test_lpt_beats_equal_count_chunks(self):
+        costs = {"big1": 30, "big2": 28, **{f"s{i}": 2 for i in range(10)}}
+        loads = [sum(costs[s] for s in shard) for shard in lpt_shards(list(costs), costs, 2)]
+        assert loads == [40, 38]  # six-and-six chunks would give 66 / 12
+
+
+class TestSchedule:
+    COST = {"a": 10, "b": 40, "c": 20, "d": 5}
+    VALUE = {"a": 900, "b": 100, "c": 500, "d": 800}
+
+    def test_largest_first_when_everything_fits(self):
+        assert schedule(list(self.COST), self.COST, self.VALUE) == ["b", "c", "a", "d"]
+        assert schedule(list(self.COST), self.COST, self.VALUE, capacity=75) == ["b", "c", "a", "d"]
+
+    def test_tight_capacity_picks_by_value(self):
+        # a, d and c fit in 35; b follows for whatever time is left
+        assert schedule(list(self.COST), self.COST, self.VALUE, capacity=35) == ["c", "a", "d", "b"]
+
+
+class TestStoreCostModel:
+    def test_previous_run_then_sweep_then_median(self, tmp_path):
+        path = tmp_path / "costs.json"
+        path.write_text(json.dumps({
+            "version": 1, "secondsPerCall": 0.5,
+            "stores": {"A": {"apiCalls": 10, "runs": 1}},
+        }))
+        sweep = tmp_path / "sweep.json"
+        sweep.write_text(json.dumps({"stores": [
+            {"storeId": "A", "totalApiCallsForOffers": 99},
+            {"storeId": "B", "totalApiCallsForOffers": 4},
+        ]}))
+        model = StoreCostModel(str(path), str(sweep))
+        assert model.costs(["A", "B", "C"]) == {"A": 10.0, "B": 4.0, "C": 7.0}
+        assert model.predicted_seconds(20) == 10.0
+
+    def test_record_smooths_and_round_trips(self, tmp_path):
+        path = str(tmp_path / "costs.json")
+        model = StoreCostModel(path)
+        model.record_store("A", 10, 12.0, 300)
+        model.record_store("A", 20, 20.0, 310)
+        model.record_shard(100, 150.0)
+        model.save()
+        loaded = StoreCostModel(path)
+        assert loaded.stores["A"]["apiCalls"] == 15.0
+        assert loaded.stores["A"]["runs"] == 2
+        assert loaded.seconds_per_call == 1.25
+
+    def test_merge_keeps_each_shards_fresh_entries(self, tmp_path):
+        base = {"version": 1, "secondsPerCall": 1.0,
+                "stores": {"A": {"apiCalls": 5, "runs": 3}, "B": {"apiCalls": 5, "runs": 3}}}
+        models = []
+        for i, (sid, rate) in enumerate((("A", 1.0), ("B", 2.0))):
+            p = tmp_path / f"{i}.json"
+            p.write_text(json.dumps(base))
+            m = StoreCostModel(str(p))
+            m.record_store(sid, 9, 1.0, 1)
+            m.seconds_per_call = rate
+            models.append(m)
+        models[0].merge(models[1:])
+        assert models[0].stores["A"]["lastApiCalls"] == 9
+        assert models[0].stores["B"]["lastApiCalls"] == 9
+        assert models[0].seconds_per_call == 1.5
+
+    def test_sweep_only_stores_add_compound_fetches(self, tmp_path):
+        path = tmp_path / "costs.json"
+        path.write_text(json.dumps({"version": 1, "stores": {
+            "A": {"apiCalls": 10, "offers": 400, "listed": 400, "compounds": 100, "runs": 1},
+        }}))
+        sweep = tmp_path / "sweep.json"
+        sweep.write_text(json.dumps({"stores": [
+            {"storeId": "B", "totalOffers": 480, "totalApiCallsForOffers": 10},
+        ]}))
+        model = StoreCostModel(str(path), str(sweep))
+        # a quarter of B's 480 offers are compound → 120 / 25 → 5 fetch-offers calls
+        assert model.costs(["B"]) == {"B": 15}
+        assert model.values(["A", "B", "C"]) == {"A": 400.0, "B": 480.0, "C": 440.0}
+
+    def test_compound_fetches_follow_the_probed_batch_size(self, tmp_path, monkeypatch):
+        path = tmp_path / "costs.json"
+        path.write_text(json.dumps({"version": 1, "stores": {
+            "A": {"apiCalls": 10, "offers": 400, "listed": 400, "compounds": 100, "runs": 1},
+        }}))
+        sweep = tmp_path / "sweep.json"
+        sweep.write_text(json.dumps({"stores": [
+            {"storeId": "B", "totalOffers": 480, "totalApiCallsForOffers": 10},
+        ]}))
+        monkeypatch.setattr(helpers, "FETCH_OFFERS_MAX_IDS", 60)  # from api-limits.json
+        assert StoreCostModel(str(path), str(sweep)).costs(["B"]) == {"B": 12}
+
+
+class TestMergeScript:
+    def test_merges_shards_into_the_restored_file(self, tmp_path):
+        out = tmp_path / ".store-costs.json"
+        out.write_text(json.dumps({"version": 1, "secondsPerCall": 1.0,
+                                   "stores": {"A": {"apiCalls": 5, "runs": 3},
+                                              "B": {"apiCalls": 5, "runs": 3}}}))
+        shard = StoreCostModel(str(out))
+        shard.record_store("A", 9, 1.0, 1)
+        shard.save(str(tmp_path / "shard-1.json"))
+        assert merge_store_costs.main([str(out), str(tmp_path / "shard-1.json")]) == 0
+        merged = json.loads(out.read_text())
+        assert merged["stores"]["A"]["lastApiCalls"] == 9
+        assert merged["stores"]["B"] == {"apiCalls": 5, "runs": 3}  # kept from the restored file
+
+    def test_no_shard_files_leaves_the_output_alone(self, tmp_path):
+        out = tmp_path / ".store-costs.json"
+        out.write_text("unchanged")
+        # An unmatched shell glob reaches the script as a literal path
+        assert merge_store_costs.main([str(out), str(tmp_path / "shard-costs" / "*.json")]) == 0
+        assert out.read_text() == "unchanged"
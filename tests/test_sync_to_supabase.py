@@ -0,0 +1,69 @@
+"""
+Tests for sync_to_supabase.sync_store_offers against the local simulator
+(scripts/kruoka_simulator.py) and the in-memory fake Supabase: batched
+upserts while the listing streams, compound expansion overlapping the
+listing, and draining part-way through a store.
+
+Run:
+    python -m pytest tests/test_sync_to_supabase.py -v
+"""
+import pytest
+
+import sync_to_supabase
+
+
+class TestSyncStoreOffers:
+    def test_sync_flushes_batches_while_streaming(self, sim, fast_limiter, fake_supabase, monkeypatch):
+        monkeypatch.setattr(sync_to_supabase, "BATCH_SIZE", 50)
+        counts = sim.state.catalog.offer_counts
+        store_id = max((s for s in counts if counts[s] <= 1000), key=counts.get)
+        synced = sync_to_supabase.sync_store_offers(fake_supabase, store_id, "2026-01-01T00:00:00+00:00")
+        offers = fake_supabase.tables["offers"]
+        assert synced >= len(offers) > 50
+        offer_upserts = [c for c in fake_supabase.calls if c[:2] == ("offers", "upsert")]
+        assert len(offer_upserts) > 1 and all(n <= 50 for _, _, n in offer_upserts)
+        products = fake_supabase.tables["products"]
+        assert all(
+            row["canonical_product_id"] in {p["id"] for p in products.values()}
+            for row in offers.values() if row["canonical_product_id"]
+        )
+        assert any(row["canonical_product_id"] for row in offers.values())
+
+    def test_compound_batches_overlap_the_listing(self, sim, fast_limiter, fake_supabase, monkeypatch):
+        counts = sim.state.catalog.offer_counts
+        store_id = min((s for s in counts if counts[s] > 1000), key=counts.get)
+        by_endpoint = sim.state.stats["byEndpoint"]
+
+        def listing_calls():
+            return sum(n for endpoint, n in by_endpoint.items() if endpoint != "fetch-offers")
+
+        listing_at_dispatch = []
+        real_fetch_offers = sync_to_supabase.fetch_offers
+
+        def spy(sid, offer_ids):
+            listing_at_dispatch.append(listing_calls())
+            return real_fetch_offers(sid, offer_ids)
+
+        monkeypatch.setattr(sync_to_supabase, "fetch_offers", spy)
+        stats = {}
+        sync_to_supabase.sync_store_offers(
+            fake_supabase, store_id, "2026-01-01T00:00:00+00:00", stats=stats,
+        )
+        assert len(listing_at_dispatch) == -(-stats["compounds"] // sync_to_supabase.COMPOUND_FETCH_BATCH)
+        assert listing_at_dispatch[0] < listing_calls()  # expansion began mid-listing
+        # compound products are written as k-ruoka:<store>:<offer>:<ean>
+        assert any(row_id.count(":") == 3 for row_id in fake_supabase.tables["offers"])
+
+    def test_draining_sync_flushes_and_skips_stale_delete(self, sim, fast_limiter, fake_supabase):
+        counts = sim.state.catalog.offer_counts
+        store_id = min((s for s in counts if counts[s] > 1000), key=counts.get)
+        pages = iter(range(3))
+        with pytest.raises(sync_to_supabase.SyncInterrupted) as excinfo:
+            sync_to_supabase.sync_store_offers(
+                fake_supabase, store_id, "2026-01-01T00:00:00+00:00",
+                should_stop=lambda: next(pages, None) is None,
+            )
+        written = excinfo.value.offers_written
+        assert 0 < written < counts[store_id]
+        assert len(fake_supabase.tables["offers"]) == written
+        assert not any(op == "delete" for _, op, _ in fake_supabase.calls)